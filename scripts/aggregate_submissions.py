@@ -0,0 +1,243 @@
+import firebase_admin
+from firebase_admin import credentials, firestore
+import os
+import json
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from batch_committer import BatchCommitter
+from company_names import normalize_company_name
+from run_metrics import add_metrics_arguments, run_metrics_from_args, stage
+from submission_aggregates import (DEFAULT_STATE_PATH, SUBMISSION_FIELDS, SubmissionAggregates,
+                                   company_fields, reduce_submissions)
+from write_rate import add_write_rate_arguments, write_rate_from_args
+
+DEFAULT_PAGE_SIZE = 1000
+
+# Submissions newer than this are left for the next run, so a server
+# timestamp committed late can't land behind the watermark
+DEFAULT_LAG_SECONDS = 300
+
+# Firestore allows at most 30 values in an 'in' filter
+IN_QUERY_LIMIT = 30
+
+def iter_submission_pages(submissions_ref, watermark=None, cutoff=None, page_size=DEFAULT_PAGE_SIZE):
+    """Yield (new submissions, last snapshot) per page, in timestamp order after the watermark"""
+    # Imported here so the aggregation helpers work without the Firestore client installed
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    query = submissions_ref
+    if cutoff is not None:
+        query = query.where(filter=FieldFilter('timestamp', '<=', cutoff))
+    if watermark is not None:
+        # Submissions sharing the watermark's timestamp are read again and skipped by document ID
+        query = query.where(filter=FieldFilter('timestamp', '>=', watermark[0]))
+    query = query.order_by('timestamp').select(SUBMISSION_FIELDS).limit(page_size)
+
+    last = None
+    while True:
+        page = list((query.start_after(last) if last is not None else query).stream())
+        if not page:
+            return
+
+        last = page[-1]
+        new = page
+        if watermark is not None:
+            new = [doc for doc in page if (doc.to_dict()['timestamp'], doc.id) > watermark]
+        yield new, last
+
+        if len(page) < page_size:
+            return
+
+def read_submissions(db, state, page_size=DEFAULT_PAGE_SIZE, lag_seconds=DEFAULT_LAG_SECONDS):
+    """Fold the submissions after the watermark into the local aggregates; returns how many were read"""
+    submissions_ref = db.collection('submissions')
+    watermark = state.watermark()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)
+
+    if watermark:
+        print(f"   Reading submissions after {watermark[0].isoformat()} (up to {cutoff.isoformat()})")
+    else:
+        print(f"   No watermark yet, reading every submission up to {cutoff.isoformat()}")
+
+    total = 0
+    for page_number, (page, last) in enumerate(iter_submission_pages(submissions_ref, watermark, cutoff, page_size),
+                                                start=1):
+        # One transaction per page: the totals and the watermark never disagree
+        state.merge(reduce_submissions(page), (last.to_dict()['timestamp'], last.id))
+        total += len(page)
+        print(f"   ✓ Page {page_number}: {total} submissions read")
+
+    return total
+
+def find_companies(companies_ref, names):
+    """Company document references by normalizedName, for up to IN_QUERY_LIMIT names"""
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    found = {}
+    if not names:
+        return found
+    query = companies_ref.where(filter=FieldFilter('normalizedName', 'in', list(names))).select(['normalizedName'])
+    for doc in query.stream():
+        found.setdefault((doc.to_dict() or {}).get('normalizedName'), []).append(doc.reference)
+    return found
+
+def write_aggregates(db, state, write_rate=None):
+    """Write the aggregates not yet written back onto their company documents"""
+    companies_ref = db.collection('companies')
+    counts = {'companies': 0, 'documents': 0, 'unmatched': 0}
+    unmatched_names = []
+
+    # Writes still in flight per key, and the key of each queued document;
+    # a key is clean once all of its writes have committed
+    outstanding = {}
+    queued = {}
+    failed = set()
+    lock = threading.Lock()
+
+    def on_batch_done(batch_number, ops, succeeded):
+        written = []
+        with lock:
+            for _, doc_ref, _, _ in ops:
+                key = queued.pop(doc_ref.path, None)
+                if key is None:
+                    continue
+                if not succeeded:
+                    failed.add(key)
+                outstanding[key] -= 1
+                if outstanding[key] == 0:
+                    del outstanding[key]
+                    if key not in failed:
+                        written.append(key)
+        # Failed keys stay dirty so the next run writes them again
+        state.mark_written(written)
+
+    after = ""
+    with BatchCommitter(db, on_batch_done=on_batch_done, write_rate=write_rate) as committer:
+        while True:
+            chunk = state.dirty(IN_QUERY_LIMIT, after)
+            if not chunk:
+                break
+            after = chunk[-1][0]
+            aggregates = dict(chunk)
+
+            # Companies from the app and import_to_firebase.py use the search normalization
+            references = {key: refs for key, refs in find_companies(companies_ref, aggregates).items()
+                          if key in aggregates}
+
+            # Populated companies use the population normalization of their name; a
+            # normalizedName that is itself an aggregate key belongs to that company
+            fallback = {}
+            for key, aggregate in aggregates.items():
+                name = normalize_company_name(aggregate['name'])
+                if key not in references and name and name != key:
+                    fallback[name] = key
+            for name in state.contains(list(fallback)):
+                del fallback[name]
+            for name, refs in find_companies(companies_ref, fallback).items():
+                if name in fallback:
+                    references[fallback[name]] = refs
+
+            now = datetime.now()
+            with lock:
+                for key, refs in references.items():
+                    outstanding[key] = outstanding.get(key, 0) + len(refs)
+                    for doc_ref in refs:
+                        queued[doc_ref.path] = key
+            for key, refs in references.items():
+                data = company_fields(aggregates[key])
+                data['updatedAt'] = now
+                for doc_ref in refs:
+                    committer.set(doc_ref, data, merge=True)
+                counts['companies'] += 1
+                counts['documents'] += len(refs)
+
+            # Unmatched companies stay dirty and are looked up again on the next run
+            for key, aggregate in aggregates.items():
+                if key not in references:
+                    counts['unmatched'] += 1
+                    if len(unmatched_names) < 10:
+                        unmatched_names.append(aggregate['name'])
+
+    counts['failed'] = committer.stats.documents_failed
+    if unmatched_names:
+        print(f"   ⚠ {counts['unmatched']} companies with submissions have no company document, e.g. "
+              + ", ".join(unmatched_names))
+    return counts
+
+def aggregate_submissions(state_path=DEFAULT_STATE_PATH, full=False, page_size=DEFAULT_PAGE_SIZE,
+                          lag_seconds=DEFAULT_LAG_SECONDS, write_rate=None):
+    """Recompute company submission aggregates from the submissions collection
+
+    Only submissions after the stored watermark are read; the aggregates
+    of the companies they belong to are then written back in full.
+    Returns the number of submissions read, or None without credentials.
+    """
+
+    print("Setting up Firebase connection...")
+
+    # Try to use environment variables first
+    if os.getenv('FIREBASE_SERVICE_ACCOUNT'):
+        # Use service account from environment variable
+        service_account_info = json.loads(os.getenv('FIREBASE_SERVICE_ACCOUNT'))
+        cred = credentials.Certificate(service_account_info)
+        firebase_admin.initialize_app(cred)
+        print("✓ Connected using environment variable")
+    elif os.path.exists("firebase-service-account.json"):
+        # Use service account file if it exists
+        cred = credentials.Certificate("firebase-service-account.json")
+        firebase_admin.initialize_app(cred)
+        print("✓ Connected using service account file")
+    else:
+        print("⚠ Firebase credentials not found. Please:")
+        print("1. Set FIREBASE_SERVICE_ACCOUNT environment variable, OR")
+        print("2. Place firebase-service-account.json in this folder")
+        print("3. Run this script again")
+        return
+
+    # Initialize Firestore
+    db = firestore.client()
+
+    state = SubmissionAggregates(state_path)
+    try:
+        if full:
+            print(f"\n🧹 Full recompute: clearing {state_path}")
+            state.reset()
+
+        print("\n📥 Reading submissions...")
+        with stage('read') as span:
+            span['rows'] = read = read_submissions(db, state, page_size, lag_seconds)
+
+        totals = state.counts()
+        print(f"✓ {read} new submissions; {totals['submissions']} submissions across "
+              f"{totals['companies']} companies, {totals['dirty']} to write")
+
+        print("\n📤 Writing company aggregates...")
+        with stage('write') as span:
+            counts = write_aggregates(db, state, write_rate)
+            span['rows'] = counts['documents']
+    finally:
+        state.close()
+
+    print(f"\n🎉 Updated {counts['documents']} documents for {counts['companies']} companies "
+          f"({counts['unmatched']} unmatched, {counts['failed']} failed writes)")
+    return read
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Recompute company submission aggregates from the submissions collection')
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH,
+                       help='Local SQLite file with the running aggregates and the timestamp watermark')
+    parser.add_argument('--full', action='store_true',
+                       help='Forget the stored aggregates and watermark and recompute from every submission')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                       help='Submissions read per page')
+    parser.add_argument('--lag-seconds', type=float, default=DEFAULT_LAG_SECONDS,
+                       help='Leave submissions newer than this for the next run')
+    add_write_rate_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    with run_metrics_from_args('aggregate_submissions', args):
+        aggregate_submissions(state_path=args.state, full=args.full, page_size=args.page_size,
+                              lag_seconds=args.lag_seconds, write_rate=write_rate_from_args(args))
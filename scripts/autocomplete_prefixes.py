@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Autocomplete Prefix Documents
+
+Materializes an autocomplete_prefixes collection so the company dropdown
+can answer a keystroke with a single document read:
+
+- One document per 1-3 character prefix of normalizedName, holding the
+  top-K companies for that prefix ranked by submissionCount (ties go to
+  the shorter, then alphabetically first name)
+- Document IDs are the prefix escaped like encodeURIComponent, so the
+  frontend can build them directly
+- Companies are collected from committed write batches, keeping only a
+  bounded top-K per prefix in memory, and only the prefixes touched by
+  created, updated or deleted companies are rewritten
+- Incremental updates merge into the stored lists. If a full list loses
+  a company (deleted, or renamed so that it ranks lower), a company that
+  never made the list may now belong in it, so that prefix is refilled by
+  scanning its normalizedName range. Prefixes left with no companies are
+  deleted
+- Updates don't carry submissionCount. An updated company missing from a
+  list that isn't full (e.g. written before prefixes were kept) belongs
+  in it with its stored count, so that prefix is refilled too; one
+  missing from a full list didn't rank before and is left out
+
+submissionCount changes made by the app after import are not tracked
+here; those prefixes pick up new counts the next time they are rebuilt.
+rebuild() recomputes every prefix from a scan of the companies
+collection, e.g. after sharded runs that each wrote only their own slice.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+from batch_committer import BatchCommitter, WriteOp
+from firestore_scan import iter_documents
+from write_rate import AdaptiveWriteRate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTION = 'autocomplete_prefixes'
+DEFAULT_TOP_K = 10
+MAX_PREFIX_LENGTH = 3
+
+# Document reads per get_all call
+_READ_CHUNK = 300
+
+# Sorts after any character a normalizedName can contain, closing a prefix range
+_RANGE_END = '\uf8ff'
+
+
+def prefix_doc_id(prefix: str) -> str:
+    """Escape a prefix the way encodeURIComponent does; '/' can't appear in document IDs"""
+    return quote(prefix, safe="-_.!~*'()")
+
+
+def name_prefixes(normalized_name: str, max_length: int = MAX_PREFIX_LENGTH) -> List[str]:
+    return [normalized_name[:length] for length in range(1, min(max_length, len(normalized_name)) + 1)]
+
+
+def _rank(entry: Dict[str, Any]) -> Tuple:
+    """Sort key: highest submissionCount first, then shorter and alphabetically first names"""
+    return (-(entry.get('submissionCount') or 0), len(entry['name']), entry['name'], entry['id'])
+
+
+class AutocompletePrefixes:
+    def __init__(self, db, top_k: int = DEFAULT_TOP_K, collection: str = DEFAULT_COLLECTION,
+                 companies_collection: str = 'companies', max_in_flight: int = 8,
+                 write_rate: Optional[AdaptiveWriteRate] = None):
+        """Collect company changes; write() then updates the affected prefix documents"""
+        self.db = db
+        self.top_k = top_k
+        self.collection = collection
+        self.companies_collection = companies_collection
+        self.max_in_flight = max_in_flight
+        self.write_rate = write_rate
+
+        # prefix -> heap of (inverted rank, tiebreak, entry) holding the best top_k new companies
+        self._candidates: Dict[str, List[tuple]] = {}
+        self._touched: Set[str] = set()
+        # Merged updates don't carry submissionCount, so stored entries keep theirs
+        self._renamed: Dict[str, str] = {}
+        self._deleted: Set[str] = set()
+        self._tiebreak = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: str, company: Dict[str, Any]):
+        """Record a created company, or an updated one if it has no submissionCount"""
+        entry = {
+            'id': doc_id,
+            'name': company['name'],
+            'normalizedName': company['normalizedName'],
+            'submissionCount': company.get('submissionCount') or 0,
+        }
+        key = _rank(entry)
+        with self._lock:
+            if 'submissionCount' not in company:
+                self._renamed[doc_id] = entry['name']
+            for prefix in name_prefixes(entry['normalizedName']):
+                self._touched.add(prefix)
+                heap = self._candidates.setdefault(prefix, [])
+                item = (_InvertedRank(key), next(self._tiebreak), entry)
+                if len(heap) < self.top_k:
+                    heapq.heappush(heap, item)
+                elif key < heap[0][0].key:
+                    heapq.heapreplace(heap, item)
+
+    def remove(self, doc_id: str, normalized_name: str):
+        """Record a deleted company"""
+        with self._lock:
+            self._deleted.add(doc_id)
+            self._touched.update(name_prefixes(normalized_name))
+
+    def on_batch_done(self, batch_number: int, ops: List[WriteOp], succeeded: bool):
+        """BatchCommitter callback: record the companies a committed batch wrote"""
+        if not succeeded:
+            return
+        for operation, doc_ref, data, _ in ops:
+            if operation == 'set' and data.get('normalizedName'):
+                self.add(doc_ref.id, data)
+
+    def write(self, merge_existing: bool = True) -> Dict[str, int]:
+        """Rewrite the prefix documents touched since the last write
+
+        merge_existing=False replaces the documents outright, for a full
+        rebuild into an emptied collection.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            candidates, self._candidates = self._candidates, {}
+            renamed, self._renamed = self._renamed, {}
+            deleted, self._deleted = self._deleted, set()
+
+        prefixes = sorted(touched)
+        existing = self._read(prefixes) if merge_existing else {}
+        counts = {'prefixes': len(prefixes), 'refilled': 0, 'deleted': 0}
+        now = datetime.now(timezone.utc)
+        collection_ref = self.db.collection(self.collection)
+
+        with BatchCommitter(self.db, max_in_flight=self.max_in_flight, write_rate=self.write_rate) as committer:
+            for prefix in prefixes:
+                stored = existing.get(prefix, [])
+                merged = {}
+                lost_rank = False
+                for entry in stored:
+                    if entry['id'] in deleted:
+                        lost_rank = True
+                        continue
+                    if entry['id'] in renamed:
+                        renamed_entry = dict(entry, name=renamed[entry['id']])
+                        lost_rank = lost_rank or _rank(renamed_entry) > _rank(entry)
+                        entry = renamed_entry
+                    merged[entry['id']] = entry
+                missing_count = False
+                for _, _, entry in candidates.get(prefix, []):
+                    if entry['id'] in renamed and entry['id'] not in merged:
+                        # An update's count is unknown: it is only needed if the list has room
+                        missing_count = missing_count or len(stored) < self.top_k
+                        continue
+                    merged.setdefault(entry['id'], entry)
+
+                # Companies that never made a full list may now outrank what is left of it
+                if (lost_rank and len(stored) >= self.top_k) or missing_count:
+                    merged = {entry['id']: entry for entry in self._refill(prefix)}
+                    counts['refilled'] += 1
+
+                doc_ref = collection_ref.document(prefix_doc_id(prefix))
+                if not merged:
+                    committer.delete(doc_ref)
+                    counts['deleted'] += 1
+                    continue
+                entries = sorted(merged.values(), key=_rank)[:self.top_k]
+                committer.set(doc_ref, {
+                    'prefix': prefix,
+                    'companies': entries,
+                    'updatedAt': now,
+                })
+
+        logger.info(f"Autocomplete: updated {counts['prefixes']} prefix documents "
+                    f"({counts['refilled']} refilled from {self.companies_collection}, "
+                    f"{counts['deleted']} emptied and deleted)")
+        return counts
+
+    def rebuild(self) -> Dict[str, int]:
+        """Recompute every prefix document from the companies collection"""
+        fields = ['name', 'normalizedName', 'submissionCount']
+        scanned = 0
+        for snapshot in iter_documents(self.db.collection(self.companies_collection), fields=fields):
+            data = snapshot.to_dict()
+            if data.get('normalizedName'):
+                self.add(snapshot.id, {
+                    'name': data.get('name', ''),
+                    'normalizedName': data['normalizedName'],
+                    'submissionCount': data.get('submissionCount') or 0,
+                })
+            scanned += 1
+            if scanned % 100_000 == 0:
+                logger.info(f"Autocomplete rebuild: scanned {scanned} companies")
+        logger.info(f"Autocomplete rebuild: scanned {scanned} companies")
+        return self.write(merge_existing=False)
+
+    def _read(self, prefixes: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        collection_ref = self.db.collection(self.collection)
+        stored = {}
+        for i in range(0, len(prefixes), _READ_CHUNK):
+            refs = [collection_ref.document(prefix_doc_id(prefix)) for prefix in prefixes[i:i + _READ_CHUNK]]
+            for snapshot in self.db.get_all(refs):
+                if snapshot.exists:
+                    data = snapshot.to_dict()
+                    stored[data['prefix']] = data.get('companies') or []
+        return stored
+
+    def _refill(self, prefix: str) -> List[Dict[str, Any]]:
+        """Rank every company in the prefix's normalizedName range"""
+        query = (self.db.collection(self.companies_collection)
+                 .where('normalizedName', '>=', prefix)
+                 .where('normalizedName', '<', prefix + _RANGE_END)
+                 .select(['name', 'normalizedName', 'submissionCount']))
+        best: List[tuple] = []
+        for snapshot in query.stream():
+            data = snapshot.to_dict()
+            entry = {
+                'id': snapshot.id,
+                'name': data.get('name', ''),
+                'normalizedName': data.get('normalizedName', ''),
+                'submissionCount': data.get('submissionCount') or 0,
+            }
+            item = (_InvertedRank(_rank(entry)), snapshot.id, entry)
+            if len(best) < self.top_k:
+                heapq.heappush(best, item)
+            elif item[0].key < best[0][0].key:
+                heapq.heapreplace(best, item)
+        return [entry for _, _, entry in best]
+
+
+class _InvertedRank:
+    """Heap key that puts the worst-ranked entry at the top of a min-heap"""
+    __slots__ = ('key',)
+
+    def __init__(self, key: Tuple):
+        self.key = key
+
+    def __lt__(self, other: '_InvertedRank') -> bool:
+        return self.key > other.key
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Parallel Firestore Batch Committer
+
+Keeps several write batches in flight at once instead of waiting for each
+commit round trip before building the next batch.
+
+- At most `max_in_flight` batches are committing at any time; submitting
+  another one blocks until a slot frees up (backpressure)
+- Failed commits on transient errors are retried with jittered
+  exponential backoff instead of being logged and dropped
+- Batches that still fail after all retries are counted and logged
+- With a write_rate (AdaptiveWriteRate), every commit attempt waits for
+  its share of the target rate first, and throttling errors lower it
+- Every commit attempt's round trip goes into a latency histogram, and
+  the stats are added to the active run_metrics run on close()
+
+Usage:
+    with BatchCommitter(db, max_in_flight=8) as committer:
+        for name, doc in documents:
+            committer.set(db.collection('companies').document(), doc)
+    print(committer.stats.documents_written)
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+from run_metrics import LatencyHistogram, record_commit_stats
+from write_rate import THROTTLING_ERRORS, AdaptiveWriteRate
+
+logger = logging.getLogger(__name__)
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+
+RETRYABLE_ERRORS = (
+    google_exceptions.Aborted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.Unknown,
+    ConnectionError,
+    TimeoutError,
+)
+
+# (operation, document reference, data, merge)
+WriteOp = Tuple[str, Any, Optional[Dict[str, Any]], bool]
+
+# Called from a worker thread as (batch_number, ops, succeeded) once a batch
+# has committed or finally failed
+BatchCallback = Callable[[int, List[WriteOp], bool], None]
+
+
+@dataclass
+class CommitStats:
+    """Running totals for a committer"""
+    batches_committed: int = 0
+    batches_failed: int = 0
+    documents_written: int = 0
+    documents_failed: int = 0
+    retries: int = 0
+    throttled: int = 0
+    commit_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+class BatchCommitter:
+    def __init__(self, db, batch_size: int = MAX_BATCH_SIZE, max_in_flight: int = 8,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 on_batch_done: Optional[BatchCallback] = None, write_rate: Optional[AdaptiveWriteRate] = None):
+        """Create a committer writing through the given Firestore client"""
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.db = db
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_batch_done = on_batch_done
+        self.write_rate = write_rate
+        self.stats = CommitStats()
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='batch-commit')
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._stats_lock = threading.Lock()
+        self._pending: List[WriteOp] = []
+        self._batch_number = 0
+        self._closed = False
+
+    def __enter__(self) -> 'BatchCommitter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def set(self, doc_ref, data: Dict[str, Any], merge: bool = False):
+        """Queue a set() write, committing the batch once it is full"""
+        self._add(('set', doc_ref, data, merge))
+
+    def delete(self, doc_ref):
+        """Queue a delete() write, committing the batch once it is full"""
+        self._add(('delete', doc_ref, None, False))
+
+    def _add(self, op: WriteOp):
+        self._pending.append(op)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> Optional[int]:
+        """Submit the queued writes as one batch without waiting for the commit
+        
+        Returns the batch number, or None if nothing was queued.
+        """
+        if not self._pending:
+            return None
+
+        ops, self._pending = self._pending, []
+        self._batch_number += 1
+
+        # Backpressure: block until one of the in-flight batches finishes
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._commit_with_retry, ops, self._batch_number)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return self._batch_number
+
+    @property
+    def batch_number(self) -> int:
+        """Number of the last batch submitted, 0 before the first"""
+        return self._batch_number
+
+    def close(self) -> CommitStats:
+        """Flush the remaining writes and wait for every batch to finish"""
+        if self._closed:
+            return self.stats
+        self._closed = True
+        self.flush()
+        self._executor.shutdown(wait=True)
+        record_commit_stats(self.stats)
+
+        summary = (
+            f"Committed {self.stats.batches_committed} batches "
+            f"({self.stats.documents_written} documents), "
+            f"{self.stats.batches_failed} failed, {self.stats.retries} retries"
+        )
+        if self.write_rate is not None:
+            summary += f", {self.stats.throttled} throttled, write rate target {self.write_rate.rate:.0f} docs/s"
+        logger.info(summary)
+        return self.stats
+
+    def _build_batch(self, ops: List[WriteOp]):
+        batch = self.db.batch()
+        for operation, doc_ref, data, merge in ops:
+            if operation == 'set':
+                batch.set(doc_ref, data, merge=merge)
+            else:
+                batch.delete(doc_ref)
+        return batch
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _commit_with_retry(self, ops: List[WriteOp], batch_number: int):
+        for attempt in range(self.max_retries + 1):
+            if self.write_rate is not None:
+                self.write_rate.acquire(len(ops))
+            start = time.perf_counter()
+            try:
+                # A fresh batch per attempt; committed batches cannot be reused
+                self._build_batch(ops).commit()
+            except RETRYABLE_ERRORS as e:
+                self.stats.commit_latency.observe(time.perf_counter() - start)
+                if isinstance(e, THROTTLING_ERRORS):
+                    with self._stats_lock:
+                        self.stats.throttled += 1
+                    if self.write_rate is not None:
+                        self.write_rate.on_throttle(e)
+                if attempt == self.max_retries:
+                    self._record_failure(ops, batch_number, e)
+                    return
+                delay = self._backoff_delay(attempt)
+                with self._stats_lock:
+                    self.stats.retries += 1
+                logger.warning(
+                    f"Batch {batch_number} failed ({e}), retrying in {delay:.2f}s "
+                    f"(attempt {attempt + 1}/{self.max_retries})"
+                )
+                time.sleep(delay)
+            except Exception as e:
+                self.stats.commit_latency.observe(time.perf_counter() - start)
+                self._record_failure(ops, batch_number, e)
+                return
+            else:
+                self.stats.commit_latency.observe(time.perf_counter() - start)
+                with self._stats_lock:
+                    self.stats.batches_committed += 1
+                    self.stats.documents_written += len(ops)
+                if self.write_rate is not None:
+                    self.write_rate.on_success()
+                logger.info(f"Committed batch {batch_number}: {len(ops)} documents")
+                self._notify(batch_number, ops, True)
+                return
+
+    def _record_failure(self, ops: List[WriteOp], batch_number: int, error: Exception):
+        with self._stats_lock:
+            self.stats.batches_failed += 1
+            self.stats.documents_failed += len(ops)
+        logger.error(f"Error committing batch {batch_number}: {error}")
+        self._notify(batch_number, ops, False)
+
+    def _notify(self, batch_number: int, ops: List[WriteOp], succeeded: bool):
+        if self.on_batch_done is None:
+            return
+        try:
+            self.on_batch_done(batch_number, ops, succeeded)
+        except Exception as e:
+            logger.error(f"Batch callback failed for batch {batch_number}: {e}")
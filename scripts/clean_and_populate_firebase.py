@@ -25,14 +25,30 @@ import os
 import sys
 import json
 import logging
+import argparse
 import pandas as pd
-import numpy as np
-from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Iterator, Optional
 import firebase_admin
 from firebase_admin import credentials, firestore
-from kagglehub import KaggleDatasetAdapter
-import kagglehub
+
+from autocomplete_prefixes import DEFAULT_COLLECTION as AUTOCOMPLETE_COLLECTION
+from autocomplete_prefixes import DEFAULT_TOP_K, AutocompletePrefixes
+from batch_committer import BatchCommitter
+from collection_purge import CollectionPurger
+from company_dedup import DEFAULT_THRESHOLD, dedupe_company_names
+from company_documents import build_company_documents, iter_document_batches
+from company_names import company_doc_id
+from company_shards import Shard, existing_shard_paths, parse_shard, select_shard, shard_path
+from company_upsert import CompanyUpserter
+from dataset_cache import COMPANIES_DATASET, DEFAULT_CACHE_DIR, DatasetCache
+from ingest_manifest import DEFAULT_MANIFEST_PATH, IngestManifest
+from parallel_clean import ParallelNameCleaner
+from populate_checkpoint import (DEFAULT_CHECKPOINT_PATH, CheckpointMismatch, PopulateCheckpoint, clear_checkpoint,
+                                 frame_hash)
+from run_metrics import add_metrics_arguments, run_metrics_from_args, stage
+from seen_names import SeenNames
+from write_rate import AdaptiveWriteRate, add_write_rate_arguments, write_rate_from_args
 
 # Configure logging
 logging.basicConfig(
@@ -46,8 +62,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class FirebaseCleaner:
-    def __init__(self, service_account_path: str = None):
-        """Initialize Firebase connection"""
+    def __init__(self, service_account_path: str = None, write_rate: Optional[AdaptiveWriteRate] = None,
+                 dataset_cache: Optional[DatasetCache] = None):
+        """Initialize Firebase connection; write_rate paces every company write of the run"""
         try:
             # Try to use environment variables first
             if os.getenv('FIREBASE_SERVICE_ACCOUNT'):
@@ -67,65 +84,57 @@ class FirebaseCleaner:
                     firebase_admin.initialize_app()
             
             self.db = firestore.client()
+            self.write_rate = write_rate
+            self.dataset_cache = dataset_cache or DatasetCache()
+            self._kaggle_dataset: Optional[Dict[str, Any]] = None
+            self.used_sample_fallback = False
+            # Companies committed by populate_companies() so far in this run
+            self.companies_written = 0
             logger.info("Firebase initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Firebase: {e}")
             logger.error("Please set FIREBASE_SERVICE_ACCOUNT environment variable or provide a valid service account file")
             raise
 
-    def clean_collections(self, collections: List[str] = None):
-        """Clean specified collections from Firebase"""
+    def clean_collections(self, collections: List[str] = None, workers: int = 8,
+                          manifest_paths: Iterable[str] = ()):
+        """Clean specified collections from Firebase and forget them in the given manifests"""
         if collections is None:
-            collections = ['companies', 'company_insights', 'submissions']
+            collections = ['companies', 'company_insights', 'submissions', AUTOCOMPLETE_COLLECTION]
         
         logger.info(f"Cleaning collections: {collections}")
         
+        # Page through document references and delete them in parallel batches
+        purger = CollectionPurger(self.db, workers=workers)
+        
         for collection_name in collections:
             try:
-                # Get all documents in the collection
-                docs = self.db.collection(collection_name).stream()
-                doc_count = 0
-                
-                # Delete each document
-                for doc in docs:
-                    doc.reference.delete()
-                    doc_count += 1
-                
-                logger.info(f"Deleted {doc_count} documents from {collection_name}")
-                
+                purger.purge(collection_name)
             except Exception as e:
                 logger.error(f"Error cleaning {collection_name}: {e}")
+        
+        # Rows for purged documents would make the next incremental run skip them as unchanged;
+        # also after a failed purge, where some of them are gone
+        for manifest_path in manifest_paths:
+            manifest = IngestManifest(manifest_path)
+            try:
+                for collection_name in collections:
+                    forgotten = manifest.clear(collection_name)
+                    if forgotten:
+                        logger.info(f"Forgot {forgotten} {collection_name} documents in {manifest_path}")
+            finally:
+                manifest.close()
 
     def download_kaggle_dataset(self) -> pd.DataFrame:
         """Download and load the Kaggle company dataset"""
         logger.info("Downloading Kaggle dataset...")
         
         try:
-            # Try to load the dataset with different approaches
-            try:
-                # First try with the main CSV file
-                df = kagglehub.load_dataset(
-                    KaggleDatasetAdapter.PANDAS,
-                    "peopledatalabssf/free-7-million-company-dataset",
-                    "companies.csv",
-                )
-            except:
-                try:
-                    # Try with the main file
-                    df = kagglehub.load_dataset(
-                        KaggleDatasetAdapter.PANDAS,
-                        "peopledatalabssf/free-7-million-company-dataset",
-                        "companies_data.csv",
-                    )
-                except:
-                    # Try without specifying a file (let kagglehub find it)
-                    df = kagglehub.load_dataset(
-                        KaggleDatasetAdapter.PANDAS,
-                        "peopledatalabssf/free-7-million-company-dataset",
-                    )
-            
+            # The CSV is parsed once into a cached Parquet copy; only the name column is read
+            dataset = self.resolve_kaggle_dataset()
+            logger.info(f"Dataset columns: {dataset['columns']}")
+            df = self.dataset_cache.load(dataset, columns=[self._name_column(dataset)])
             logger.info(f"Downloaded dataset with {len(df)} records")
-            logger.info(f"Dataset columns: {list(df.columns)}")
             
             return df
             
@@ -133,7 +142,31 @@ class FirebaseCleaner:
             logger.error(f"Error downloading dataset: {e}")
             logger.info("Falling back to sample companies...")
             # Fallback to sample companies if Kaggle fails
+            self.used_sample_fallback = True
             return self.create_sample_companies()
+
+    def resolve_kaggle_dataset(self) -> Dict[str, Any]:
+        """Download the Kaggle dataset and return its cache entry (source CSV, sha1, Parquet copy)"""
+        if self._kaggle_dataset is None:
+            self._kaggle_dataset = self.dataset_cache.resolve(COMPANIES_DATASET)
+        return self._kaggle_dataset
+
+    def _name_column(self, dataset: Dict[str, Any]) -> str:
+        if 'name' in dataset['columns']:
+            return 'name'
+        logger.warning(f"'name' column not found, using: {dataset['columns'][0]}")
+        return dataset['columns'][0]
+
+    def iter_kaggle_dataset_chunks(self, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Stream the Kaggle dataset in bounded chunks, reading only the name column"""
+        dataset = self.resolve_kaggle_dataset()
+        logger.info(f"Streaming {Path(dataset['source']).name} in chunks of {chunksize} rows")
+        
+        name_col = self._name_column(dataset)
+        for chunk in self.dataset_cache.iter_frames(dataset, chunksize, columns=[name_col]):
+            if name_col != 'name':
+                chunk.columns = ['name']
+            yield chunk
     
     def create_sample_companies(self) -> pd.DataFrame:
         """Create a sample dataset with popular companies"""
@@ -186,30 +219,27 @@ class FirebaseCleaner:
         logger.info(f"Created sample dataset with {len(df)} companies")
         return df
 
-    def clean_company_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Clean and process the company dataset"""
+    def clean_company_data(self, df: pd.DataFrame, workers: int = 1,
+                           name_cleaner: Optional[ParallelNameCleaner] = None) -> pd.DataFrame:
+        """Clean and process the company dataset
+        
+        Names are cleaned on `workers` processes, partitioned by a hash of the
+        normalized name; pass name_cleaner to reuse one process pool across chunks.
+        The result also carries each name's normalizedName.
+        """
         logger.info("Cleaning company data...")
         
         # Select relevant columns and clean data
         if 'name' in df.columns:
-            # Basic cleaning
-            df_clean = df[['name']].copy()
-            df_clean['name'] = df_clean['name'].astype(str).str.strip()
-            
-            # Remove duplicates and null values
-            df_clean = df_clean.dropna(subset=['name'])
-            df_clean = df_clean[df_clean['name'] != '']
-            df_clean = df_clean[df_clean['name'] != 'nan']
-            df_clean = df_clean.drop_duplicates(subset=['name'])
-            
-            # Filter for reasonable company names (2-100 characters)
-            df_clean = df_clean[
-                (df_clean['name'].str.len() >= 2) & 
-                (df_clean['name'].str.len() <= 100)
-            ]
-            
-            # Remove companies with only special characters
-            df_clean = df_clean[df_clean['name'].str.match(r'^[a-zA-Z0-9\s\-\.&]+$')]
+            # Strip, drop empty/duplicate names, keep 2-100 characters without
+            # special characters only
+            with stage('clean', rows=len(df)) as span:
+                if name_cleaner is None:
+                    with ParallelNameCleaner(workers) as name_cleaner:
+                        df_clean = name_cleaner.clean(df['name'])
+                else:
+                    df_clean = name_cleaner.clean(df['name'])
+                span['output_rows'] = len(df_clean)
             
             logger.info(f"Cleaned dataset: {len(df_clean)} companies")
             return df_clean
@@ -218,111 +248,163 @@ class FirebaseCleaner:
             logger.warning("'name' column not found, using first column as company name")
             df_clean = df.iloc[:, 0:1].copy()
             df_clean.columns = ['name']
-            return self.clean_company_data(df_clean)
+            return self.clean_company_data(df_clean, workers=workers, name_cleaner=name_cleaner)
 
-    def normalize_company_name(self, name: str) -> str:
-        """Normalize company name for consistent matching"""
-        return (
-            name.lower()
-            .strip()
-            .replace('  ', ' ')
-            .replace('&', 'and')
-            .replace('.', '')
-            .replace(',', '')
-            .replace('(', '')
-            .replace(')', '')
-            .replace('-', ' ')
-            .replace('_', ' ')
-        )
+    def create_company_document(self, name: str) -> Dict[str, Any]:
+        """Create a company document with the required schema"""
+        return build_company_documents([name])[0]
 
-    def generate_aliases(self, name: str) -> List[str]:
-        """Generate common aliases for a company name"""
-        aliases = [name]
+    def populate_companies(self, companies_df: pd.DataFrame, limit: Optional[int] = None, max_in_flight: int = 8,
+                           autocomplete: Optional[AutocompletePrefixes] = None,
+                           checkpoint: Optional[PopulateCheckpoint] = None, offset: int = 0):
+        """Populate Firebase with company documents
         
-        # Common variations
-        variations = [
-            name.replace(' and ', ' & '),
-            name.replace(' & ', ' and '),
-            name.replace(' Inc', ''),
-            name.replace(' Corp', ''),
-            name.replace(' LLC', ''),
-            name.replace(' Ltd', ''),
-            name.replace(' Company', ''),
-            name.replace(' Co', ''),
-        ]
+        With a checkpoint, documents get deterministic IDs and rows written
+        before it are skipped; offset is the input position of the first row.
+        """
+        # Limit the number of companies to process
+        companies_to_process = companies_df if limit is None else companies_df.head(limit)
+        logger.info(f"Populating Firebase with {len(companies_to_process)} companies...")
         
-        # Add variations that are different from original
-        for variation in variations:
-            if variation.strip() != name and variation.strip():
-                aliases.append(variation.strip())
+        companies_ref = self.db.collection('companies')
         
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_aliases = []
-        for alias in aliases:
-            if alias not in seen:
-                seen.add(alias)
-                unique_aliases.append(alias)
+        # Batches of 500 are committed in parallel, retrying transient failures
+        on_batch_done = autocomplete.on_batch_done if autocomplete is not None else None
+        if checkpoint is not None:
+            companies_to_process = checkpoint.start(companies_to_process, offset, autocomplete)
+            on_batch_done = checkpoint.on_batch_done
+            skipped_before = (checkpoint.duplicates, checkpoint.unnamed)
+        committer = BatchCommitter(self.db, max_in_flight=max_in_flight, on_batch_done=on_batch_done,
+                                   write_rate=self.write_rate)
+        try:
+            with stage('populate', rows=len(companies_to_process)), committer:
+                # Documents are built a batch at a time, sharing one timestamp
+                for documents in iter_document_batches(companies_to_process):
+                    if checkpoint is None:
+                        for company_doc in documents:
+                            committer.set(companies_ref.document(), company_doc)
+                    else:
+                        # Deterministic IDs, so a resumed run overwrites instead of duplicating
+                        for company_doc in checkpoint.new_documents(documents):
+                            committer.set(companies_ref.document(company_doc_id(company_doc['normalizedName'])),
+                                          company_doc)
+                    if checkpoint is not None:
+                        # Flushed per document batch, so each batch covers a known range of rows
+                        committer.flush()
+                        checkpoint.submitted(committer.batch_number, len(documents))
+        finally:
+            # Counted even when the block fails, so a failed stream knows whether anything was written
+            self.companies_written += committer.stats.documents_written
         
-        return unique_aliases[:10]  # Limit to 10 aliases
+        total_added = committer.stats.documents_written
+        if committer.stats.documents_failed:
+            logger.error(f"Failed to add {committer.stats.documents_failed} companies after retries")
+        if checkpoint is not None and (checkpoint.duplicates, checkpoint.unnamed) != skipped_before:
+            logger.info(f"Skipped {checkpoint.duplicates - skipped_before[0]} companies whose normalized name "
+                        f"matches an earlier company and {checkpoint.unnamed - skipped_before[1]} "
+                        f"without a normalized name")
+        logger.info(f"Successfully added {total_added} companies to Firebase")
+        return total_added
 
-    def create_company_document(self, name: str) -> Dict[str, Any]:
-        """Create a company document with the required schema"""
-        normalized_name = self.normalize_company_name(name)
-        aliases = self.generate_aliases(name)
+    def iter_clean_chunks(self, chunksize: int = 100_000, workers: int = 1) -> Iterator[pd.DataFrame]:
+        """Yield cleaned chunks of the Kaggle dataset with cross-chunk duplicates removed
         
-        # Initialize with default values
-        now = datetime.now(timezone.utc)
+        Only one chunk of rows is held at a time; the state kept across
+        chunks is a sorted array of 64-bit name hashes (seen_names.py) used
+        to drop names that already appeared in an earlier chunk, so memory
+        grows by 8 bytes per unique name. Each chunk is cleaned on `workers`
+        processes from one pool kept for the whole stream.
+        """
+        seen = SeenNames()
+        rows_read = 0
         
-        return {
-            'aliases': aliases,
-            'averageFlagCount': 0.0,
-            'commonFlags': [],
-            'createdAt': now,
-            'lastSubmission': now,
-            'name': name,
-            'normalizedName': normalized_name,
-            'severityTrends': {
-                'light': 0,
-                'medium': 0
-            },
-            'submissionCount': 0,
-            'updatedAt': now
-        }
+        with ParallelNameCleaner(workers) as name_cleaner:
+            for chunk_number, chunk in enumerate(self.iter_kaggle_dataset_chunks(chunksize), start=1):
+                rows_read += len(chunk)
+                clean_chunk = self.clean_company_data(chunk, name_cleaner=name_cleaner)
+                
+                # Drop names already seen in earlier chunks
+                clean_chunk = clean_chunk[seen.first_seen(clean_chunk['name'])]
+                
+                logger.info(f"Chunk {chunk_number}: {rows_read} rows read, {len(clean_chunk)} new companies")
+                
+                if not clean_chunk.empty:
+                    yield clean_chunk
 
-    def populate_companies(self, companies_df: pd.DataFrame, limit: int = 1000):
-        """Populate Firebase with company documents"""
-        logger.info(f"Populating Firebase with {min(limit, len(companies_df))} companies...")
+    def iter_deduped_chunks(self, chunksize: int = 100_000, threshold: float = DEFAULT_THRESHOLD,
+                            workers: int = 1) -> Iterator[pd.DataFrame]:
+        """Yield the dataset with near-duplicate names merged, in chunks
         
-        # Limit the number of companies to process
-        companies_to_process = companies_df.head(limit)
+        Clustering needs every name at once, so the cleaned name column of
+        the whole dataset is held in memory before the first chunk is yielded.
+        """
+        clean_chunks = list(self.iter_clean_chunks(chunksize, workers))
+        if not clean_chunks:
+            return
+        companies = dedupe_company_names(pd.concat(clean_chunks, ignore_index=True)['name'], threshold)
+        for start in range(0, len(companies), chunksize):
+            yield companies.iloc[start:start + chunksize]
+
+    def stream_and_populate(self, limit: Optional[int] = None, chunksize: int = 100_000,
+                            max_in_flight: int = 8, dedup_threshold: Optional[float] = None,
+                            autocomplete: Optional[AutocompletePrefixes] = None, workers: int = 1,
+                            checkpoint: Optional[PopulateCheckpoint] = None, shard: Optional[Shard] = None) -> int:
+        """Clean and populate the Kaggle dataset chunk by chunk
         
-        batch_size = 500
+        Pass dedup_threshold to merge near-duplicate names first; chunks are
+        cleaned on `workers` processes. With a checkpoint, companies before
+        its offset in the cleaned stream are skipped. With a shard, only the
+        companies of that shard are populated.
+        """
         total_added = 0
+        position = 0
+        if dedup_threshold is None:
+            chunks = self.iter_clean_chunks(chunksize, workers)
+        else:
+            chunks = self.iter_deduped_chunks(chunksize, dedup_threshold, workers)
         
-        for i in range(0, len(companies_to_process), batch_size):
-            batch = companies_to_process.iloc[i:i + batch_size]
-            
-            # Create batch write
-            batch_write = self.db.batch()
+        for clean_chunk in chunks:
+            clean_chunk = select_shard(clean_chunk, shard)
+            if limit is not None:
+                clean_chunk = clean_chunk.head(limit - position)
+            total_added += self.populate_companies(clean_chunk, limit=len(clean_chunk), max_in_flight=max_in_flight,
+                                                   autocomplete=autocomplete, checkpoint=checkpoint, offset=position)
+            position += len(clean_chunk)
             
-            for _, row in batch.iterrows():
-                company_name = row['name']
-                company_doc = self.create_company_document(company_name)
-                
-                # Create document reference
-                doc_ref = self.db.collection('companies').document()
-                batch_write.set(doc_ref, company_doc)
+            if limit is not None and position >= limit:
+                logger.info(f"Reached limit of {limit} companies")
+                break
+        
+        logger.info(f"Streaming ingest finished: {total_added} companies added")
+        return total_added
+
+    def sync_companies(self, chunks: Iterable[pd.DataFrame], manifest_path: str = DEFAULT_MANIFEST_PATH,
+                       max_in_flight: int = 8, delete_missing: bool = True,
+                       autocomplete: Optional[AutocompletePrefixes] = None) -> Dict[str, int]:
+        """Incrementally create, update and delete companies against the local manifest"""
+        manifest = IngestManifest(manifest_path)
+        try:
+            if manifest.count('companies', script='clean_and_populate_firebase') == 0:
+                logger.warning(
+                    "Manifest is empty: every company is looked up before it is written. Existing "
+                    "documents are merged, keeping their submission stats; only missing ones are created. "
+                    "Documents with auto-generated IDs (the sample fallback, --no-manifest imports) are not "
+                    "matched and stay as duplicates."
+                )
             
-            # Commit batch
+            upserter = CompanyUpserter(self.db, manifest, max_in_flight=max_in_flight,
+                                       script='clean_and_populate_firebase', autocomplete=autocomplete,
+                                       write_rate=self.write_rate)
             try:
-                batch_write.commit()
-                total_added += len(batch)
-                logger.info(f"Added batch {i//batch_size + 1}: {len(batch)} companies")
-            except Exception as e:
-                logger.error(f"Error committing batch {i//batch_size + 1}: {e}")
-        
-        logger.info(f"Successfully added {total_added} companies to Firebase")
+                for chunk in chunks:
+                    upserter.upsert(chunk)
+            except Exception:
+                # Flush what was queued, but never delete after a partial read
+                upserter.finish(delete_missing=False)
+                raise
+            return upserter.finish(delete_missing=delete_missing)
+        finally:
+            manifest.close()
 
     def verify_population(self):
         """Verify that companies were properly added"""
@@ -357,37 +439,209 @@ class FirebaseCleaner:
 
 def main():
     """Main execution function"""
-    logger.info("Starting Firebase cleanup and population process")
+    parser = argparse.ArgumentParser(description='Clean Firebase and populate it with the Kaggle company dataset')
+    parser.add_argument('--limit', type=int, default=None,
+                       help='Maximum number of companies to add (default: the whole dataset)')
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                       help='Ingest only shard i/N (0 <= i < N) of the companies, partitioned by normalized name')
+    parser.add_argument('--cleanup-only', action='store_true',
+                       help='Only clean the collections, e.g. once before starting the shards of a full run')
+    parser.add_argument('--rebuild-autocomplete', action='store_true',
+                       help='Only rebuild the autocomplete prefixes from the companies collection, '
+                            'e.g. once every shard has finished')
+    parser.add_argument('--stream', action='store_true',
+                       help='Read the dataset in chunks and populate as each chunk is cleaned')
+    parser.add_argument('--chunksize', type=int, default=100_000,
+                       help='Rows per chunk in streaming mode')
+    parser.add_argument('--max-in-flight', type=int, default=8,
+                       help='Maximum number of batches committing at the same time')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Upsert changed companies by normalizedName instead of wiping and reloading')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_PATH,
+                       help='Local manifest of written companies used by --incremental')
+    parser.add_argument('--fuzzy-dedup', action='store_true',
+                       help='Merge near-duplicate company names into one company with merged aliases')
+    parser.add_argument('--similarity', type=float, default=DEFAULT_THRESHOLD,
+                       help='Minimum name similarity (0-1) for --fuzzy-dedup to merge two names')
+    parser.add_argument('--clean-workers', type=int, default=os.cpu_count() or 1,
+                       help='Processes used to clean company names (default: one per CPU)')
+    parser.add_argument('--no-autocomplete', action='store_true',
+                       help='Skip updating the autocomplete_prefixes collection')
+    parser.add_argument('--autocomplete-top-k', type=int, default=DEFAULT_TOP_K,
+                       help='Companies kept per autocomplete prefix document')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted full population from its checkpoint, skipping the cleanup')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                       help='Checkpoint written after every committed batch of a full population')
+    parser.add_argument('--dataset-cache', default=DEFAULT_CACHE_DIR,
+                       help='Directory of the Parquet copies of the Kaggle dataset, converted once per version')
+    add_write_rate_arguments(parser)
+    add_metrics_arguments(parser)
     
-    try:
-        # Initialize Firebase cleaner
-        cleaner = FirebaseCleaner()
-        
-        # Step 1: Clean existing collections
-        logger.info("Step 1: Cleaning existing collections")
-        cleaner.clean_collections()
-        
-        # Step 2: Download Kaggle dataset
-        logger.info("Step 2: Downloading Kaggle dataset")
-        df = cleaner.download_kaggle_dataset()
-        
-        # Step 3: Clean company data
-        logger.info("Step 3: Cleaning company data")
-        clean_df = cleaner.clean_company_data(df)
-        
-        # Step 4: Populate Firebase
-        logger.info("Step 4: Populating Firebase")
-        cleaner.populate_companies(clean_df, limit=1000)  # Adjust limit as needed
-        
-        # Step 5: Verify population
-        logger.info("Step 5: Verifying population")
-        cleaner.verify_population()
-        
-        logger.info("Firebase cleanup and population completed successfully!")
+    args = parser.parse_args()
+    if args.incremental and args.limit is not None:
+        # Companies beyond the limit would be missing from the run and deleted
+        parser.error("--limit cannot be combined with --incremental")
+    dedup_threshold = args.similarity if args.fuzzy_dedup else None
+    
+    with run_metrics_from_args('clean_and_populate_firebase', args):
+        logger.info("Starting Firebase cleanup and population process")
         
-    except Exception as e:
-        logger.error(f"Process failed: {e}")
-        sys.exit(1)
+        try:
+            # Initialize Firebase cleaner
+            write_rate = write_rate_from_args(args)
+            cleaner = FirebaseCleaner(write_rate=write_rate, dataset_cache=DatasetCache(args.dataset_cache))
+            
+            if args.cleanup_only:
+                logger.info("Cleaning existing collections only")
+                with stage('purge'):
+                    cleaner.clean_collections(workers=args.max_in_flight,
+                                              manifest_paths=existing_shard_paths(args.manifest))
+                return
+            
+            if args.rebuild_autocomplete:
+                logger.info("Rebuilding autocomplete prefix documents from the companies collection")
+                autocomplete = AutocompletePrefixes(cleaner.db, top_k=args.autocomplete_top_k,
+                                                    max_in_flight=args.max_in_flight, write_rate=write_rate)
+                with stage('autocomplete') as span:
+                    span['rows'] = autocomplete.rebuild()['prefixes']
+                return
+            
+            autocomplete = None
+            if args.shard and not args.no_autocomplete:
+                # Shards would overwrite each other's prefix documents
+                logger.warning("Shards don't update autocomplete prefixes; run with --rebuild-autocomplete "
+                               "once every shard has finished")
+            elif not args.no_autocomplete:
+                autocomplete = AutocompletePrefixes(cleaner.db, top_k=args.autocomplete_top_k,
+                                                    max_in_flight=args.max_in_flight, write_rate=write_rate)
+            
+            # Shards running on the same host keep separate local state
+            checkpoint_path = shard_path(args.checkpoint, args.shard)
+            manifest_path = shard_path(args.manifest, args.shard)
+            
+            if args.incremental:
+                # Steps 1-4: Diff the full dataset against the manifest instead of wiping
+                logger.info("Steps 1-4: Incrementally syncing Kaggle dataset into Firebase")
+                if args.stream and args.fuzzy_dedup:
+                    chunks = cleaner.iter_deduped_chunks(args.chunksize, args.similarity, args.clean_workers)
+                elif args.stream:
+                    chunks = cleaner.iter_clean_chunks(args.chunksize, args.clean_workers)
+                else:
+                    with stage('download') as span:
+                        df = cleaner.download_kaggle_dataset()
+                        span['rows'] = len(df)
+                    chunks = [cleaner.clean_company_data(df, workers=args.clean_workers)]
+                    if args.fuzzy_dedup:
+                        with stage('dedup', rows=len(chunks[0])):
+                            chunks = [dedupe_company_names(chunks[0]['name'], args.similarity)]
+                if args.shard:
+                    # Each shard's manifest only holds its own companies, so deletes stay within the shard
+                    chunks = (select_shard(chunk, args.shard) for chunk in chunks)
+                
+                # Deleting companies missing from the sample fallback would empty the collection
+                with stage('sync') as span:
+                    counts = cleaner.sync_companies(
+                        chunks,
+                        manifest_path=manifest_path,
+                        max_in_flight=args.max_in_flight,
+                        delete_missing=not cleaner.used_sample_fallback,
+                        autocomplete=autocomplete,
+                    )
+                    span['rows'] = counts['created'] + counts['updated'] + counts['unchanged']
+            else:
+                resuming = args.resume and os.path.exists(checkpoint_path)
+                if resuming:
+                    logger.info(f"Step 1: Skipped, resuming from checkpoint {checkpoint_path}")
+                else:
+                    if args.resume:
+                        logger.warning(f"No checkpoint at {checkpoint_path}, starting a full run")
+                    # A checkpoint left by an earlier run must not outlive the cleanup
+                    clear_checkpoint(checkpoint_path)
+                    
+                    if args.shard:
+                        # One shard wiping the collection would delete the others' writes
+                        logger.info(f"Step 1: Skipped for shard {args.shard}; run --cleanup-only once beforehand")
+                    else:
+                        # Step 1: Clean existing collections
+                        logger.info("Step 1: Cleaning existing collections")
+                        with stage('purge'):
+                            cleaner.clean_collections(workers=args.max_in_flight,
+                                                      manifest_paths=existing_shard_paths(args.manifest))
+                
+                checkpoint = None
+                if args.stream:
+                    # Steps 2-4: Download, clean and populate chunk by chunk
+                    logger.info("Steps 2-4: Streaming Kaggle dataset into Firebase")
+                    try:
+                        # Offsets count cleaned companies, whose order depends on the file and dedup
+                        checkpoint = PopulateCheckpoint(checkpoint_path, cleaner.resolve_kaggle_dataset()['sha1'],
+                                                        {'fuzzy_dedup': dedup_threshold,
+                                                         'shard': str(args.shard) if args.shard else None},
+                                                        resume=resuming)
+                        with stage('stream') as span:
+                            span['rows'] = cleaner.stream_and_populate(
+                                limit=args.limit, chunksize=args.chunksize, max_in_flight=args.max_in_flight,
+                                dedup_threshold=dedup_threshold, autocomplete=autocomplete,
+                                workers=args.clean_workers, checkpoint=checkpoint, shard=args.shard)
+                    except CheckpointMismatch:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Streaming ingest failed: {e}")
+                        if resuming or cleaner.companies_written:
+                            # Samples on top of a partly populated collection would mix the two;
+                            # the checkpoint lets --resume continue from the last committed batch
+                            logger.error("Companies were already written, not falling back to sample "
+                                         "companies; rerun with --resume to continue")
+                            raise
+                        logger.info("Falling back to sample companies...")
+                        # Nothing of the stream was written, so there is nothing to resume
+                        clear_checkpoint(checkpoint_path)
+                        checkpoint = None
+                        clean_df = select_shard(cleaner.clean_company_data(cleaner.create_sample_companies()),
+                                                args.shard)
+                        cleaner.populate_companies(clean_df, limit=args.limit, max_in_flight=args.max_in_flight,
+                                                   autocomplete=autocomplete)
+                else:
+                    # Step 2: Download Kaggle dataset
+                    logger.info("Step 2: Downloading Kaggle dataset")
+                    with stage('download') as span:
+                        df = cleaner.download_kaggle_dataset()
+                        span['rows'] = len(df)
+                
+                    # Step 3: Clean company data
+                    logger.info("Step 3: Cleaning company data")
+                    clean_df = cleaner.clean_company_data(df, workers=args.clean_workers)
+                    if args.fuzzy_dedup:
+                        with stage('dedup', rows=len(clean_df)):
+                            clean_df = dedupe_company_names(clean_df['name'], args.similarity)
+                    clean_df = select_shard(clean_df, args.shard)
+                
+                    # Step 4: Populate Firebase
+                    logger.info("Step 4: Populating Firebase")
+                    checkpoint = PopulateCheckpoint(checkpoint_path, frame_hash(clean_df['name']), resume=resuming)
+                    cleaner.populate_companies(clean_df, limit=args.limit, max_in_flight=args.max_in_flight,
+                                               autocomplete=autocomplete, checkpoint=checkpoint)
+                
+                if checkpoint is not None:
+                    checkpoint.complete()
+            
+            if autocomplete is not None:
+                # A full reload emptied the prefix collection along with the companies
+                logger.info("Updating autocomplete prefix documents")
+                with stage('autocomplete') as span:
+                    span['rows'] = autocomplete.write(merge_existing=args.incremental)['prefixes']
+            
+            # Step 5: Verify population
+            logger.info("Step 5: Verifying population")
+            with stage('verify'):
+                cleaner.verify_population()
+            
+            logger.info("Firebase cleanup and population completed successfully!")
+            
+        except Exception as e:
+            logger.error(f"Process failed: {e}")
+            sys.exit(1)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,100 +1,70 @@
-import kagglehub
 import pandas as pd
 import json
+import argparse
 from pathlib import Path
-import re
-
-def normalize_company_name(name: str) -> str:
-    """Normalize company name for consistent searching"""
-    if not name:
-        return ""
-    
-    normalized = name.lower().strip()
-    # Remove common suffixes
-    normalized = re.sub(r'\b(inc|corp|corporation|llc|ltd|limited|co|company|group|holdings|enterprises|ventures|partners|associates)\b', '', normalized)
-    # Remove common prefixes
-    normalized = re.sub(r'\b(the|a|an)\b', '', normalized)
-    # Remove special characters except hyphens and spaces
-    normalized = re.sub(r'[^\w\s-]', '', normalized)
-    # Normalize whitespace
-    normalized = re.sub(r'\s+', ' ', normalized).strip()
-    
-    return normalized
-
-def generate_aliases(name: str, website: str = "") -> list:
-    """Generate common aliases for a company name"""
-    aliases = []
-    
-    if not name:
-        return aliases
-    
-    # Add original name
-    aliases.append(name.strip())
-    
-    # Add lowercase version
-    aliases.append(name.lower().strip())
-    
-    # Add without common suffixes
-    name_clean = re.sub(r'\b(inc|corp|corporation|llc|ltd|limited|co|company|group|holdings|enterprises|ventures|partners|associates)\b', '', name.lower())
-    name_clean = re.sub(r'\s+', ' ', name_clean).strip()
-    if name_clean and name_clean != name.lower().strip():
-        aliases.append(name_clean)
-    
-    # Add domain-based alias if website exists
-    if website:
-        try:
-            from urllib.parse import urlparse
-            domain = urlparse(website).netloc
-            if domain and domain != name.lower():
-                aliases.append(domain)
-                # Add without www
-                if domain.startswith('www.'):
-                    aliases.append(domain[4:])
-        except:
-            pass
-    
-    # Remove duplicates and empty strings
-    aliases = list(set([alias for alias in aliases if alias.strip()]))
-    
-    return aliases
-
-def clean_and_export_companies():
-    """Clean and export company data for Firebase import with unified structure"""
-    
-    print("Loading company dataset...")
-    # Download latest version
-    path = kagglehub.dataset_download("proxycurl/10000-us-company-profiles")
-    dataset_path = Path(path)
-    data_file = list(dataset_path.glob("*.txt"))[0]
-    
-    # Load the dataset
-    df = pd.read_json(data_file, lines=True)
-    print(f"Original dataset shape: {df.shape}")
+
+from company_columnar import ColumnarWriter
+from company_fields import flatten_nested_fields
+from company_names import normalize_search_names, generate_search_aliases_batch
+from dataset_cache import DEFAULT_CACHE_DIR, PROFILES_DATASET, DatasetCache
+from run_metrics import add_metrics_arguments, run_metrics_from_args, stage
+from search_index import DEFAULT_INDEX_PATH, SearchIndex
+
+RELEVANT_COLUMNS = [
+    'name', 'website', 'industry', 'company_size',
+    'hq', 'company_type', 'founded_year', 'specialities', 'locations'
+]
+
+OUTPUT_FILES = {
+    'json': 'us_companies_cleaned.json',
+    'ndjson': 'us_companies_cleaned.ndjson',
+    'parquet': 'us_companies_cleaned.parquet',
+    'arrow': 'us_companies_cleaned.arrow',
+}
+
+# Formats written chunk by chunk in file order instead of sorted in memory
+STREAMING_FORMATS = ['ndjson', 'parquet', 'arrow']
+
+DEFAULT_CHUNKSIZE = 10000
+
+def find_data_file(cache):
+    """Download the dataset (cached by kagglehub) and return its cache entry
     
-    # Select relevant columns
-    relevant_columns = [
-        'name', 'website', 'industry', 'company_size', 
-        'hq', 'company_type', 'founded_year', 'specialities', 'locations'
-    ]
+    The JSON lines file is parsed once into a Parquet copy that later runs
+    read instead.
+    """
+    return cache.resolve(PROFILES_DATASET)
+
+def relevant_columns(dataset):
+    """The RELEVANT_COLUMNS a cached dataset has, so only those are read"""
+    return [col for col in RELEVANT_COLUMNS if col in dataset['columns']]
+
+def clean_frame(df, verbose=True):
+    """Select the relevant columns and clean them; duplicates are left to the caller"""
+    log = print if verbose else (lambda *args, **kwargs: None)
     
     # Check which columns exist
-    existing_columns = [col for col in relevant_columns if col in df.columns]
-    missing_columns = [col for col in relevant_columns if col not in df.columns]
+    existing_columns = [col for col in RELEVANT_COLUMNS if col in df.columns]
+    missing_columns = [col for col in RELEVANT_COLUMNS if col not in df.columns]
     
     if missing_columns:
-        print(f"Warning: Missing columns: {missing_columns}")
+        log(f"Warning: Missing columns: {missing_columns}")
     
     # Select only existing columns
     df_clean = df[existing_columns].copy()
-    print(f"Selected columns: {existing_columns}")
+    log(f"Selected columns: {existing_columns}")
     
-    # Clean the data
-    print("\nCleaning data...")
+    # Keep founded_year numeric even in chunks where it is entirely missing
+    if 'founded_year' in df_clean.columns:
+        df_clean['founded_year'] = pd.to_numeric(df_clean['founded_year'], errors='coerce')
     
     # Remove rows with missing company names
     initial_count = len(df_clean)
     df_clean = df_clean.dropna(subset=['name'])
-    print(f"Removed {initial_count - len(df_clean)} rows with missing names")
+    log(f"Removed {initial_count - len(df_clean)} rows with missing names")
+    
+    # Parse hq, specialities and locations per column into flat string columns
+    df_clean = flatten_nested_fields(df_clean)
     
     # Strip whitespace from string columns
     string_columns = df_clean.select_dtypes(include=['object']).columns
@@ -103,7 +73,7 @@ def clean_and_export_companies():
     
     # Remove empty names
     df_clean = df_clean[df_clean['name'].str.len() > 0]
-    print(f"Removed {initial_count - len(df_clean)} rows with empty names")
+    log(f"Removed {initial_count - len(df_clean)} rows with empty names")
     
     # Fill missing values with empty strings for string columns
     for col in string_columns:
@@ -114,60 +84,49 @@ def clean_and_export_companies():
     for col in numeric_columns:
         df_clean[col] = df_clean[col].fillna(0)
     
-    # Remove duplicates based on name and website
-    initial_count = len(df_clean)
-    df_clean = df_clean.drop_duplicates(subset=['name', 'website'])
-    print(f"Removed {initial_count - len(df_clean)} duplicate rows")
-    
-    # Sort by name for easier browsing
-    df_clean = df_clean.sort_values('name')
-    
-    print(f"\nFinal cleaned dataset shape: {df_clean.shape}")
-    
-    # Show sample of cleaned data
-    print("\nSample of cleaned companies:")
-    print(df_clean.head(5)[['name', 'industry', 'company_size', 'hq']].to_string())
-    
-    # Export to JSON with unified structure
-    output_file = 'us_companies_cleaned.json'
-    
-    # Convert to list of dictionaries for JSON export with unified structure
-    companies_list = []
-    for _, row in df_clean.iterrows():
-        company_name = str(row['name']).strip()
-        website = str(row['website']).strip()
-        
-        # Generate normalized name and aliases
-        normalized_name = normalize_company_name(company_name)
-        aliases = generate_aliases(company_name, website)
-        
-        # Extract location from HQ if available
-        location = ""
-        if row['hq'] and str(row['hq']) != 'nan':
-            try:
-                hq_data = json.loads(str(row['hq'])) if isinstance(row['hq'], str) else row['hq']
-                if isinstance(hq_data, dict):
-                    city = hq_data.get('city', '')
-                    state = hq_data.get('state', '')
-                    if city and state:
-                        location = f"{city}, {state}"
-                    elif city:
-                        location = city
-            except:
-                location = str(row['hq'])
-        
-        company_dict = {
+    return df_clean
+
+def text_column(df_clean, col):
+    """A column as a list of stripped strings, empty for falsy values"""
+    return [str(value).strip() if value else "" for value in df_clean[col].tolist()]
+
+def company_records(df_clean):
+    """Yield export records for a cleaned frame
+
+    Every field is computed for the whole column first, so no pandas
+    object is created per row.
+    """
+    # Generate normalized names and aliases for the whole column at once
+    names = df_clean['name'].astype(str).str.strip()
+    websites = df_clean['website'].astype(str).str.strip()
+    normalized_names = normalize_search_names(names).tolist()
+    aliases_list = generate_search_aliases_batch(names, websites)
+    
+    founded_years = pd.to_numeric(df_clean['founded_year'], errors='coerce').fillna(0)
+    founded_years = founded_years.where(founded_years > 0, 0).astype('int64').tolist()
+    
+    columns = zip(
+        names.tolist(), normalized_names, aliases_list, websites.tolist(),
+        text_column(df_clean, 'location'),
+        text_column(df_clean, 'industry'), text_column(df_clean, 'company_size'),
+        text_column(df_clean, 'company_type'), founded_years,
+        text_column(df_clean, 'specialities'), text_column(df_clean, 'locations'),
+    )
+    
+    for (company_name, normalized_name, aliases, website, location, industry,
+         company_size, company_type, founded_year, specialities, locations) in columns:
+        yield {
             "name": company_name,
             "normalizedName": normalized_name,
             "aliases": aliases,
             "website": website,
             "location": location,
-            "industry": str(row['industry']).strip() if row['industry'] else "",
-            "company_size": str(row['company_size']).strip() if row['company_size'] else "",
-            "company_type": str(row['company_type']).strip() if row['company_type'] else "",
-            "founded_year": int(row['founded_year']) if row['founded_year'] and row['founded_year'] > 0 else 0,
-            "specialities": str(row['specialities']).strip() if row['specialities'] else "",
-            "locations": str(row['locations']).strip() if row['locations'] else "",
+            "industry": industry,
+            "company_size": company_size,
+            "company_type": company_type,
+            "founded_year": founded_year,
+            "specialities": specialities,
+            "locations": locations,
             
             # Initialize dynamic fields (will be populated by submissions)
             "submissionCount": 0,
@@ -181,29 +140,164 @@ def clean_and_export_companies():
             "createdAt": None,
             "updatedAt": None
         }
+
+def iter_clean_chunks(cache, dataset, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield cleaned frames from the cached dataset without loading it whole
+    
+    Duplicates are dropped across chunks by hashing (name, website), so only
+    the hashes of companies already seen stay in memory.
+    """
+    seen = set()
+    for chunk in cache.iter_frames(dataset, chunksize, columns=relevant_columns(dataset)):
+        df_clean = clean_frame(chunk, verbose=False)
+        if df_clean.empty:
+            continue
         
-        companies_list.append(company_dict)
+        keys = pd.util.hash_pandas_object(df_clean[['name', 'website']], index=False).to_numpy()
+        keep = [not (key in seen or seen.add(key)) for key in keys.tolist()]
+        df_clean = df_clean[keep]
+        if not df_clean.empty:
+            yield df_clean
+
+class ExportStats:
+    """Running statistics over the exported companies, optionally feeding a search index"""
+    def __init__(self, samples=5, search_index=None):
+        self.search_index = search_index
+        self.total = 0
+        self.with_website = 0
+        self.with_industry = 0
+        self.with_location = 0
+        self.samples = []
+        self._max_samples = samples
+    
+    def add(self, company):
+        self.total += 1
+        self.with_website += bool(company['website'])
+        self.with_industry += bool(company['industry'])
+        self.with_location += bool(company['location'])
+        if len(self.samples) < self._max_samples:
+            self.samples.append(company)
+        if self.search_index is not None:
+            self.search_index.upsert(company)
+
+def write_json(records, f, stats):
+    """Write records as an indented JSON array without building the list first"""
+    f.write('[')
+    for i, company in enumerate(records):
+        stats.add(company)
+        encoded = json.dumps(company, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        f.write(f"{',' if i else ''}\n  {encoded}")
+    f.write('\n]' if stats.total else ']')
+
+def write_ndjson(records, f, stats):
+    """Write one JSON object per line"""
+    for company in records:
+        stats.add(company)
+        f.write(json.dumps(company, ensure_ascii=False))
+        f.write('\n')
+
+def write_columnar(records, writer, stats):
+    """Append records to a Parquet/Arrow file as one record batch"""
+    companies = list(records)
+    for company in companies:
+        stats.add(company)
+    writer.write(companies)
+
+def clean_and_export_companies(output_format='json', output_file=None, chunksize=DEFAULT_CHUNKSIZE,
+                               index_path=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Clean and export company data for Firebase import with unified structure
+    
+    The json format loads and sorts the whole dataset; ndjson, parquet and
+    arrow stream it chunk by chunk in file order. With index_path, a search
+    index of the exported companies is written too. Returns the number of
+    companies exported.
+    """
     
-    # Save to JSON file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(companies_list, f, indent=2, ensure_ascii=False)
+    output_file = output_file or OUTPUT_FILES[output_format]
+    stats = ExportStats(search_index=SearchIndex() if index_path else None)
     
-    print(f"\nExported {len(companies_list)} companies to: {output_file}")
+    print("Loading company dataset...")
+    # Download latest version
+    cache = DatasetCache(cache_dir)
+    dataset = find_data_file(cache)
+    data_file = Path(dataset['source'])
+    
+    if output_format in STREAMING_FORMATS:
+        print(f"Streaming {data_file.name} in chunks of {chunksize} rows...")
+        if output_format == 'ndjson':
+            sink = open(output_file, 'w', encoding='utf-8')
+            write = write_ndjson
+        else:
+            sink = ColumnarWriter(output_file, output_format)
+            write = write_columnar
+        with sink:
+            for df_clean in iter_clean_chunks(cache, dataset, chunksize):
+                write(company_records(df_clean), sink, stats)
+                print(f"✓ Exported {stats.total} companies so far")
+    else:
+        # Load the dataset
+        df = cache.load(dataset, columns=relevant_columns(dataset))
+        print(f"Original dataset shape: {df.shape}")
+    
+        # Clean the data
+        print("\nCleaning data...")
+        df_clean = clean_frame(df)
+    
+        # Remove duplicates based on name and website
+        initial_count = len(df_clean)
+        df_clean = df_clean.drop_duplicates(subset=['name', 'website'])
+        print(f"Removed {initial_count - len(df_clean)} duplicate rows")
+    
+        # Sort by name for easier browsing
+        df_clean = df_clean.sort_values('name')
+    
+        print(f"\nFinal cleaned dataset shape: {df_clean.shape}")
+    
+        # Show sample of cleaned data
+        print("\nSample of cleaned companies:")
+        print(df_clean.head(5)[['name', 'industry', 'company_size', 'location']].to_string())
+    
+        # Save to JSON file with unified structure
+        with open(output_file, 'w', encoding='utf-8') as f:
+            write_json(company_records(df_clean), f, stats)
+    
+    print(f"\nExported {stats.total} companies to: {output_file}")
+    if index_path:
+        with stage('search_index', rows=len(stats.search_index.companies)):
+            stats.search_index.save(index_path)
+        print(f"Wrote search index for {len(stats.search_index.companies)} companies to: {index_path}")
     
     # Show some statistics
     print(f"\nDataset statistics:")
-    print(f"- Total companies: {len(companies_list)}")
-    print(f"- Companies with websites: {sum(1 for c in companies_list if c['website'])}")
-    print(f"- Companies with industry: {sum(1 for c in companies_list if c['industry'])}")
-    print(f"- Companies with location: {sum(1 for c in companies_list if c['location'])}")
+    print(f"- Total companies: {stats.total}")
+    print(f"- Companies with websites: {stats.with_website}")
+    print(f"- Companies with industry: {stats.with_industry}")
+    print(f"- Companies with location: {stats.with_location}")
     
     # Show sample of normalized names and aliases
     print(f"\nSample normalized names and aliases:")
-    for i, company in enumerate(companies_list[:5]):
+    for i, company in enumerate(stats.samples):
         print(f"{i+1}. '{company['name']}' → '{company['normalizedName']}'")
         print(f"   Aliases: {company['aliases'][:3]}...")
     
-    return companies_list
+    return stats.total
 
 if __name__ == "__main__":
-    companies = clean_and_export_companies() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Clean the Kaggle company profiles and export them for import')
+    parser.add_argument('--format', choices=sorted(OUTPUT_FILES), default='json',
+                       help='json: one sorted, indented array; ndjson: one company per line; '
+                            'parquet/arrow: typed columnar file (all but json are streamed)')
+    parser.add_argument('--output', default=None,
+                       help='Output path (default: us_companies_cleaned.<format>)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                       help='Rows read per chunk in the streaming formats')
+    parser.add_argument('--search-index', nargs='?', const=DEFAULT_INDEX_PATH, default=None,
+                       help=f'Also write a search index of the export (default path: {DEFAULT_INDEX_PATH})')
+    parser.add_argument('--dataset-cache', default=DEFAULT_CACHE_DIR,
+                       help='Directory of the Parquet copies of the Kaggle dataset, converted once per version')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    
+    with run_metrics_from_args('clean_export_companies', args), stage('export') as span:
+        span['rows'] = clean_and_export_companies(args.format, args.output, args.chunksize, args.search_index,
+                                                  args.dataset_cache)
@@ -1,9 +1,63 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 import os
+import argparse
 from datetime import datetime
 
-def cleanup_firebase_data():
+from batch_committer import BatchCommitter
+from firestore_scan import iter_pages
+from firestore_stats import DEFAULT_SAMPLE_SIZE, company_statistics, count_documents
+
+def delete_documents(db, collection_ref, total=None):
+    """Delete every document in a collection, paging through references only"""
+    total_deleted = 0
+    
+    with BatchCommitter(db) as committer:
+        for page_number, page in enumerate(iter_pages(collection_ref, page_size=500, fields=[]), start=1):
+            for doc in page:
+                committer.delete(doc.reference)
+            total_deleted += len(page)
+            progress = f"{total_deleted}/{total}" if total else f"{total_deleted}"
+            print(f"   ✓ Queued batch {page_number}: {progress}")
+    
+    if committer.stats.documents_failed:
+        print(f"   ⚠ {committer.stats.documents_failed} documents failed to delete")
+    return committer.stats.documents_written
+
+def find_old_format_companies(companies_ref):
+    """Return IDs of companies without a normalizedName in a single projected pass"""
+    total = 0
+    old_format_ids = []
+    
+    for page in iter_pages(companies_ref, fields=['normalizedName']):
+        for doc in page:
+            total += 1
+            if not (doc.to_dict() or {}).get('normalizedName'):
+                old_format_ids.append(doc.id)
+    
+    return total, old_format_ids
+
+def print_storage_statistics(db, sample_size):
+    """Print company statistics from aggregation queries and a sampled size estimate"""
+    try:
+        stats = company_statistics(db, sample_size=sample_size)
+        total_companies = stats['total']
+        companies_with_submissions = stats['with_submissions']
+        
+        print(f"   📊 Total companies: {total_companies}")
+        print(f"   📊 Companies with submissions: {companies_with_submissions}")
+        print(f"   📊 Companies without submissions: {total_companies - companies_with_submissions}")
+        print(f"   📊 Submissions recorded on companies: {stats['submissions_recorded']}")
+        
+        if total_companies > 0:
+            print(f"   💾 Estimated storage: ~{stats['storage_bytes'] / 1024:.0f}KB for companies "
+                  f"(~{stats['average_bytes']:.0f} bytes/doc from {stats['sampled']} documents sampled "
+                  f"at random ID positions; IDs not following the auto or hex ID scheme may bias this)")
+            
+    except Exception as e:
+        print(f"   ❌ Error getting statistics: {e}")
+
+def cleanup_firebase_data(stats_only=False, sample_size=DEFAULT_SAMPLE_SIZE):
     """Clean up excess Firebase data to free up storage quota"""
     
     print("Setting up Firebase connection...")
@@ -31,34 +85,22 @@ def cleanup_firebase_data():
     # Initialize Firestore
     db = firestore.client()
     
+    if stats_only:
+        print("\n📊 Storage Statistics:")
+        print_storage_statistics(db, sample_size)
+        return
+    
     print("\n🧹 Starting Firebase cleanup...")
     
     # 1. Clean up old company_insights collection
     print("\n1. Cleaning up old company_insights collection...")
     try:
         insights_ref = db.collection('company_insights')
-        insights_snapshot = insights_ref.get()
+        total_deleted = delete_documents(db, insights_ref, total=None)
         
-        if len(insights_snapshot) == 0:
+        if total_deleted == 0:
             print("   ✓ No company_insights documents found")
         else:
-            print(f"   📊 Found {len(insights_snapshot)} company_insights documents")
-            
-            # Delete in batches
-            batch_size = 500
-            total_deleted = 0
-            
-            for i in range(0, len(insights_snapshot), batch_size):
-                batch = insights_snapshot[i:i + batch_size]
-                batch_write = db.batch()
-                
-                for doc in batch:
-                    batch_write.delete(doc.reference)
-                
-                batch_write.commit()
-                total_deleted += len(batch)
-                print(f"   ✓ Deleted batch {i//batch_size + 1}: {total_deleted}/{len(insights_snapshot)}")
-            
             print(f"   🎉 Successfully deleted {total_deleted} company_insights documents")
             
     except Exception as e:
@@ -68,34 +110,19 @@ def cleanup_firebase_data():
     print("\n2. Checking submissions collection...")
     try:
         submissions_ref = db.collection('submissions')
-        submissions_snapshot = submissions_ref.get()
+        submissions_count = count_documents(submissions_ref)
         
-        if len(submissions_snapshot) == 0:
+        if submissions_count == 0:
             print("   ✓ No submissions documents found")
         else:
-            print(f"   📊 Found {len(submissions_snapshot)} submissions documents")
+            print(f"   📊 Found {submissions_count} submissions documents")
             
             # Ask user if they want to delete submissions
             response = input("   Do you want to delete all submissions? (y/N): ").strip().lower()
             
             if response == 'y':
                 print("   🗑️ Deleting submissions...")
-                
-                # Delete in batches
-                batch_size = 500
-                total_deleted = 0
-                
-                for i in range(0, len(submissions_snapshot), batch_size):
-                    batch = submissions_snapshot[i:i + batch_size]
-                    batch_write = db.batch()
-                    
-                    for doc in batch:
-                        batch_write.delete(doc.reference)
-                    
-                    batch_write.commit()
-                    total_deleted += len(batch)
-                    print(f"   ✓ Deleted batch {i//batch_size + 1}: {total_deleted}/{len(submissions_snapshot)}")
-                
+                total_deleted = delete_documents(db, submissions_ref, total=submissions_count)
                 print(f"   🎉 Successfully deleted {total_deleted} submissions documents")
             else:
                 print("   ✓ Keeping submissions (skipped)")
@@ -107,41 +134,21 @@ def cleanup_firebase_data():
     print("\n3. Checking for old format companies...")
     try:
         companies_ref = db.collection('companies')
-        companies_snapshot = companies_ref.get()
+        total_companies, old_format_ids = find_old_format_companies(companies_ref)
         
-        old_format_companies = []
-        new_format_companies = 0
+        print(f"   📊 Found {total_companies - len(old_format_ids)} new format companies")
+        print(f"   📊 Found {len(old_format_ids)} old format companies")
         
-        for doc in companies_snapshot:
-            data = doc.to_dict()
-            if 'normalizedName' not in data or not data['normalizedName']:
-                old_format_companies.append(doc)
-            else:
-                new_format_companies += 1
-        
-        print(f"   📊 Found {new_format_companies} new format companies")
-        print(f"   📊 Found {len(old_format_companies)} old format companies")
-        
-        if old_format_companies:
+        if old_format_ids:
             response = input("   Do you want to delete old format companies? (y/N): ").strip().lower()
             
             if response == 'y':
                 print("   🗑️ Deleting old format companies...")
                 
-                # Delete in batches
-                batch_size = 500
-                total_deleted = 0
-                
-                for i in range(0, len(old_format_companies), batch_size):
-                    batch = old_format_companies[i:i + batch_size]
-                    batch_write = db.batch()
-                    
-                    for doc in batch:
-                        batch_write.delete(doc.reference)
-                    
-                    batch_write.commit()
-                    total_deleted += len(batch)
-                    print(f"   ✓ Deleted batch {i//batch_size + 1}: {total_deleted}/{len(old_format_companies)}")
+                with BatchCommitter(db) as committer:
+                    for doc_id in old_format_ids:
+                        committer.delete(companies_ref.document(doc_id))
+                total_deleted = committer.stats.documents_written
                 
                 print(f"   🎉 Successfully deleted {total_deleted} old format companies")
             else:
@@ -154,27 +161,17 @@ def cleanup_firebase_data():
     
     # 4. Show storage statistics
     print("\n4. Storage Statistics:")
-    try:
-        companies_ref = db.collection('companies')
-        companies_snapshot = companies_ref.get()
-        
-        total_companies = len(companies_snapshot)
-        companies_with_submissions = sum(1 for doc in companies_snapshot 
-                                       if doc.to_dict().get('submissionCount', 0) > 0)
-        
-        print(f"   📊 Total companies: {total_companies}")
-        print(f"   📊 Companies with submissions: {companies_with_submissions}")
-        print(f"   📊 Companies without submissions: {total_companies - companies_with_submissions}")
-        
-        # Estimate storage savings
-        if total_companies > 0:
-            print(f"   💾 Estimated storage: ~{total_companies * 2}KB for companies")
-            
-    except Exception as e:
-        print(f"   ❌ Error getting statistics: {e}")
+    print_storage_statistics(db, sample_size)
     
     print("\n🎉 Firebase cleanup completed!")
     print("💡 Check your Firebase Console to see the storage reduction")
 
 if __name__ == "__main__":
-    cleanup_firebase_data() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Clean up excess Firebase data')
+    parser.add_argument('--stats-only', action='store_true',
+                       help='Only print storage statistics using aggregation queries')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                       help='Documents sampled to estimate storage size')
+    args = parser.parse_args()
+    
+    cleanup_firebase_data(stats_only=args.stats_only, sample_size=args.sample_size) 
\ No newline at end of file
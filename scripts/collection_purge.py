@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Bulk Firestore Collection Purge
+
+Deletes every document in a collection without one RPC per document:
+
+- Pages through document references in __name__ order with a cursor,
+  using an empty projection so no document bodies are downloaded
+- Deletes each page as one batch, with several batches in flight
+- Logs progress and delete rate as it goes
+- Checkpoints the last fully deleted document ID so an interrupted purge
+  resumes from where it stopped instead of rescanning deleted ranges. A
+  resumed purge ends with one more pass from the start of the collection,
+  since documents may have been written before the checkpoint ID since
+  (cheap when that range is still empty)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from batch_committer import BatchCommitter, MAX_BATCH_SIZE, WriteOp
+from firestore_scan import iter_pages
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = 'purge_checkpoint.json'
+
+
+class CollectionPurger:
+    def __init__(self, db, workers: int = 8, page_size: int = MAX_BATCH_SIZE,
+                 checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT_PATH):
+        """Create a purger; pass checkpoint_path=None to disable checkpoints"""
+        if not 1 <= page_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"page_size must be between 1 and {MAX_BATCH_SIZE}")
+
+        self.db = db
+        self.workers = workers
+        self.page_size = page_size
+        self.checkpoint_path = checkpoint_path
+        self._lock = threading.Lock()
+
+    def purge(self, collection_name: str) -> int:
+        """Delete all documents in a collection and return how many were deleted"""
+        collection_ref = self.db.collection(collection_name)
+
+        last_id = self._load_checkpoint().get(collection_name)
+        if last_id:
+            logger.info(f"Resuming purge of {collection_name} after document {last_id}")
+
+        # Pages are committed out of order, so the checkpoint only advances
+        # over the contiguous prefix of batches that have all committed
+        watermark = {'next': 1, 'done': {}, 'failed': False}
+        start_time = time.monotonic()
+
+        def on_batch_done(batch_number: int, ops: List[WriteOp], succeeded: bool):
+            with self._lock:
+                if not succeeded:
+                    watermark['failed'] = True
+                    return
+                watermark['done'][batch_number] = ops[-1][1].id
+                checkpoint_id = None
+                while not watermark['failed'] and watermark['next'] in watermark['done']:
+                    checkpoint_id = watermark['done'].pop(watermark['next'])
+                    watermark['next'] += 1
+                if checkpoint_id:
+                    self._save_checkpoint(collection_name, checkpoint_id)
+
+        def pages():
+            yield from iter_pages(collection_ref, self.page_size, fields=[], start_after_id=last_id)
+            if last_id:
+                # The checkpoint may predate documents written since, e.g. by a repopulation
+                logger.info(f"{collection_name}: purging the documents before the checkpoint")
+                yield from iter_pages(collection_ref, self.page_size, fields=[])
+
+        with BatchCommitter(self.db, batch_size=self.page_size, max_in_flight=self.workers,
+                            on_batch_done=on_batch_done) as committer:
+            for page in pages():
+                for doc in page:
+                    committer.delete(doc.reference)
+                committer.flush()
+
+                deleted = committer.stats.documents_written
+                elapsed = time.monotonic() - start_time
+                rate = deleted / elapsed if elapsed else 0.0
+                logger.info(f"{collection_name}: {deleted} deleted, {rate:.0f} docs/s")
+
+                if watermark['failed']:
+                    logger.error(f"{collection_name}: a batch failed after retries, stopping purge")
+                    break
+
+        stats = committer.stats
+        elapsed = time.monotonic() - start_time
+        if stats.documents_failed:
+            logger.error(
+                f"{collection_name}: {stats.documents_failed} documents failed to delete; "
+                f"re-run to resume from the checkpoint"
+            )
+        else:
+            self._clear_checkpoint(collection_name)
+
+        logger.info(f"Deleted {stats.documents_written} documents from {collection_name} in {elapsed:.1f}s")
+        return stats.documents_written
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable purge checkpoint {self.checkpoint_path}: {e}")
+            return {}
+
+    def _write_checkpoint(self, checkpoint: Dict[str, Any]):
+        # Write to a temporary file first so a crash never leaves a torn checkpoint
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _save_checkpoint(self, collection_name: str, last_id: str):
+        if not self.checkpoint_path:
+            return
+        checkpoint = self._load_checkpoint()
+        checkpoint[collection_name] = last_id
+        self._write_checkpoint(checkpoint)
+
+    def _clear_checkpoint(self, collection_name: str):
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            checkpoint = self._load_checkpoint()
+            if collection_name not in checkpoint:
+                return
+            del checkpoint[collection_name]
+            if checkpoint:
+                self._write_checkpoint(checkpoint)
+            else:
+                os.remove(self.checkpoint_path)
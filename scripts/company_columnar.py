@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Columnar Company Export Files
+
+Parquet and Arrow IPC files for the export -> import handoff, as a compact
+typed alternative to us_companies_cleaned.json:
+
+- Every file uses the fixed COMPANY_SCHEMA: the exported company fields,
+  typed from the source columns in company_dataset_schema.json (object
+  columns become strings, founded_year becomes an integer instead of
+  float64, aliases a list of strings)
+- Writers append one record batch per cleaned chunk, so the export never
+  holds the whole dataset
+- Readers memory-map the file and yield record batches. Arrow IPC batches
+  are zero-copy views of the mapped file; Parquet is decoded per row group
+  but is several times smaller on disk
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SCHEMA_VERSION = '1'
+
+COMPANY_SCHEMA = pa.schema([
+    ('name', pa.string()),
+    ('normalizedName', pa.string()),
+    ('aliases', pa.list_(pa.string())),
+    ('website', pa.string()),
+    ('location', pa.string()),
+    ('industry', pa.string()),
+    ('company_size', pa.string()),
+    ('company_type', pa.string()),
+    ('founded_year', pa.int32()),
+    ('specialities', pa.string()),
+    ('locations', pa.string()),
+], metadata={'company_schema_version': SCHEMA_VERSION})
+
+COLUMNAR_SUFFIXES = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+
+def columnar_format(path: str) -> Optional[str]:
+    """Return 'parquet' or 'arrow' for columnar export paths, otherwise None"""
+    return COLUMNAR_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def _check_schema(schema: pa.Schema, path: str):
+    if not schema.equals(COMPANY_SCHEMA, check_metadata=False):
+        raise ValueError(f"{path} does not match the company export schema:\n{schema}")
+
+
+class ColumnarWriter:
+    def __init__(self, path: str, file_format: Optional[str] = None):
+        """Open a Parquet or Arrow IPC file for writing; the format defaults to the suffix"""
+        self.path = path
+        self.file_format = file_format or columnar_format(path)
+        if self.file_format == 'parquet':
+            self._writer = pq.ParquetWriter(path, COMPANY_SCHEMA, compression='zstd')
+        elif self.file_format == 'arrow':
+            self._writer = pa.ipc.new_file(path, COMPANY_SCHEMA)
+        else:
+            raise ValueError(f"Unknown columnar format for {path}: {self.file_format}")
+        self.rows_written = 0
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, companies: List[Dict[str, Any]]):
+        """Append companies (export records; extra fields are ignored) as one record batch"""
+        if not companies:
+            return
+        batch = pa.RecordBatch.from_pylist(companies, schema=COMPANY_SCHEMA)
+        if self.file_format == 'parquet':
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write(batch)
+        self.rows_written += batch.num_rows
+
+    def close(self):
+        self._writer.close()
+
+
+def iter_record_batches(path: str, batch_size: int = 500) -> Iterator[pa.RecordBatch]:
+    """Memory-map a columnar export and yield record batches of at most batch_size rows"""
+    if columnar_format(path) == 'parquet':
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        _check_schema(parquet_file.schema_arrow, path)
+        yield from parquet_file.iter_batches(batch_size=batch_size)
+        return
+
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        _check_schema(reader.schema, path)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            # Slices are views into the mapped file, not copies
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size)
+
+
+def batch_to_companies(batch: pa.RecordBatch) -> List[Dict[str, Any]]:
+    """Convert a record batch to company dicts, column by column"""
+    columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+    return [dict(zip(batch.schema.names, row)) for row in zip(*columns)]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Company Name Column Loader for CSV Files
+
+Reads just the company name column of a user-supplied CSV in one pass,
+instead of parsing every column and parsing the file again when it turns
+out not to be UTF-8:
+
+- The encoding, delimiter and header are sniffed from the first 64 KB: a
+  byte order mark wins, then UTF-8 if the sample decodes, else latin-1
+- The delimiter is the one of , ; tab | that occurs most in the header
+  line (comma on a tie), and the header is parsed with the csv module
+- The name column is picked from the header, matching NAME_COLUMNS
+  regardless of case and surrounding whitespace, else the first column
+- Only that column is decoded, with pyarrow's CSV reader; values are
+  read as strings and pandas' default missing-value markers as null, like
+  pd.read_csv(dtype=str)
+- Files pyarrow rejects (ragged rows, invalid UTF-8 after the sample) are
+  read again by pandas, still only the name column
+
+Usage:
+    csv_format = sniff_csv('companies.csv')
+    names = read_csv_column('companies.csv', find_name_column(csv_format.columns), csv_format)
+"""
+
+import codecs
+import csv
+import io
+import logging
+from typing import List, NamedTuple, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 64 * 1024
+
+# Header names taken as the company name column, in order of preference
+NAME_COLUMNS = ['name', 'company', 'company_name', 'organization', 'org']
+
+DELIMITERS = [',', ';', '\t', '|']
+
+# pd.read_csv's default missing-value markers
+CSV_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+_BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_CSV_BLOCK = 16 * 1024 * 1024
+
+
+class CsvFormat(NamedTuple):
+    """How a CSV file is encoded and laid out"""
+    encoding: str
+    delimiter: str
+    columns: List[str]
+
+
+def sniff_encoding(sample: bytes) -> str:
+    """The encoding of a file starting with sample: its BOM's, else UTF-8 if it decodes, else latin-1"""
+    for bom, encoding in _BYTE_ORDER_MARKS:
+        if sample.startswith(bom):
+            return encoding
+    try:
+        # Not final: the sample may end inside a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def sniff_csv(path: str, sample_size: int = SAMPLE_SIZE) -> CsvFormat:
+    """Sniff a CSV's encoding, delimiter and header columns from its first bytes"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    encoding = sniff_encoding(sample)
+    # The BOM, if any, is consumed by the decoder
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=False)
+
+    header_line = next((line for line in text.splitlines() if line.strip()), None)
+    if header_line is None:
+        raise ValueError(f"{path} has no header row")
+    # Prefer the comma when no candidate occurs more often
+    delimiter = max(DELIMITERS, key=lambda candidate: (header_line.count(candidate), candidate == ','))
+
+    rows = csv.reader(io.StringIO(text.lstrip('\r\n')), delimiter=delimiter)
+    columns = next(rows)
+    return CsvFormat(encoding, delimiter, columns)
+
+
+def find_column(columns: Sequence[str], candidates: Sequence[str]) -> Optional[str]:
+    """The first candidate present in columns, ignoring case and surrounding whitespace"""
+    by_key = {}
+    for column in columns:
+        by_key.setdefault(column.strip().lower(), column)
+    for candidate in candidates:
+        if candidate in by_key:
+            return by_key[candidate]
+    return None
+
+
+def find_name_column(columns: Sequence[str]) -> str:
+    """The company name column of a header: one of NAME_COLUMNS, else the first column"""
+    column = find_column(columns, NAME_COLUMNS)
+    if column is None:
+        column = columns[0]
+        logger.warning(f"No standard company name column found, using: {column}")
+    return column
+
+
+def read_csv_column(path: str, column: str, csv_format: Optional[CsvFormat] = None) -> pd.Series:
+    """Read one column of a CSV as strings (missing values as null), without parsing the others"""
+    if csv_format is None:
+        csv_format = sniff_csv(path)
+    try:
+        table = pa_csv.read_csv(
+            path,
+            # pyarrow skips a UTF-8 BOM itself and decodes UTF-8 natively
+            read_options=pa_csv.ReadOptions(encoding='utf8' if csv_format.encoding == 'utf-8-sig'
+                                            else csv_format.encoding, block_size=_CSV_BLOCK),
+            parse_options=pa_csv.ParseOptions(delimiter=csv_format.delimiter, newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[column],
+                column_types={column: pa.string()},
+                null_values=CSV_NULL_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        return table.column(0).to_pandas().rename(column)
+    except pa.ArrowInvalid as e:
+        logger.warning(f"pyarrow could not read {path} ({e}); reading column {column!r} with pandas")
+
+    try:
+        df = pd.read_csv(path, usecols=[column], dtype=str, sep=csv_format.delimiter, encoding=csv_format.encoding)
+    except UnicodeDecodeError:
+        df = pd.read_csv(path, usecols=[column], dtype=str, sep=csv_format.delimiter, encoding='latin-1')
+    return df[column]
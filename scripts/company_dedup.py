@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Fuzzy Company Name Deduplication
+
+Clusters near-duplicate company names before upload so that "Google",
+"Google Inc" and "Google, LLC" become one company whose other spellings
+are kept as aliases, instead of separate documents the frontend has to
+merge at query time.
+
+Candidates are found without comparing all pairs:
+
+- Blocking: names with the same search key (normalize_search_name, which
+  drops Inc/LLC/Corp style suffixes like the frontend's
+  normalizeCompanyName) are the same company outright
+- MinHash LSH over character 3-grams of the distinct keys: signatures
+  are computed with numpy for whole blocks of keys and split into bands;
+  keys sharing a band bucket become candidate pairs
+- Sorted neighbourhood: keys next to each other when sorted by their text
+  or by their reversed text are also candidates, which catches typos in
+  short names that leave too few 3-grams for LSH
+- Candidates are verified with the same Levenshtein similarity the
+  frontend uses (calculateSimilarity), and clusters are formed around
+  centre keys so similarity never chains across a cluster
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from company_names import normalize_search_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.8
+
+# 16 bands of 3 rows: keys sharing half their 3-grams are candidates ~90%
+# of the time, unrelated keys rarely are. Short keys lose most of their
+# 3-grams to a single typo, so sorted-neighbourhood blocking backs them up
+NUM_PERM = 48
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# Buckets larger than this only pair neighbouring keys instead of all pairs
+MAX_BUCKET_SIZE = 100
+
+# Keys paired with this many neighbours in sorted and reverse-sorted order
+SORTED_WINDOW = 2
+
+# Keys hashed per numpy block, bounding memory for very large inputs
+SIGNATURE_BLOCK = 250_000
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_PAD = b'\x01'
+_DIGITS_RE = re.compile(r'\d+')
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    # Shared prefixes and suffixes never add to the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    if len(a) - len(b) > limit:
+        return limit + 1
+    if not b:
+        return len(a)
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j - 1] + (char_a != char_b),
+                previous[j] + 1,
+                current[j - 1] + 1,
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def levenshtein_ratio(a: str, b: str) -> float:
+    """(max length - edit distance) / max length, as calculateSimilarity in the frontend"""
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    return (longest - _edit_distance(a, b, longest)) / longest
+
+
+def is_similar(a: str, b: str, threshold: float = DEFAULT_THRESHOLD) -> bool:
+    """Whether levenshtein_ratio(a, b) >= threshold, stopping early when it can't be"""
+    longest = max(len(a), len(b))
+    limit = int((1 - threshold) * longest + 1e-9)
+    return longest == 0 or _edit_distance(a, b, limit) <= limit
+
+
+def minhash_signatures(keys: List[str], num_perm: int = NUM_PERM, seed: int = 0) -> np.ndarray:
+    """MinHash signatures over padded byte 3-grams, shape (len(keys), num_perm)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(keys), num_perm), dtype=np.uint64)
+    for start in range(0, len(keys), SIGNATURE_BLOCK):
+        block = [_PAD + key.encode('utf-8') + _PAD for key in keys[start:start + SIGNATURE_BLOCK]]
+        lengths = np.fromiter((len(key) for key in block), dtype=np.int64, count=len(block))
+        buffer = np.frombuffer(b''.join(block), dtype=np.uint8).astype(np.uint64)
+
+        # Every padded key has at least 3 bytes, so at least one 3-gram
+        gram_counts = lengths - 2
+        gram_offsets = np.concatenate(([0], np.cumsum(gram_counts)[:-1]))
+        key_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        key_of_gram = np.repeat(np.arange(len(block)), gram_counts)
+        positions = key_starts[key_of_gram] + np.arange(gram_counts.sum()) - gram_offsets[key_of_gram]
+        grams = (buffer[positions] << np.uint64(16)) | (buffer[positions + 1] << np.uint64(8)) | buffer[positions + 2]
+
+        for i in range(num_perm):
+            hashed = (a[i] * grams + b[i]) % _PRIME
+            signatures[start:start + len(block), i] = np.minimum.reduceat(hashed, gram_offsets)
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int = BANDS) -> np.ndarray:
+    """Index pairs (i < j) sharing at least one LSH band bucket, shape (n_pairs, 2)"""
+    rows = signatures.shape[1] // bands
+    found = []
+    for band in range(bands):
+        bucket = np.zeros(len(signatures), dtype=np.uint64)
+        for column in signatures[:, band * rows:(band + 1) * rows].T:
+            bucket = bucket * np.uint64(1099511628211) ^ column
+
+        order = np.argsort(bucket, kind='stable')
+        sorted_buckets = bucket[order]
+        run_starts = np.flatnonzero(np.concatenate(([True], sorted_buckets[1:] != sorted_buckets[:-1])))
+        run_sizes = np.diff(np.append(run_starts, len(order)))
+
+        # Pairs dominate, so buckets of two are handled without a Python loop
+        pair_starts = run_starts[run_sizes == 2]
+        found.append(np.stack([order[pair_starts], order[pair_starts + 1]], axis=1))
+
+        for run_start, size in zip(run_starts[run_sizes > 2].tolist(), run_sizes[run_sizes > 2].tolist()):
+            members = np.sort(order[run_start:run_start + size])
+            if size <= MAX_BUCKET_SIZE:
+                i, j = np.triu_indices(size, k=1)
+                found.append(np.stack([members[i], members[j]], axis=1))
+            else:
+                found.append(np.stack([members[:-1], members[1:]], axis=1))
+
+    pairs = np.concatenate(found) if found else np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(pairs, axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def sorted_neighbour_pairs(keys: List[str], window: int = SORTED_WINDOW) -> np.ndarray:
+    """Pairs of keys adjacent when sorted forwards or by their reversed text"""
+    found = []
+    for sort_keys in (keys, [key[::-1] for key in keys]):
+        order = np.argsort(np.array(sort_keys, dtype=object), kind='stable')
+        for offset in range(1, window + 1):
+            found.append(np.stack([order[:-offset], order[offset:]], axis=1))
+    pairs = np.sort(np.concatenate(found), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def _cluster_keys(keys: List[str], support: List[int], threshold: float) -> Tuple[np.ndarray, int]:
+    """Assign every key to a centre key; returns (centre index per key, verified pairs)"""
+    centres = np.arange(len(keys))
+    if len(keys) < 2:
+        return centres, 0
+
+    pairs = np.unique(np.concatenate([
+        candidate_pairs(minhash_signatures(keys)),
+        sorted_neighbour_pairs(keys),
+    ]), axis=0)
+
+    # The ratio can't reach the threshold if the lengths alone differ too much
+    lengths = np.fromiter((len(key) for key in keys), dtype=np.int64, count=len(keys))
+    length_i, length_j = lengths[pairs[:, 0]], lengths[pairs[:, 1]]
+    pairs = pairs[np.abs(length_i - length_j) <= (1 - threshold) * np.maximum(length_i, length_j)]
+    neighbours: Dict[int, List[int]] = {}
+    verified = 0
+    for i, j in pairs.tolist():
+        key_i, key_j = keys[i], keys[j]
+        # "Acme 1" and "Acme 2" are different companies however similar
+        if _DIGITS_RE.findall(key_i) != _DIGITS_RE.findall(key_j):
+            continue
+        if is_similar(key_i, key_j, threshold):
+            neighbours.setdefault(i, []).append(j)
+            neighbours.setdefault(j, []).append(i)
+            verified += 1
+
+    # Best supported, then shortest keys become centres first; a key only
+    # joins a centre it is directly similar to, so clusters never chain
+    assigned = np.zeros(len(keys), dtype=bool)
+    for i in sorted(neighbours, key=lambda i: (-support[i], len(keys[i]), keys[i])):
+        if assigned[i]:
+            continue
+        assigned[i] = True
+        for j in neighbours[i]:
+            if not assigned[j]:
+                assigned[j] = True
+                centres[j] = i
+    return centres, verified
+
+
+def dedupe_company_names(names: Any, threshold: float = DEFAULT_THRESHOLD) -> pd.DataFrame:
+    """Cluster near-duplicate names into canonical companies
+
+    Returns a DataFrame with one row per cluster: 'name' is the canonical
+    spelling and 'variants' lists the other spellings, in the order the
+    canonical names first appeared. The canonical spelling is the most
+    frequent one: its search key is shared by the most names (so a one-off
+    typo never wins), then the name itself occurs most often, then it is
+    the shortest.
+    """
+    names = [str(name) for name in names]
+    # Names that are nothing but suffixes ("Inc") keep their own key
+    keys = [normalize_search_name(name) or name.lower().strip() for name in names]
+
+    # Blocking: identical search keys are merged without comparison
+    key_codes, unique_keys = pd.factorize(pd.Series(keys, dtype=object))
+    unique_keys = unique_keys.tolist()
+    support = np.bincount(key_codes, minlength=len(unique_keys)).tolist()
+
+    centres, verified = _cluster_keys(unique_keys, support, threshold)
+    cluster_of_name = centres[key_codes]
+
+    clusters: Dict[int, List[str]] = {}
+    name_support: Dict[str, Tuple[int, int]] = {}
+    for name, code, cluster in zip(names, key_codes.tolist(), cluster_of_name.tolist()):
+        clusters.setdefault(cluster, []).append(name)
+        previous = name_support.get(name, (support[code], 0))
+        name_support[name] = (previous[0], previous[1] + 1)
+
+    rows = []
+    for members in clusters.values():
+        canonical = min(members, key=lambda name: (-name_support[name][0], -name_support[name][1], len(name), name))
+        rows.append((canonical, [name for name in dict.fromkeys(members) if name != canonical]))
+
+    logger.info(
+        f"Fuzzy dedup: {len(names)} names, {len(unique_keys)} distinct keys, "
+        f"{verified} near-duplicate pairs, {len(rows)} companies"
+    )
+    return pd.DataFrame(rows, columns=['name', 'variants'])
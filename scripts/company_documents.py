@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Batched Company Document Construction
+
+Builds ready-to-write Firestore company documents for a whole chunk of
+names at once instead of one DataFrame row at a time:
+
+- Names are read once as a plain list, so no pandas object is created
+  per row
+- Normalized names and aliases come from the batch functions in
+  company_names.py
+- The whole batch shares a single timestamp
+- Spellings merged into a company by the fuzzy dedup stage are appended
+  to its generated aliases
+- Normalized names already computed by the parallel cleaning stage are
+  reused instead of normalizing again
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from batch_committer import MAX_BATCH_SIZE
+from company_names import generate_aliases_batch, normalize_company_names
+
+# Generated aliases plus merged spellings, so large clusters stay bounded
+MAX_MERGED_ALIASES = 25
+
+
+def build_company_documents(names: Any, now: Optional[datetime] = None,
+                            variants: Optional[Any] = None,
+                            normalized_names: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """Create company documents with the required schema for a Series or list of names
+
+    variants optionally holds, per name, other spellings of the same company
+    (the 'variants' column from company_dedup) to merge into its aliases.
+    normalized_names optionally holds normalize_company_name of each name.
+    """
+    names = list(names)
+    if normalized_names is None:
+        normalized_names = normalize_company_names(names)
+    normalized_names = list(normalized_names)
+    aliases_list = generate_aliases_batch(names)
+    if variants is not None:
+        aliases_list = [
+            list(dict.fromkeys(aliases + list(extra)))[:MAX_MERGED_ALIASES] if len(extra) else aliases
+            for aliases, extra in zip(aliases_list, variants)
+        ]
+
+    # Initialize with default values
+    now = now or datetime.now(timezone.utc)
+
+    return [
+        {
+            'aliases': aliases,
+            'averageFlagCount': 0.0,
+            'commonFlags': [],
+            'createdAt': now,
+            'lastSubmission': now,
+            'name': name,
+            'normalizedName': normalized_name,
+            'severityTrends': {
+                'light': 0,
+                'medium': 0
+            },
+            'submissionCount': 0,
+            'updatedAt': now
+        }
+        for name, normalized_name, aliases in zip(names, normalized_names, aliases_list)
+    ]
+
+
+def iter_document_batches(companies_df: pd.DataFrame, batch_size: int = MAX_BATCH_SIZE,
+                          build_documents: Callable[..., List[Dict[str, Any]]] = build_company_documents
+                          ) -> Iterator[List[Dict[str, Any]]]:
+    """Yield documents for a cleaned (optionally deduplicated) frame, one batch at a time
+
+    Optional 'variants' and 'normalizedName' columns are passed to build_documents.
+    """
+    names = companies_df['name'].tolist()
+    optional = {
+        keyword: companies_df[column].tolist()
+        for keyword, column in [('variants', 'variants'), ('normalized_names', 'normalizedName')]
+        if column in companies_df.columns
+    }
+    for start in range(0, len(names), batch_size):
+        batch_optional = {keyword: values[start:start + batch_size] for keyword, values in optional.items()}
+        yield build_documents(names[start:start + batch_size], **batch_optional)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Nested Company Profile Fields
+
+Parses the structured columns of a company profiles dataset (hq,
+specialities, locations) once per chunk, a column per call, and flattens
+them into plain string columns, instead of parsing and stringifying each
+row inside the export loop:
+
+- Values that are already dicts or lists (pd.read_json, the dataset
+  cache) are used as they are
+- JSON text is parsed with json_values (orjson if installed). If any
+  value is invalid JSON, the column's text is parsed again value by
+  value, also accepting Python literals such as str() of a dict; text
+  that is neither stays text
+- hq becomes hq_city, hq_state, hq_country and location ("city, state",
+  or the hq text itself when it isn't structured)
+- specialities becomes comma-separated text and locations JSON text;
+  missing and empty values become ""
+
+Usage:
+    df = flatten_nested_fields(df)
+    df[['location', 'specialities', 'locations']]
+"""
+
+import ast
+import json
+from typing import Any, List
+
+import pandas as pd
+
+from json_values import dumps, loads_many
+
+HQ_COLUMNS = ['hq_city', 'hq_state', 'hq_country', 'location']
+
+_LITERAL_ERRORS = (ValueError, SyntaxError, TypeError, MemoryError, RecursionError)
+
+
+def _parse_text(text: str) -> Any:
+    """One structured value from text: JSON, else a Python literal, else the text itself"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except _LITERAL_ERRORS:
+        return text
+
+
+def parse_nested(values: pd.Series) -> List[Any]:
+    """A column's values as dicts and lists where possible; missing values become None"""
+    parsed = [None if value is None or (isinstance(value, float) and value != value) else value
+              for value in values.tolist()]
+    positions = [i for i, value in enumerate(parsed)
+                 if isinstance(value, str) and value.lstrip()[:1] in ('{', '[')]
+    if not positions:
+        return parsed
+
+    texts = [parsed[i] for i in positions]
+    try:
+        decoded = loads_many(texts)
+    except ValueError:
+        decoded = [_parse_text(text) for text in texts]
+
+    for i, value in zip(positions, decoded):
+        parsed[i] = value
+    return parsed
+
+
+def _text(value: Any) -> str:
+    return str(value).strip() if value else ""
+
+
+def flatten_hq(hq: pd.Series) -> pd.DataFrame:
+    """Split hq into string columns hq_city, hq_state, hq_country and location"""
+    values = parse_nested(hq)
+    fields = {
+        column: pd.Series([_text(value.get(key)) if isinstance(value, dict) else "" for value in values],
+                          index=hq.index, dtype=object)
+        for column, key in [('hq_city', 'city'), ('hq_state', 'state'), ('hq_country', 'country')]
+    }
+    city, state = fields['hq_city'], fields['hq_state']
+    location = (city + ', ' + state).where((city != "") & (state != ""), city)
+
+    # An hq given as plain text is its own location
+    plain = pd.Series([_text(value) if isinstance(value, str) else "" for value in values],
+                      index=hq.index, dtype=object)
+    fields['location'] = location.where(plain == "", plain)
+    return pd.DataFrame(fields, index=hq.index)
+
+
+def join_text(values: pd.Series, separator: str = ', ') -> pd.Series:
+    """Lists joined into one string; other values as stripped text"""
+    return pd.Series([
+        separator.join(_text(item) for item in value if _text(item)) if isinstance(value, list) else _text(value)
+        for value in parse_nested(values)
+    ], index=values.index, dtype=object)
+
+
+def json_text(values: pd.Series) -> pd.Series:
+    """Dicts and lists as JSON text; other values as stripped text"""
+    return pd.Series([
+        (dumps(value) if value else "") if isinstance(value, (dict, list)) else _text(value)
+        for value in parse_nested(values)
+    ], index=values.index, dtype=object)
+
+
+def flatten_nested_fields(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace the nested columns of a profiles frame with flat string columns"""
+    df = df.copy()
+    if 'hq' in df.columns:
+        hq = flatten_hq(df.pop('hq'))
+        for column in HQ_COLUMNS:
+            df[column] = hq[column]
+    if 'specialities' in df.columns:
+        df['specialities'] = join_text(df['specialities'])
+    if 'locations' in df.columns:
+        df['locations'] = json_text(df['locations'])
+    return df
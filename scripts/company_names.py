@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Company Name Normalization and Alias Generation
+
+Shared by the population and export scripts. Each rule set is available
+as a per-name function and as a batch version that takes a whole pandas
+Series (or pyarrow array) at once. Both produce identical output.
+
+The batch versions run the precompiled rules over a plain list of values
+rather than through pandas .str accessors or pyarrow kernels: that is
+faster on object columns and keeps Python's Unicode \b/\w semantics.
+
+Two rule sets exist:
+- Population rules (clean_and_populate_firebase.py, populate_from_csv.py):
+  character-level cleanup and Inc/Corp/LLC style alias variations
+- Search rules (clean_export_companies.py): suffix/prefix word removal
+  and website domain aliases
+"""
+
+import hashlib
+import re
+from typing import Any, List, Optional
+from urllib.parse import urlparse
+
+import pandas as pd
+
+MAX_ALIASES = 10
+
+# Applied after collapsing double spaces; every mapping is a single character
+# so one translate pass matches the original chain of str.replace calls
+_NORMALIZE_TABLE = str.maketrans({
+    '&': 'and',
+    '.': None,
+    ',': None,
+    '(': None,
+    ')': None,
+    '-': ' ',
+    '_': ' ',
+})
+
+# (old, new) pairs for population aliases, in output order
+_ALIAS_REPLACEMENTS = [
+    (' and ', ' & '),
+    (' & ', ' and '),
+    (' Inc', ''),
+    (' Corp', ''),
+    (' LLC', ''),
+    (' Ltd', ''),
+    (' Company', ''),
+    (' Co', ''),
+]
+
+_SUFFIX_WORDS = (
+    r'inc|corp|corporation|llc|ltd|limited|co|company|group|holdings'
+    r'|enterprises|ventures|partners|associates'
+)
+_SUFFIX_RE = re.compile(rf'\b({_SUFFIX_WORDS})\b')
+# Suffix and prefix words only ever match whole words, so removing them in
+# one combined pass is equivalent to removing suffixes first, then prefixes
+_SUFFIX_PREFIX_RE = re.compile(rf'\b({_SUFFIX_WORDS}|the|a|an)\b')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s-]')
+_WHITESPACE_RE = re.compile(r'\s+')
+# The netloc urlparse finds in a plain ASCII URL: after an optional scheme
+# and "//", up to the path, query or fragment
+_NETLOC_RE = re.compile(r'(?:[A-Za-z][A-Za-z0-9+.-]*:)?//([^/?#]*)')
+# Characters urlparse strips or rejects; URLs with them take the slow path
+_URL_SPECIAL_RE = re.compile(r'[\x00-\x20\x7f\[\]]')
+
+
+def _as_series(values: Any) -> pd.Series:
+    """Accept a pandas Series, pyarrow Array/ChunkedArray or any sequence"""
+    if isinstance(values, pd.Series):
+        return values
+    if hasattr(values, 'to_pandas'):
+        return values.to_pandas()
+    return pd.Series(list(values), dtype=object)
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    """Remove duplicates while preserving order"""
+    return list(dict.fromkeys(items))
+
+
+# ---------------------------------------------------------------------------
+# Population rules
+# ---------------------------------------------------------------------------
+
+def normalize_company_name(name: str) -> str:
+    """Normalize company name for consistent matching"""
+    return name.lower().strip().replace('  ', ' ').translate(_NORMALIZE_TABLE)
+
+
+def generate_aliases(name: str) -> List[str]:
+    """Generate common aliases for a company name"""
+    aliases = [name]
+
+    for old, new in _ALIAS_REPLACEMENTS:
+        variation = name.replace(old, new).strip()
+        if variation != name and variation:
+            aliases.append(variation)
+
+    return _dedupe(aliases)[:MAX_ALIASES]
+
+
+def normalize_company_names(names: Any) -> pd.Series:
+    """Batch version of normalize_company_name"""
+    names = _as_series(names)
+    return pd.Series(
+        [normalize_company_name(name) for name in names.tolist()],
+        index=names.index, dtype=object,
+    )
+
+
+def generate_aliases_batch(names: Any) -> List[List[str]]:
+    """Batch version of generate_aliases"""
+    return [generate_aliases(name) for name in _as_series(names).tolist()]
+
+
+# ---------------------------------------------------------------------------
+# Search rules
+# ---------------------------------------------------------------------------
+
+def normalize_search_name(name: str) -> str:
+    """Normalize company name for consistent searching"""
+    if not name:
+        return ""
+
+    normalized = name.lower().strip()
+    # Remove common suffixes and prefixes
+    normalized = _SUFFIX_PREFIX_RE.sub('', normalized)
+    # Remove special characters except hyphens and spaces
+    normalized = _SPECIAL_CHARS_RE.sub('', normalized)
+    # Normalize whitespace
+    return _WHITESPACE_RE.sub(' ', normalized).strip()
+
+
+def _website_domains(name: str, website: Optional[str]) -> List[str]:
+    """Domain-based aliases for a company website"""
+    if not website:
+        return []
+    if website.isascii() and not _URL_SPECIAL_RE.search(website):
+        match = _NETLOC_RE.match(website)
+        domain = match.group(1) if match else ''
+    else:
+        try:
+            domain = urlparse(website).netloc
+        except ValueError:
+            return []
+    if not domain or domain == name.lower():
+        return []
+    if domain.startswith('www.'):
+        return [domain, domain[4:]]
+    return [domain]
+
+
+def generate_search_aliases(name: str, website: str = "") -> List[str]:
+    """Generate common aliases for a company name"""
+    if not name:
+        return []
+
+    lower = name.lower()
+    # Original name, lowercase version and name without common suffixes
+    aliases = [name.strip(), lower.strip()]
+    name_clean = _WHITESPACE_RE.sub(' ', _SUFFIX_RE.sub('', lower)).strip()
+    if name_clean and name_clean != lower.strip():
+        aliases.append(name_clean)
+
+    aliases.extend(_website_domains(name, website))
+
+    # Remove duplicates and empty strings, keeping the order stable across runs
+    return _dedupe([alias for alias in aliases if alias.strip()])
+
+
+def normalize_search_names(names: Any) -> pd.Series:
+    """Batch version of normalize_search_name"""
+    names = _as_series(names)
+    return pd.Series(
+        [normalize_search_name(name) for name in names.fillna('').tolist()],
+        index=names.index, dtype=object,
+    )
+
+
+def generate_search_aliases_batch(names: Any, websites: Any = None) -> List[List[str]]:
+    """Batch version of generate_search_aliases"""
+    name_values = _as_series(names).fillna('').tolist()
+    if websites is None:
+        website_values = [''] * len(name_values)
+    else:
+        website_values = _as_series(websites).fillna('').tolist()
+    return [
+        generate_search_aliases(name, website)
+        for name, website in zip(name_values, website_values)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Document IDs
+# ---------------------------------------------------------------------------
+
+def company_doc_id(normalized_name: str) -> str:
+    """Deterministic Firestore document ID for a normalized company name"""
+    return hashlib.sha1(normalized_name.encode('utf-8')).hexdigest()[:20]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Company Dataset Shards
+
+Splits the cleaned company dataset into N disjoint slices so that N
+processes or hosts can each ingest one of them in parallel:
+
+- A company belongs to shard hash(normalizedName) mod N, using pandas'
+  fixed-key 64-bit hash, so the assignment is the same on every process,
+  host and chunk size
+- Every spelling that normalizes the same way lands in the same shard, so
+  no two shards ever write the same deterministic document ID
+- Each shard still reads and cleans the whole dataset (cheap next to the
+  writes) and keeps only its own companies, so the cleaning and dedup
+  results, and with them the shard contents, match a single full run
+
+Shards are written "i/N", counting from 0: 0/4, 1/4, 2/4 and 3/4 together
+cover the dataset.
+"""
+
+import argparse
+import glob
+import os
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from company_names import normalize_company_names
+
+
+class Shard(NamedTuple):
+    """Shard `index` of `count`"""
+    index: int
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(text: str) -> Shard:
+    """Parse "i/N" (argparse type for --shard)"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/N, got {text!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard {text} is out of range: expected 0 <= i < N")
+    return Shard(index, count)
+
+
+def shard_numbers(normalized_names, count: int) -> np.ndarray:
+    """Shard of each normalized name"""
+    names = pd.Series(normalized_names, dtype=object).fillna('').to_numpy(dtype=object)
+    return (pd.util.hash_array(names, categorize=False) % np.uint64(count)).astype(np.int64)
+
+
+def select_shard(companies_df: pd.DataFrame, shard: Optional[Shard]) -> pd.DataFrame:
+    """The rows of a cleaned (optionally deduplicated) frame that belong to `shard`"""
+    if shard is None or shard.count == 1:
+        return companies_df
+    if 'normalizedName' in companies_df.columns:
+        normalized = companies_df['normalizedName']
+    else:
+        normalized = normalize_company_names(companies_df['name'])
+    return companies_df[shard_numbers(normalized, shard.count) == shard.index]
+
+
+def shard_path(path: str, shard: Optional[Shard]) -> str:
+    """Per-shard variant of a local state file, so shards on one host don't share it"""
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard.index}-of-{shard.count}{ext}"
+
+
+def existing_shard_paths(path: str) -> List[str]:
+    """A local state file and every per-shard variant of it that exists"""
+    root, ext = os.path.splitext(path)
+    paths = sorted(glob.glob(f"{glob.escape(root)}.shard-*-of-*{glob.escape(ext)}"))
+    return ([path] if os.path.exists(path) else []) + paths
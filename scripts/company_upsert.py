@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Incremental Company Upserts
+
+Syncs companies to Firestore without wiping the collection first:
+
+- Document IDs are derived from normalizedName, so the same company
+  always maps to the same document
+- The incoming data is diffed against the local ingest manifest; only new
+  companies are created and only companies whose name/aliases changed are
+  updated (merged, so submission stats and createdAt are preserved)
+- Companies missing from the manifest are looked up before they are
+  created: with a fresh or lost manifest the document may already exist
+  (full runs write the same IDs), and it is then merged like an update
+  instead of overwritten
+- Companies that were written before but are missing from a full run are
+  deleted, unless another script sharing the manifest also wrote them
+- An optional AutocompletePrefixes collector is told about every committed
+  create, update and delete
+
+A routine refresh therefore costs writes in proportion to the change.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from autocomplete_prefixes import AutocompletePrefixes
+from batch_committer import BatchCommitter, WriteOp
+from company_documents import build_company_documents, iter_document_batches
+from company_names import company_doc_id
+from ingest_manifest import IngestManifest, content_hash
+from write_rate import AdaptiveWriteRate
+
+logger = logging.getLogger(__name__)
+
+# Fields owned by the import; everything else is maintained by submissions
+STATIC_FIELDS = ['name', 'normalizedName', 'aliases']
+
+_MISSING = object()
+
+
+class CompanyUpserter:
+    def __init__(self, db, manifest: IngestManifest,
+                 build_documents: Callable[..., List[Dict[str, Any]]] = build_company_documents,
+                 collection: str = 'companies', max_in_flight: int = 8,
+                 static_fields: List[str] = STATIC_FIELDS, script: str = '',
+                 autocomplete: Optional[AutocompletePrefixes] = None,
+                 write_rate: Optional[AdaptiveWriteRate] = None):
+        """Start an incremental run
+        
+        build_documents(names, variants=None, normalized_names=None) builds
+        full documents for a batch of names in upsert(); callers that already have documents pass them to
+        upsert_documents() instead.
+        static_fields are the fields hashed and merged on update.
+        autocomplete, if given, collects committed changes for its prefix documents.
+        write_rate, if given, paces the writes (see write_rate.py).
+        """
+        self.db = db
+        self.manifest = manifest
+        self.build_documents = build_documents
+        self.collection = collection
+        self.collection_ref = db.collection(collection)
+        self.static_fields = static_fields
+        self.autocomplete = autocomplete
+        # Manifest rows are kept per script, so sources sharing a manifest don't delete each other's companies
+        self.script = script
+        self.run_id = manifest.begin_run(script, collection)
+        self._start_time = time.monotonic()
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'skipped': 0}
+
+        # Manifest rows are only written once their batch has committed
+        self._pending: Dict[str, tuple] = {}
+        self._pending_lock = threading.Lock()
+        self._committer = BatchCommitter(db, max_in_flight=max_in_flight,
+                                         on_batch_done=self._on_batch_done, write_rate=write_rate)
+
+    def upsert(self, companies_df: pd.DataFrame):
+        """Queue creates and updates for one chunk of cleaned companies"""
+        for documents in iter_document_batches(companies_df, build_documents=self.build_documents):
+            self.upsert_documents(documents)
+
+    def upsert_documents(self, new_documents: Iterable[Dict[str, Any]]):
+        """Queue creates and updates for one chunk of full company documents"""
+        documents = {}
+        for document in new_documents:
+            if not document['normalizedName']:
+                # No stable key to derive an ID from
+                self.counts['skipped'] += 1
+                continue
+            doc_id = company_doc_id(document['normalizedName'])
+            # Names that normalize the same way share one document; first one wins
+            documents.setdefault(doc_id, document)
+
+        existing = self.manifest.lookup(self.collection, list(documents), self.script)
+        touched = []
+
+        with self._pending_lock:
+            # Queued earlier in this run but not yet committed, so not in the manifest
+            queued = [doc_id for doc_id in documents if doc_id in self._pending]
+        for doc_id in queued:
+            del documents[doc_id]
+
+        in_firestore = self._existing_documents([doc_id for doc_id in documents if doc_id not in existing])
+
+        for doc_id, document in documents.items():
+            static_fields = {field: document[field] for field in self.static_fields}
+            digest = content_hash(static_fields)
+            previous = existing.get(doc_id)
+
+            if previous is None and doc_id not in in_firestore:
+                self._queue_set(doc_id, document, digest, merge=False)
+                self.counts['created'] += 1
+            elif previous is None:
+                # Untracked but already written, e.g. by a full run: keep its submission stats
+                update = dict(static_fields, updatedAt=document.get('updatedAt', datetime.now(timezone.utc)))
+                self._queue_set(doc_id, update, digest, merge=True)
+                self.counts['updated'] += 1
+            elif previous[1] == self.run_id:
+                # Already handled earlier in this run
+                continue
+            elif previous[0] == digest:
+                touched.append(doc_id)
+                self.counts['unchanged'] += 1
+            else:
+                touched.append(doc_id)
+                update = dict(static_fields, updatedAt=document.get('updatedAt', datetime.now(timezone.utc)))
+                self._queue_set(doc_id, update, digest, merge=True)
+                self.counts['updated'] += 1
+
+        self.manifest.touch(self.collection, touched, self.run_id, self.script)
+
+    def finish(self, delete_missing: bool = True) -> Dict[str, int]:
+        """Delete companies missing from this run and wait for all writes"""
+        if delete_missing:
+            released = self.manifest.release_shared(self.collection, self.run_id, self.script)
+            if released:
+                logger.info(f"Keeping {released} companies missing from this run that other scripts also wrote")
+            for doc_id, normalized_name in self.manifest.stale(self.collection, self.run_id, self.script):
+                with self._pending_lock:
+                    self._pending[doc_id] = (normalized_name, None)
+                self._committer.delete(self.collection_ref.document(doc_id))
+                self.counts['deleted'] += 1
+        else:
+            logger.info("Skipping deletion of companies missing from this run")
+
+        stats = self._committer.close()
+        counts = dict(self.counts, writes=stats.documents_written, failed=stats.documents_failed)
+        self.manifest.finish_run(self.run_id, time.monotonic() - self._start_time, counts)
+        logger.info(
+            f"Incremental sync: {self.counts['created']} created, {self.counts['updated']} updated, "
+            f"{self.counts['unchanged']} unchanged, {self.counts['deleted']} deleted, "
+            f"{self.counts['skipped']} skipped without a normalized name "
+            f"({stats.documents_written} writes, {stats.documents_failed} failed)"
+        )
+        return counts
+
+    def _existing_documents(self, doc_ids: List[str]) -> set:
+        """The given document IDs that exist in the collection"""
+        if not doc_ids:
+            return set()
+        references = [self.collection_ref.document(doc_id) for doc_id in doc_ids]
+        return {snapshot.id for snapshot in self.db.get_all(references, field_paths=['normalizedName'])
+                if snapshot.exists}
+
+    def _queue_set(self, doc_id: str, data: Dict[str, Any], digest: str, merge: bool):
+        with self._pending_lock:
+            self._pending[doc_id] = (data['normalizedName'], digest)
+        self._committer.set(self.collection_ref.document(doc_id), data, merge=merge)
+
+    def _on_batch_done(self, batch_number: int, ops: List[WriteOp], succeeded: bool):
+        written, deleted = [], []
+        with self._pending_lock:
+            for _, doc_ref, _, _ in ops:
+                entry = self._pending.pop(doc_ref.id, _MISSING)
+                if entry is _MISSING:
+                    continue
+                if entry[1] is None:
+                    deleted.append((doc_ref.id, entry[0]))
+                else:
+                    written.append((doc_ref.id, *entry))
+
+        # Failed batches stay out of the manifest so the next run retries them
+        if succeeded:
+            self.manifest.record(self.collection, written, self.run_id, self.script)
+            self.manifest.remove(self.collection, [doc_id for doc_id, _ in deleted], self.script)
+            if self.autocomplete is not None:
+                self.autocomplete.on_batch_done(batch_number, ops, succeeded)
+                for doc_id, normalized_name in deleted:
+                    self.autocomplete.remove(doc_id, normalized_name)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local Kaggle Dataset Cache
+
+Converts each Kaggle dataset file to Parquet once, so later runs load a
+columnar copy instead of re-parsing a multi-GB CSV or a JSON lines file:
+
+- The data file is picked from the downloaded dataset's file listing:
+  the first preferred file name that exists, else the largest file with
+  an accepted suffix
+- Copies are keyed by dataset slug and the SHA-1 of the source file, so a
+  new dataset version is converted again and the stale copy removed. The
+  index remembers each file's size and mtime, so an unchanged file isn't
+  hashed again
+- CSVs are converted in bounded blocks with every column read as a string
+  and pandas' default missing-value markers read as null, so the copy
+  matches pd.read_csv(dtype=str)
+- JSON lines files are parsed once with pd.read_json(lines=True); columns
+  holding dicts or lists are stored as JSON text and decoded back on read
+  (a column at a time), so readers see the same Python objects
+- Offline, when kagglehub can't reach Kaggle, the last copy of the dataset
+  in the index is used
+
+Usage (convert both datasets ahead of an offline run):
+python dataset_cache.py
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import kagglehub
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from company_csv import CSV_NULL_VALUES
+from json_values import loads_many
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv('DATASET_CACHE_DIR', 'dataset_cache')
+CACHE_VERSION = 1
+
+CSV_SUFFIXES = ('.csv',)
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson', '.txt', '.json')
+
+_READ_BLOCK = 1024 * 1024
+_CSV_BLOCK = 64 * 1024 * 1024
+
+
+class DatasetSpec(NamedTuple):
+    """A Kaggle dataset and how to pick its data file"""
+    slug: str
+    preferred: Tuple[str, ...] = ()
+    suffixes: Tuple[str, ...] = CSV_SUFFIXES
+
+
+COMPANIES_DATASET = DatasetSpec('peopledatalabssf/free-7-million-company-dataset',
+                                preferred=('companies.csv', 'companies_data.csv'))
+PROFILES_DATASET = DatasetSpec('proxycurl/10000-us-company-profiles', suffixes=JSON_LINES_SUFFIXES)
+
+
+def file_sha1(path: Path) -> str:
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pick_data_file(dataset_path: Path, preferred: Sequence[str] = (),
+                   suffixes: Sequence[str] = CSV_SUFFIXES) -> Path:
+    """The dataset's data file: the first preferred name present, else the largest with an accepted suffix"""
+    files = [f for f in dataset_path.rglob('*') if f.is_file()]
+    for file_name in preferred:
+        matches = sorted(f for f in files if f.name == file_name)
+        if matches:
+            return matches[0]
+
+    candidates = [f for f in files if f.suffix.lower() in suffixes]
+    if not candidates:
+        raise FileNotFoundError(f"No {'/'.join(suffixes)} file found in {dataset_path}: "
+                                f"{sorted(f.name for f in files)}")
+    return max(candidates, key=lambda f: (f.stat().st_size, f.name))
+
+
+def _encode_nested(df: pd.DataFrame) -> List[str]:
+    """JSON-encode, in place, the columns holding dicts or lists; returns their names"""
+    nested = []
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].tolist()
+        if any(isinstance(value, (dict, list)) for value in values):
+            df[col] = pd.Series([None if value is None or value != value else json.dumps(value)
+                                 for value in values], index=df.index, dtype=object)
+            nested.append(col)
+    return nested
+
+
+def _decode_nested(df: pd.DataFrame, nested: Sequence[str]) -> pd.DataFrame:
+    for col in nested:
+        if col in df.columns:
+            values = df[col].tolist()
+            positions = [i for i, value in enumerate(values) if isinstance(value, str)]
+            decoded = [None] * len(values)
+            for i, value in zip(positions, loads_many([values[i] for i in positions])):
+                decoded[i] = value
+            df[col] = pd.Series(decoded, index=df.index, dtype=object)
+    return df
+
+
+class DatasetCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        """Cache Parquet copies of Kaggle dataset files under cache_dir"""
+        self.cache_dir = Path(cache_dir)
+        self.index_path = self.cache_dir / 'index.json'
+
+    def resolve(self, dataset: DatasetSpec) -> Dict[str, Any]:
+        """Download (kagglehub caches the files), pick the data file and make sure its Parquet copy exists
+
+        Returns the index entry: source path, sha1, parquet path, rows and
+        columns. Falls back to the last entry for the dataset if kagglehub fails.
+        """
+        try:
+            dataset_path = Path(kagglehub.dataset_download(dataset.slug))
+        except Exception as e:
+            entry = self._load_index().get(dataset.slug)
+            if entry is None or not Path(entry['parquet']).exists():
+                raise
+            logger.warning(f"Could not fetch {dataset.slug} ({e}); "
+                           f"using the cached copy of {Path(entry['source']).name}")
+            return entry
+
+        source = pick_data_file(dataset_path, dataset.preferred, dataset.suffixes)
+        return self._entry_for(dataset.slug, source)
+
+    def load(self, entry: Dict[str, Any], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read a cached dataset, or only some of its columns, into one frame"""
+        table = pq.read_table(entry['parquet'], columns=columns)
+        return _decode_nested(table.to_pandas(), entry.get('json_columns', []))
+
+    def iter_frames(self, entry: Dict[str, Any], chunksize: int,
+                    columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Read a cached dataset in frames of up to chunksize rows, in file order"""
+        parquet_file = pq.ParquetFile(entry['parquet'])
+        start = 0
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            frame = _decode_nested(batch.to_pandas(), entry.get('json_columns', []))
+            # Number rows like a chunked pd.read_csv would
+            frame.index = pd.RangeIndex(start, start + len(frame))
+            start += len(frame)
+            yield frame
+
+    def _entry_for(self, slug: str, source: Path) -> Dict[str, Any]:
+        index = self._load_index()
+        entry = index.get(slug)
+        stat = source.stat()
+        if (entry is not None and entry['source'] == str(source) and entry['size'] == stat.st_size
+                and entry['mtime_ns'] == stat.st_mtime_ns and Path(entry['parquet']).exists()):
+            return entry
+
+        sha1 = file_sha1(source)
+        parquet_path = self.cache_dir / slug.replace('/', '__') / f"{source.stem}-{sha1[:16]}.parquet"
+        if entry is not None and entry['sha1'] == sha1 and Path(entry['parquet']).exists():
+            # Same contents, e.g. downloaded again to a new path
+            parquet_path = Path(entry['parquet'])
+        else:
+            logger.info(f"Converting {source.name} of {slug} to Parquet (once per dataset version)")
+            parquet_path.parent.mkdir(parents=True, exist_ok=True)
+            if source.suffix.lower() in CSV_SUFFIXES:
+                rows, columns, json_columns = self._convert_csv(source, parquet_path)
+            else:
+                rows, columns, json_columns = self._convert_json_lines(source, parquet_path)
+            if entry is not None and entry['parquet'] != str(parquet_path):
+                # The copy of the previous dataset version
+                Path(entry['parquet']).unlink(missing_ok=True)
+            entry = {'rows': rows, 'columns': columns, 'json_columns': json_columns}
+            logger.info(f"Cached {rows} rows of {source.name} at {parquet_path}")
+
+        entry.update({
+            'source': str(source),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': sha1,
+            'parquet': str(parquet_path),
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        })
+        index[slug] = entry
+        self._save_index(index)
+        return entry
+
+    def _convert_csv(self, source: Path, parquet_path: Path):
+        header = pd.read_csv(source, nrows=0).columns.tolist()
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(block_size=_CSV_BLOCK),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={col: pa.string() for col in header},
+                null_values=CSV_NULL_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+        rows = 0
+        tmp_path = parquet_path.with_suffix('.parquet.tmp')
+        with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        os.replace(tmp_path, parquet_path)
+        return rows, header, []
+
+    def _convert_json_lines(self, source: Path, parquet_path: Path):
+        df = pd.read_json(source, lines=True)
+        json_columns = _encode_nested(df)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = parquet_path.with_suffix('.parquet.tmp')
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, parquet_path)
+        return len(df), df.columns.tolist(), json_columns
+
+    def _load_index(self) -> Dict[str, Any]:
+        if not self.index_path.exists():
+            return {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        return index.get('datasets', {}) if index.get('version') == CACHE_VERSION else {}
+
+    def _save_index(self, datasets: Dict[str, Any]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'datasets': datasets}, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+
+def main():
+    """Convert the company datasets to Parquet ahead of time"""
+    parser = argparse.ArgumentParser(description='Download the Kaggle company datasets and cache them as Parquet')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Where the Parquet copies are kept')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    cache = DatasetCache(args.cache_dir)
+    for dataset in [COMPANIES_DATASET, PROFILES_DATASET]:
+        entry = cache.resolve(dataset)
+        print(f"✅ {dataset.slug}: {entry['rows']} rows of {Path(entry['source']).name} -> {entry['parquet']}")
+
+
+if __name__ == "__main__":
+    main()
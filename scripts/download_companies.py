@@ -1,90 +1,101 @@
-import kagglehub
-import pandas as pd
+import argparse
 import json
 from pathlib import Path
 
-def download_and_explore_dataset():
-    """Download the company dataset and explore its structure"""
-    
-    print("Downloading company dataset...")
-    # Download latest version
-    path = kagglehub.dataset_download("proxycurl/10000-us-company-profiles")
-    print(f"Path to dataset files: {path}")
-    
-    # List all files in the dataset
-    dataset_path = Path(path)
-    files = list(dataset_path.glob("*"))
-    print(f"\nFiles found: {[f.name for f in files]}")
-    
-    # Look for data files
-    data_files = [f for f in files if f.suffix in ['.csv', '.json', '.parquet', '.txt']]
+import pandas as pd
+
+from dataset_cache import COMPANIES_DATASET, CSV_SUFFIXES, DEFAULT_CACHE_DIR, PROFILES_DATASET, DatasetCache
+from dataset_profile import DatasetProfiler
+
+DATASETS = {
+    'profiles': PROFILES_DATASET,
+    'companies': COMPANIES_DATASET,
+}
+
+DEFAULT_CHUNKSIZE = 100000
+DEFAULT_SAMPLE_SIZE = 100000
+
+def iter_profile_chunks(cache, dataset, chunksize):
+    """Chunks of the dataset with the dtypes a full load of its file would infer"""
+    if Path(dataset['source']).suffix.lower() in CSV_SUFFIXES:
+        # The cached copy stores every CSV column as text, so read the CSV itself
+        with pd.read_csv(dataset['source'], chunksize=chunksize) as reader:
+            yield from reader
+    else:
+        yield from cache.iter_frames(dataset, chunksize)
+
+def download_and_explore_dataset(dataset_name='profiles', chunksize=DEFAULT_CHUNKSIZE, sample_size=None,
+                                 output_file='company_dataset_schema.json', cache_dir=DEFAULT_CACHE_DIR):
+    """Download a company dataset and profile its structure chunk by chunk
     
-    if not data_files:
-        print("No data files found!")
-        return
+    With a sample_size, only a uniform random sample of that many rows is
+    profiled (fast mode); row counts stay exact.
+    """
     
-    # Load the first data file
-    data_file = data_files[0]
-    print(f"\nLoading data from: {data_file}")
+    print("Downloading company dataset...")
+    # The data file is picked from the dataset listing and parsed once into a cached Parquet copy
+    cache = DatasetCache(cache_dir)
+    dataset = cache.resolve(DATASETS[dataset_name])
+    print(f"Data file: {dataset['source']}")
+    print(f"Cached copy: {dataset['parquet']}")
     
-    if data_file.suffix == '.csv':
-        df = pd.read_csv(data_file)
-    elif data_file.suffix == '.json':
-        df = pd.read_json(data_file)
-    elif data_file.suffix == '.parquet':
-        df = pd.read_parquet(data_file)
-    elif data_file.suffix == '.txt':
-        # Try to read as JSON lines first
-        try:
-            df = pd.read_json(data_file, lines=True)
-        except:
-            # If that fails, read as regular text and try to parse
-            with open(data_file, 'r', encoding='utf-8') as f:
-                first_lines = [f.readline() for _ in range(5)]
-            print(f"First few lines of text file:")
-            for i, line in enumerate(first_lines):
-                print(f"Line {i+1}: {line.strip()}")
-            return None
+    # Stream the dataset so memory stays bounded however many rows it has
+    mode = f"a sample of {sample_size} rows" if sample_size else "every row"
+    print(f"\nProfiling {mode} in chunks of {chunksize}...")
+    profiler = DatasetProfiler(sample_size=sample_size)
+    for chunk in iter_profile_chunks(cache, dataset, chunksize):
+        profiler.update(chunk)
+    schema_info = profiler.schema()
+    profile = schema_info['profile']['columns']
     
     # Explore the dataset
-    print(f"\nDataset shape: {df.shape}")
-    print(f"Columns: {list(df.columns)}")
-    
-    # Show data types
-    print(f"\nData types:")
-    print(df.dtypes)
+    print(f"\nDataset shape: {tuple(schema_info['shape'])}")
+    print(f"Columns: {schema_info['columns']}")
     
     # Show first few rows
-    print(f"\nFirst 5 rows:")
-    print(df.head())
+    if profiler.head is not None:
+        print(f"\nFirst 5 rows:")
+        print(profiler.head)
     
     # Show sample of company names
-    if 'name' in df.columns:
-        print(f"\nSample company names:")
-        print(df['name'].head(10).tolist())
-    elif 'company_name' in df.columns:
-        print(f"\nSample company names:")
-        print(df['company_name'].head(10).tolist())
+    for name_col in ['name', 'company_name']:
+        if name_col in schema_info['columns']:
+            print(f"\nSample company names:")
+            print(profiler.head[name_col].tolist())
+            break
     
-    # Check for missing values
-    print(f"\nMissing values per column:")
-    print(df.isnull().sum())
+    # Data types, missing values, distinct counts and string lengths per column
+    estimated = " (estimated from the sample)" if sample_size else ""
+    print(f"\nColumn profile{estimated}:")
+    print(f"  {'column':<28} {'dtype':<9} {'type':<8} {'missing':>9} {'distinct~':>10} {'len p50':>8} {'len max':>8}")
+    for col, column in profile.items():
+        lengths = column['string_length'] or {}
+        print(f"  {col:<28} {column['dtype']:<9} {column['inferred_type']:<8} {column['nulls']:>9} "
+              f"{column['distinct_estimate']:>10} {lengths.get('p50', '-'):>8} {lengths.get('max', '-'):>8}")
     
     # Save schema info
-    schema_info = {
-        'shape': df.shape,
-        'columns': list(df.columns),
-        'dtypes': df.dtypes.to_dict(),
-        'missing_values': df.isnull().sum().to_dict(),
-        'sample_companies': df.iloc[:5].to_dict('records') if len(df) > 0 else []
-    }
-    
-    with open('company_dataset_schema.json', 'w') as f:
+    with open(output_file, 'w') as f:
         json.dump(schema_info, f, indent=2, default=str)
     
-    print(f"\nSchema info saved to: company_dataset_schema.json")
+    print(f"\nSchema info saved to: {output_file}")
     
-    return df
+    return schema_info
 
 if __name__ == "__main__":
-    df = download_and_explore_dataset() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Profile a Kaggle company dataset and save its schema')
+    parser.add_argument('--dataset', choices=sorted(DATASETS), default='profiles',
+                       help='profiles: the 10k US company profiles; companies: the 7M-row company dataset')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                       help='Rows read per chunk')
+    parser.add_argument('--fast', action='store_true',
+                       help='Profile a uniform random sample of the rows instead of every row')
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE,
+                       help='Rows kept for profiling with --fast')
+    parser.add_argument('--output', default='company_dataset_schema.json',
+                       help='Where to write the schema JSON')
+    parser.add_argument('--dataset-cache', default=DEFAULT_CACHE_DIR,
+                       help='Directory of the Parquet copies of the Kaggle dataset, converted once per version')
+    args = parser.parse_args()
+
+    download_and_explore_dataset(args.dataset, args.chunksize, args.sample_size if args.fast else None,
+                                 args.output, args.dataset_cache)
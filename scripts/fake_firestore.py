@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+In-Process Fake Firestore
+
+A small stand-in for the firebase_admin Firestore client so ingest code
+can be exercised and benchmarked offline. Documents live in memory and
+every commit sleeps for a configurable round-trip latency, optionally
+failing with a transient error to exercise retries, or with
+RESOURCE_EXHAUSTED once writes exceed a per-second capacity.
+
+Supports the subset of the client API the scripts use: collections,
+document references, write batches, simple queries (where, order_by,
+select, start_after, limit, stream), get_all and count/sum aggregations.
+
+Usage (benchmark sequential vs parallel batch commits):
+python fake_firestore.py --documents 20000 --latency 0.05 --in-flight 1 4 16
+
+Usage (adaptive write rate against a database that accepts 5000 writes/s):
+python fake_firestore.py --documents 200000 --in-flight 16 --capacity 5000 --write-rate 500
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: 'FakeDocumentReference', data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, client: 'FakeFirestore', collection: str, doc_id: str):
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self.collection_name}/{self.id}"
+
+    def get(self) -> FakeDocumentSnapshot:
+        return FakeDocumentSnapshot(self, self._client._read(self.collection_name, self.id))
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        batch = self._client.batch()
+        batch.set(self, data, merge=merge)
+        batch.commit()
+
+    def delete(self):
+        batch = self._client.batch()
+        batch.delete(self)
+        batch.commit()
+
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+
+class FakeQuery:
+    def __init__(self, client: 'FakeFirestore', collection: str, filters: tuple = (),
+                 order: Optional[str] = None, projection: Optional[List[str]] = None,
+                 cursor: Optional[Any] = None, limit: Optional[int] = None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._order = order
+        self._projection = projection
+        self._cursor = cursor
+        self._limit = limit
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        params = {
+            'filters': self._filters, 'order': self._order, 'projection': self._projection,
+            'cursor': self._cursor, 'limit': self._limit,
+        }
+        params.update(changes)
+        return FakeQuery(self._client, self._collection, **params)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None,
+              value: Any = None, *, filter: Any = None) -> 'FakeQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'FakeQuery':
+        return self._copy(order=field_path)
+
+    def select(self, field_paths: List[str]) -> 'FakeQuery':
+        return self._copy(projection=list(field_paths))
+
+    def start_after(self, document_fields: Any) -> 'FakeQuery':
+        if isinstance(document_fields, FakeDocumentSnapshot):
+            value = document_fields.id if self._order in (None, '__name__') else document_fields._data.get(self._order)
+            cursor = (value, document_fields.id)
+        else:
+            value = document_fields.get(self._order or '__name__')
+            if isinstance(value, FakeDocumentReference):
+                value = value.id
+            cursor = (value, value if self._order in (None, '__name__') else None)
+        return self._copy(cursor=cursor)
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(limit=count)
+
+    def _sort_key(self, doc_id: str, data: Dict[str, Any]) -> tuple:
+        if self._order in (None, '__name__'):
+            return (doc_id, doc_id)
+        return (data.get(self._order), doc_id)
+
+    def _results(self) -> List[tuple]:
+        results = []
+        for doc_id, data in self._client._scan(self._collection):
+            if all(field in data and _OPERATORS[op](data[field], value) for field, op, value in self._filters):
+                if self._order not in (None, '__name__') and self._order not in data:
+                    continue
+                results.append((self._sort_key(doc_id, data), doc_id, data))
+        results.sort(key=lambda item: item[0])
+
+        if self._cursor is not None:
+            value, doc_id = self._cursor
+            if doc_id is None:
+                results = [item for item in results if item[0][0] > value]
+            else:
+                results = [item for item in results if item[0] > self._cursor]
+        if self._limit is not None:
+            results = results[:self._limit]
+        return [(doc_id, data) for _, doc_id, data in results]
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        for doc_id, data in self._results():
+            if self._projection is not None:
+                data = {field: data[field] for field in self._projection if field in data}
+            yield FakeDocumentSnapshot(FakeDocumentReference(self._client, self._collection, doc_id), data)
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+    def count(self, alias: Optional[str] = None) -> 'FakeAggregationQuery':
+        return FakeAggregationQuery(self).count(alias)
+
+    def sum(self, field_path: str, alias: Optional[str] = None) -> 'FakeAggregationQuery':
+        return FakeAggregationQuery(self).sum(field_path, alias)
+
+
+class FakeAggregationResult:
+    def __init__(self, alias: str, value: float):
+        self.alias = alias
+        self.value = value
+
+
+class FakeAggregationQuery:
+    def __init__(self, query: FakeQuery):
+        self._query = query
+        self._aggregations: List[tuple] = []
+
+    def count(self, alias: Optional[str] = None) -> 'FakeAggregationQuery':
+        self._aggregations.append(('count', None, alias or 'count'))
+        return self
+
+    def sum(self, field_path: str, alias: Optional[str] = None) -> 'FakeAggregationQuery':
+        self._aggregations.append(('sum', field_path, alias or 'sum'))
+        return self
+
+    def get(self) -> List[List[FakeAggregationResult]]:
+        results = self._query._results()
+        values = []
+        for kind, field_path, alias in self._aggregations:
+            if kind == 'count':
+                values.append(FakeAggregationResult(alias, len(results)))
+            else:
+                total = sum(data.get(field_path) or 0 for _, data in results
+                            if isinstance(data.get(field_path), (int, float)))
+                values.append(FakeAggregationResult(alias, total))
+        return [values]
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: 'FakeFirestore', name: str):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+
+class FakeWriteBatch:
+    def __init__(self, client: 'FakeFirestore'):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append(('set', reference, dict(data), merge))
+
+    def update(self, reference: FakeDocumentReference, data: Dict[str, Any]):
+        self._writes.append(('update', reference, dict(data), True))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        if len(self._writes) > 500:
+            raise google_exceptions.InvalidArgument("maximum 500 writes allowed per request")
+        self._client._commit(self._writes)
+        self._writes = []
+
+
+class FakeFirestore:
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None,
+                 write_capacity: Optional[float] = None):
+        """Create an empty in-memory database
+
+        latency: seconds each commit sleeps, simulating the network round trip
+        failure_rate: probability that a commit raises ServiceUnavailable
+        write_capacity: documents per second accepted over any one-second
+        window; commits beyond it raise ResourceExhausted
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.write_capacity = write_capacity
+        self.commits = 0
+        self.failed_commits = 0
+        self.throttled_commits = 0
+        # (monotonic time, documents) of the commits accepted in the last second
+        self._recent_writes: deque = deque()
+        self._recent_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def get_all(self, references: List[FakeDocumentReference],
+                field_paths: Optional[List[str]] = None) -> Iterator[FakeDocumentSnapshot]:
+        for reference in references:
+            snapshot = reference.get()
+            if field_paths is not None and snapshot.exists:
+                snapshot = FakeDocumentSnapshot(reference, {field: snapshot._data[field]
+                                                            for field in field_paths if field in snapshot._data})
+            yield snapshot
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return len(self._collections.get(collection, {}))
+
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return dict(data) if data is not None else None
+
+    def _scan(self, collection: str) -> List[tuple]:
+        with self._lock:
+            return [(doc_id, dict(data)) for doc_id, data in self._collections.get(collection, {}).items()]
+
+    def _commit(self, writes: List[tuple]):
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                self.failed_commits += 1
+                raise google_exceptions.ServiceUnavailable("fake transient failure")
+
+            if self.write_capacity is not None:
+                now = time.monotonic()
+                while self._recent_writes and now - self._recent_writes[0][0] >= 1.0:
+                    self._recent_count -= self._recent_writes.popleft()[1]
+                if self._recent_count + len(writes) > self.write_capacity:
+                    self.throttled_commits += 1
+                    raise google_exceptions.ResourceExhausted("fake write capacity exceeded")
+                self._recent_writes.append((now, len(writes)))
+                self._recent_count += len(writes)
+
+            # Batches are atomic: validate every update before applying anything
+            for operation, reference, _, _ in writes:
+                if operation == 'update' and reference.id not in self._collections.get(reference.collection_name, {}):
+                    raise google_exceptions.NotFound(f"No document to update: {reference.path}")
+
+            for operation, reference, data, merge in writes:
+                docs = self._collections.setdefault(reference.collection_name, {})
+                if operation == 'delete':
+                    docs.pop(reference.id, None)
+                elif operation == 'update':
+                    docs[reference.id].update(data)
+                elif merge and reference.id in docs:
+                    docs[reference.id].update(data)
+                else:
+                    docs[reference.id] = data
+            self.commits += 1
+
+
+def benchmark_commits(documents: int, latency: float, failure_rate: float, in_flight: int,
+                      capacity: Optional[float] = None, write_rate: float = 0.0) -> Dict[str, float]:
+    """Write `documents` small documents through BatchCommitter and time it
+
+    write_rate > 0 paces the commits with an AdaptiveWriteRate starting there.
+    """
+    from batch_committer import BatchCommitter
+    from write_rate import AdaptiveWriteRate
+
+    db = FakeFirestore(latency=latency, failure_rate=failure_rate, seed=42, write_capacity=capacity)
+    companies_ref = db.collection('companies')
+    rate = AdaptiveWriteRate(initial_rate=write_rate) if write_rate > 0 else None
+
+    start = time.perf_counter()
+    with BatchCommitter(db, max_in_flight=in_flight, base_delay=latency or 0.01, write_rate=rate) as committer:
+        for i in range(documents):
+            committer.set(companies_ref.document(), {'name': f"Company {i}", 'submissionCount': 0})
+    elapsed = time.perf_counter() - start
+
+    return {
+        'in_flight': in_flight,
+        'seconds': elapsed,
+        'docs_per_second': documents / elapsed if elapsed else float('inf'),
+        'written': db.count('companies'),
+        'retries': committer.stats.retries,
+        'throttled': committer.stats.throttled,
+        'failed_batches': committer.stats.batches_failed,
+        'final_rate': rate.rate if rate else None,
+    }
+
+
+def main():
+    """Benchmark batch commit throughput against the fake database"""
+    parser = argparse.ArgumentParser(description='Benchmark Firestore batch commits offline')
+    parser.add_argument('--documents', type=int, default=20000, help='Documents to write per run')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated commit round trip in seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Probability a commit fails transiently')
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 4, 16],
+                       help='Max in-flight batch settings to compare')
+    parser.add_argument('--capacity', type=float, default=None,
+                       help='Documents per second the fake accepts before throttling (default: unlimited)')
+    parser.add_argument('--write-rate', type=float, default=0.0,
+                       help='Pace commits with an adaptive write rate starting here (default: unpaced)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    print(f"Writing {args.documents} documents, {args.latency * 1000:.0f}ms commit latency, "
+          f"{args.failure_rate:.0%} failure rate")
+    for in_flight in args.in_flight:
+        result = benchmark_commits(args.documents, args.latency, args.failure_rate, in_flight,
+                                   capacity=args.capacity, write_rate=args.write_rate)
+        rate = f", final rate target {result['final_rate']:.0f} docs/s" if result['final_rate'] else ""
+        print(f"  in-flight={result['in_flight']:>3}: {result['seconds']:.2f}s, "
+              f"{result['docs_per_second']:.0f} docs/s, {result['written']} written, "
+              f"{result['retries']} retries ({result['throttled']} throttled), "
+              f"{result['failed_batches']} failed batches{rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Paginated Firestore Collection Scans
+
+Walks a collection in fixed-size pages ordered by document ID, using a
+start_after cursor between pages. Only one page is held in memory at a
+time, and an optional field projection keeps each page small:
+fields=[] returns references only, without document bodies.
+"""
+
+from typing import Iterator, List, Optional
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def iter_pages(collection_ref, page_size: int = DEFAULT_PAGE_SIZE,
+               fields: Optional[List[str]] = None,
+               start_after_id: Optional[str] = None) -> Iterator[list]:
+    """Yield lists of document snapshots, one page at a time"""
+    query = collection_ref.order_by('__name__')
+    if fields is not None:
+        query = query.select(fields)
+    query = query.limit(page_size)
+
+    last_id = start_after_id
+    while True:
+        page_query = query.start_after({'__name__': last_id}) if last_id else query
+        page = list(page_query.stream())
+        if not page:
+            return
+
+        yield page
+
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
+def iter_documents(collection_ref, page_size: int = DEFAULT_PAGE_SIZE,
+                   fields: Optional[List[str]] = None) -> Iterator:
+    """Yield document snapshots one at a time, fetched page by page"""
+    for page in iter_pages(collection_ref, page_size, fields):
+        yield from page
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Firestore Collection Statistics
+
+Computes collection statistics without downloading every document:
+
+- Counts and sums come from server-side aggregation queries, which return
+  a single small result instead of the documents themselves
+- Storage size is estimated from a random sample of documents, applying
+  Firestore's documented storage size rules to their real contents and
+  scaling by the document count
+- The sample is many short runs of documents, each read after its own
+  random start ID. Start IDs are drawn from both ID schemes in use
+  (auto IDs and the hex IDs derived from normalizedName), so neither kind
+  of collection funnels the runs into one region. IDs following another
+  scheme, or a collection mixing the two schemes in very different
+  proportions, can still bias the estimate
+
+If the client or backend does not support aggregation queries, counts and
+sums fall back to a projected paginated scan.
+"""
+
+import datetime
+import math
+import random
+import string
+from typing import Any, Dict, List, Optional
+
+from firestore_scan import iter_pages
+
+DEFAULT_SAMPLE_SIZE = 200
+DEFAULT_RUN_LENGTH = 10
+
+# Firestore adds 32 bytes per document and 16 bytes per document name
+DOCUMENT_OVERHEAD_BYTES = 32
+DOCUMENT_NAME_OVERHEAD_BYTES = 16
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+_HEX_ID_CHARS = string.digits + 'abcdef'
+_ID_LENGTH = 20
+
+
+def aggregate(query, count_alias: str = 'count', sum_fields: Optional[List[str]] = None) -> Dict[str, float]:
+    """Run one aggregation query returning the count and any field sums"""
+    aggregation = query.count(alias=count_alias)
+    for field in sum_fields or []:
+        aggregation = aggregation.sum(field, alias=field)
+
+    results = aggregation.get()
+    return {result.alias: result.value for result in results[0]}
+
+
+def count_documents(query) -> int:
+    """Count documents with an aggregation query, scanning references if unsupported"""
+    try:
+        return int(aggregate(query)['count'])
+    except (AttributeError, NotImplementedError):
+        return sum(len(page) for page in iter_pages(query, fields=[]))
+
+
+def sum_field(query, field: str) -> float:
+    """Sum a numeric field with an aggregation query, scanning that field if unsupported"""
+    try:
+        return aggregate(query, sum_fields=[field]).get(field) or 0
+    except (AttributeError, NotImplementedError):
+        return sum(
+            (doc.to_dict() or {}).get(field) or 0
+            for page in iter_pages(query, fields=[field])
+            for doc in page
+        )
+
+
+def _string_size(value: str) -> int:
+    return len(value.encode('utf-8')) + 1
+
+
+def document_name_size(collection_name: str, doc_id: str) -> int:
+    """Storage size of a document name in a top-level collection"""
+    return _string_size(collection_name) + _string_size(doc_id) + DOCUMENT_NAME_OVERHEAD_BYTES
+
+
+def value_size(value: Any) -> int:
+    """Storage size of a single field value"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime.datetime)):
+        return 8
+    if isinstance(value, str):
+        return _string_size(value)
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_string_size(str(key)) + value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(value_size(item) for item in value)
+    if hasattr(value, 'latitude') and hasattr(value, 'longitude'):
+        return 16
+    if hasattr(value, 'path'):
+        # Document reference: size of the referenced document name
+        return sum(_string_size(part) for part in value.path.split('/')) + DOCUMENT_NAME_OVERHEAD_BYTES
+    return _string_size(str(value))
+
+
+def document_size(collection_name: str, doc_id: str, data: Dict[str, Any]) -> int:
+    """Storage size of a document following Firestore's size calculation rules"""
+    fields_size = sum(_string_size(key) + value_size(value) for key, value in data.items())
+    return document_name_size(collection_name, doc_id) + fields_size + DOCUMENT_OVERHEAD_BYTES
+
+
+def random_start_id(rng: random.Random = random) -> str:
+    """A random position among auto IDs or among the hex IDs derived from normalizedName"""
+    chars = _AUTO_ID_CHARS if rng.random() < 0.5 else _HEX_ID_CHARS
+    return ''.join(rng.choice(chars) for _ in range(_ID_LENGTH))
+
+
+def sample_documents(collection_ref, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                     run_length: int = DEFAULT_RUN_LENGTH, rng: random.Random = random) -> list:
+    """Read short runs of documents, each starting after its own random ID
+
+    A single long run is only uniform if the IDs are uniformly spread over
+    the alphabet of the start ID; short independent runs keep clustered
+    IDs from dominating the sample.
+    """
+    query = collection_ref.order_by('__name__')
+    sample = []
+    seen = set()
+    # Runs that wrap around or overlap add duplicates, so allow some extra runs
+    for _ in range(2 * math.ceil(sample_size / run_length)):
+        if len(sample) >= sample_size:
+            break
+        run = list(query.start_after({'__name__': random_start_id(rng)}).limit(run_length).stream())
+        if len(run) < run_length:
+            # Wrap around to the start of the collection
+            run.extend(query.limit(run_length - len(run)).stream())
+        for doc in run:
+            if doc.id not in seen:
+                seen.add(doc.id)
+                sample.append(doc)
+    return sample[:sample_size]
+
+
+def estimate_storage(collection_ref, total_documents: int,
+                     sample_size: int = DEFAULT_SAMPLE_SIZE) -> Dict[str, float]:
+    """Estimate collection storage from the encoded size of sampled documents"""
+    if total_documents == 0:
+        return {'sampled': 0, 'average_bytes': 0.0, 'total_bytes': 0.0}
+
+    sample = sample_documents(collection_ref, min(sample_size, total_documents))
+    sizes = [document_size(collection_ref.id, doc.id, doc.to_dict() or {}) for doc in sample]
+    average = sum(sizes) / len(sizes) if sizes else 0.0
+
+    return {
+        'sampled': len(sizes),
+        'average_bytes': average,
+        'total_bytes': average * total_documents,
+    }
+
+
+def company_statistics(db, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Dict[str, float]:
+    """Company counts, submission totals and estimated storage"""
+    # Imported here so the size helpers work without the Firestore client installed
+    from google.cloud.firestore_v1.base_query import FieldFilter
+
+    companies_ref = db.collection('companies')
+    total = count_documents(companies_ref)
+    with_submissions = count_documents(companies_ref.where(filter=FieldFilter('submissionCount', '>', 0)))
+    submissions_recorded = sum_field(companies_ref, 'submissionCount')
+    storage = estimate_storage(companies_ref, total, sample_size)
+
+    return {
+        'total': total,
+        'with_submissions': with_submissions,
+        'submissions_recorded': int(submissions_recorded),
+        'sampled': storage['sampled'],
+        'average_bytes': storage['average_bytes'],
+        'storage_bytes': storage['total_bytes'],
+    }
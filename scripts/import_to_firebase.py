@@ -2,10 +2,103 @@ import json
 import firebase_admin
 from firebase_admin import credentials, firestore
 import os
+import argparse
 from datetime import datetime
+from itertools import islice
 
-def import_companies_to_firebase():
-    """Import cleaned company data to Firebase Firestore with unified structure"""
+from autocomplete_prefixes import DEFAULT_TOP_K, AutocompletePrefixes
+from batch_committer import BatchCommitter
+from company_columnar import batch_to_companies, columnar_format, iter_record_batches
+from company_upsert import CompanyUpserter
+from ingest_manifest import DEFAULT_MANIFEST_PATH, IngestManifest
+from run_metrics import add_metrics_arguments, run_metrics_from_args, stage
+from search_index import DEFAULT_INDEX_PATH, SearchIndex
+
+DEFAULT_INPUT_FILE = 'us_companies_cleaned.json'
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+# Fields taken from the export; a change in any of them triggers an update
+IMPORT_FIELDS = [
+    "name", "normalizedName", "aliases", "website", "location", "industry",
+    "company_size", "company_type", "founded_year", "specialities", "locations",
+]
+
+def build_firebase_company(company, now=None):
+    """Prepare company data for Firebase"""
+    now = now or datetime.now()
+    firebase_company = {field: company[field] for field in IMPORT_FIELDS}
+    firebase_company.update({
+        # Initialize dynamic fields
+        "submissionCount": 0,
+        "lastSubmission": None,
+        "commonFlags": [],
+        "averageFlagCount": 0,
+        "severityTrends": {
+            "light": 0,
+            "medium": 0
+        },
+        "createdAt": now,
+        "updatedAt": now
+    })
+    return firebase_company
+
+def iter_companies(input_file):
+    """Yield companies from a JSON array file or, streaming line by line, an NDJSON file"""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        if input_file.endswith(NDJSON_SUFFIXES):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+def iter_company_batches(input_file, batch_size):
+    """Yield lists of at most batch_size companies from any export format"""
+    if columnar_format(input_file):
+        # Memory-mapped record batches; only the current batch becomes Python objects
+        for record_batch in iter_record_batches(input_file, batch_size):
+            yield batch_to_companies(record_batch)
+    else:
+        yield from iter_batches(iter_companies(input_file), batch_size)
+
+def iter_batches(iterable, batch_size):
+    """Group an iterable into lists of at most batch_size items"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+class ImportStats:
+    """Running statistics over the companies read"""
+    def __init__(self):
+        self.total = 0
+        self.with_normalized_name = 0
+        self.with_aliases = 0
+        self.with_website = 0
+        self.with_location = 0
+        self.sample = None
+    
+    def add(self, companies):
+        for company in companies:
+            if self.sample is None:
+                self.sample = company
+            self.total += 1
+            self.with_normalized_name += bool(company['normalizedName'])
+            self.with_aliases += bool(company['aliases'])
+            self.with_website += bool(company['website'])
+            self.with_location += bool(company['location'])
+
+def import_companies_to_firebase(input_file=DEFAULT_INPUT_FILE, manifest_path=DEFAULT_MANIFEST_PATH,
+                                 use_manifest=True, index_path=DEFAULT_INDEX_PATH,
+                                 autocomplete_top_k=DEFAULT_TOP_K):
+    """Import cleaned company data to Firebase Firestore with unified structure
+    
+    Committed companies also update the autocomplete prefix documents,
+    unless autocomplete_top_k is None.
+    Returns the number of companies read, or None without credentials.
+    """
     
     print("Setting up Firebase connection...")
     
@@ -31,12 +124,9 @@ def import_companies_to_firebase():
     # Initialize Firestore
     db = firestore.client()
     
-    # Load the cleaned company data
-    print("\nLoading cleaned company data...")
-    with open('us_companies_cleaned.json', 'r', encoding='utf-8') as f:
-        companies = json.load(f)
-    
-    print(f"Found {len(companies)} companies to import")
+    # Stream the cleaned company data; batches commit while the file is still being read
+    print(f"\nReading cleaned company data from {input_file}...")
+    stats = ImportStats()
     
     # Create companies collection
     companies_ref = db.collection('companies')
@@ -45,52 +135,59 @@ def import_companies_to_firebase():
     batch_size = 500
     total_imported = 0
     
-    print(f"\nImporting companies in batches of {batch_size}...")
+    # Prefix documents for the dropdown, collected from committed batches
+    autocomplete = AutocompletePrefixes(db, top_k=autocomplete_top_k) if autocomplete_top_k else None
     
-    for i in range(0, len(companies), batch_size):
-        batch = companies[i:i + batch_size]
+    if use_manifest:
+        # Deterministic IDs + content hashes: unchanged companies cost no writes
+        print(f"\nSyncing companies against manifest {manifest_path}...")
+        manifest = IngestManifest(manifest_path)
+        # The search index uses the same normalizedName-derived IDs, so it is updated alongside
+        search_index = SearchIndex.load(index_path) if index_path else None
+        try:
+            upserter = CompanyUpserter(db, manifest, static_fields=IMPORT_FIELDS, script='import_to_firebase',
+                                       autocomplete=autocomplete)
+            for batch_number, batch in enumerate(iter_company_batches(input_file, batch_size), start=1):
+                stats.add(batch)
+                if search_index:
+                    search_index.update(batch)
+                now = datetime.now()
+                upserter.upsert_documents(build_firebase_company(company, now) for company in batch)
+                print(f"✓ Processed batch {batch_number}: {stats.total} companies read")
+            # Other sources share the collection, so companies missing from this file are kept
+            counts = upserter.finish(delete_missing=False)
+        finally:
+            manifest.close()
+        
+        if search_index:
+            with stage('search_index', rows=len(search_index.companies)):
+                search_index.save(index_path)
+            print(f"✓ Search index {index_path}: {search_index.counts['added']} added, "
+                  f"{search_index.counts['updated']} updated, {search_index.counts['unchanged']} unchanged")
         
-        # Create a new batch
-        batch_write = db.batch()
+        total_imported = counts['created'] + counts['updated']
+        print(f"✓ {counts['created']} created, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {counts['failed']} failed writes")
+    else:
+        print(f"\nImporting companies in batches of {batch_size}...")
         
-        for company in batch:
-            # Create document with auto-generated ID
-            doc_ref = companies_ref.document()
-            
-            # Prepare company data for Firebase
-            firebase_company = {
-                "name": company["name"],
-                "normalizedName": company["normalizedName"],
-                "aliases": company["aliases"],
-                "website": company["website"],
-                "location": company["location"],
-                "industry": company["industry"],
-                "company_size": company["company_size"],
-                "company_type": company["company_type"],
-                "founded_year": company["founded_year"],
-                "specialities": company["specialities"],
-                "locations": company["locations"],
-                
-                # Initialize dynamic fields
-                "submissionCount": 0,
-                "lastSubmission": None,
-                "commonFlags": [],
-                "averageFlagCount": 0,
-                "severityTrends": {
-                    "light": 0,
-                    "medium": 0
-                },
-                "createdAt": datetime.now(),
-                "updatedAt": datetime.now()
-            }
-            
-            # Add to batch
-            batch_write.set(doc_ref, firebase_company)
+        on_batch_done = autocomplete.on_batch_done if autocomplete is not None else None
+        with BatchCommitter(db, on_batch_done=on_batch_done) as committer:
+            for batch_number, batch in enumerate(iter_company_batches(input_file, batch_size), start=1):
+                stats.add(batch)
+                now = datetime.now()
+                for company in batch:
+                    # Create document with auto-generated ID
+                    committer.set(companies_ref.document(), build_firebase_company(company, now))
+                print(f"✓ Queued batch {batch_number}: {stats.total} companies read")
         
-        # Commit the batch
-        batch_write.commit()
-        total_imported += len(batch)
-        print(f"✓ Imported batch {i//batch_size + 1}: {total_imported}/{len(companies)} companies")
+        total_imported = committer.stats.documents_written
+    
+    if autocomplete is not None:
+        # Companies from other sources stay, so merge into the stored prefixes
+        with stage('autocomplete') as span:
+            span['rows'] = autocomplete.write()['prefixes']
+        print(f"✓ Updated {span['rows']} autocomplete prefix documents")
     
     print(f"\n🎉 Successfully imported {total_imported} companies to Firebase!")
     print("Collection: companies")
@@ -99,20 +196,48 @@ def import_companies_to_firebase():
     
     # Show some statistics about the imported data
     print(f"\nImport statistics:")
+    print(f"- Companies read: {stats.total}")
     print(f"- Total companies imported: {total_imported}")
-    print(f"- Companies with normalized names: {sum(1 for c in companies if c['normalizedName'])}")
-    print(f"- Companies with aliases: {sum(1 for c in companies if c['aliases'])}")
-    print(f"- Companies with websites: {sum(1 for c in companies if c['website'])}")
-    print(f"- Companies with locations: {sum(1 for c in companies if c['location'])}")
+    print(f"- Companies with normalized names: {stats.with_normalized_name}")
+    print(f"- Companies with aliases: {stats.with_aliases}")
+    print(f"- Companies with websites: {stats.with_website}")
+    print(f"- Companies with locations: {stats.with_location}")
     
     # Show sample of imported structure
-    print(f"\nSample imported company structure:")
-    sample_company = companies[0]
-    print(f"Name: {sample_company['name']}")
-    print(f"Normalized: {sample_company['normalizedName']}")
-    print(f"Aliases: {sample_company['aliases'][:3]}...")
-    print(f"Website: {sample_company['website']}")
-    print(f"Location: {sample_company['location']}")
+    sample_company = stats.sample
+    if sample_company:
+        print(f"\nSample imported company structure:")
+        print(f"Name: {sample_company['name']}")
+        print(f"Normalized: {sample_company['normalizedName']}")
+        print(f"Aliases: {sample_company['aliases'][:3]}...")
+        print(f"Website: {sample_company['website']}")
+        print(f"Location: {sample_company['location']}")
+    
+    return stats.total
 
 if __name__ == "__main__":
-    import_companies_to_firebase() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Import cleaned companies into Firestore')
+    parser.add_argument('--input', default=DEFAULT_INPUT_FILE,
+                       help='Export to import: a JSON array, NDJSON (.ndjson/.jsonl) read as a stream, '
+                            'or a memory-mapped Parquet/Arrow file (.parquet/.arrow)')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_PATH,
+                       help='Local manifest used to skip companies unchanged since the last import')
+    parser.add_argument('--no-manifest', action='store_true',
+                       help='Re-upload every company with auto-generated IDs (the search index is not updated)')
+    parser.add_argument('--search-index', default=DEFAULT_INDEX_PATH,
+                       help='Search index file updated incrementally with the imported companies')
+    parser.add_argument('--no-search-index', action='store_true',
+                       help='Do not update the search index')
+    parser.add_argument('--no-autocomplete', action='store_true',
+                       help='Skip updating the autocomplete_prefixes collection')
+    parser.add_argument('--autocomplete-top-k', type=int, default=DEFAULT_TOP_K,
+                       help='Companies kept per autocomplete prefix document')
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    
+    with run_metrics_from_args('import_to_firebase', args), stage('import') as span:
+        span['rows'] = import_companies_to_firebase(input_file=args.input, manifest_path=args.manifest,
+                                                    use_manifest=not args.no_manifest,
+                                                    index_path=None if args.no_search_index else args.search_index,
+                                                    autocomplete_top_k=None if args.no_autocomplete
+                                                    else args.autocomplete_top_k)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Ingest Benchmark Suite
+
+Times each stage of the company ingest on a synthetic dataset and writes
+a machine-readable JSON report, so runs on different commits or hosts can
+be compared:
+
+- load: read the name column of the CSV
+- clean: clean_company_data's cleaning (ParallelNameCleaner)
+- normalize: normalize_company_names
+- alias: generate_aliases_batch
+- dedup: fuzzy near-duplicate clustering (dedupe_company_names)
+- build: build the Firestore documents batch by batch
+- commit: write documents through BatchCommitter, to the in-process
+  FakeFirestore or to a Firestore emulator (FIRESTORE_EMULATOR_HOST)
+
+Each stage reports rows, seconds, rows/sec and peak RSS. On Linux the
+peak is reset before every stage, so it is that stage's own peak;
+elsewhere it is the process peak so far. Worker processes are reported
+separately as peak_child_rss_mb.
+
+Usage:
+python ingest_benchmark.py --size 1m --output baseline.json
+python ingest_benchmark.py --size 1m --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from batch_committer import BatchCommitter
+from company_dedup import DEFAULT_THRESHOLD, dedupe_company_names
+from company_documents import iter_document_batches
+from company_names import generate_aliases_batch, normalize_company_names
+from fake_firestore import FakeFirestore
+from parallel_clean import ParallelNameCleaner
+from run_metrics import maxrss_mb, peak_rss_mb, reset_peak_rss, status_mb
+from synthetic_companies import SIZES, generate_synthetic_csv
+
+REPORT_VERSION = 1
+STAGES = ['load', 'clean', 'normalize', 'alias', 'dedup', 'build', 'commit']
+
+# Committing millions of documents into the in-memory fake measures memory, not ingest
+DEFAULT_COMMIT_ROWS = 200_000
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+class StageRecorder:
+    def __init__(self):
+        """Collect timing and memory for each benchmark stage"""
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str, rows: int) -> Iterator[Dict[str, Any]]:
+        """Time a stage over `rows` input rows; the caller may add fields to the yielded record"""
+        record: Dict[str, Any] = {'name': name, 'rows': rows}
+        per_stage_peak = reset_peak_rss()
+        rss_before = status_mb('VmRSS')
+        start = time.perf_counter()
+        yield record
+        seconds = time.perf_counter() - start
+
+        record.update({
+            'seconds': _round(seconds, 4),
+            'rows_per_second': _round(record['rows'] / seconds if seconds else None, 1),
+            'peak_rss_mb': _round(peak_rss_mb(), 1),
+            'peak_rss_scope': 'stage' if per_stage_peak else 'process',
+            'rss_delta_mb': _round((status_mb('VmRSS') or 0) - (rss_before or 0), 1) if rss_before else None,
+            'peak_child_rss_mb': _round(maxrss_mb(resource.RUSAGE_CHILDREN), 1),
+        })
+        self.stages.append(record)
+        print(f"  {name:<10} {record['rows']:>10} rows  {seconds:>8.2f}s  "
+              f"{record['rows_per_second'] or 0:>12.0f} rows/s  peak {record['peak_rss_mb']:.0f} MB")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _firestore_client(target: str, project: str):
+    if target == 'fake':
+        return None
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        raise SystemExit("--target emulator needs FIRESTORE_EMULATOR_HOST (e.g. localhost:8080)")
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore as google_firestore
+    return google_firestore.Client(project=project, credentials=AnonymousCredentials())
+
+
+def run_benchmark(csv_path: str, stages: List[str], workers: int = 1, commit_rows: int = DEFAULT_COMMIT_ROWS,
+                  dedup_rows: Optional[int] = None, threshold: float = DEFAULT_THRESHOLD,
+                  target: str = 'fake', latency: float = 0.02, max_in_flight: int = 8,
+                  collection: str = 'benchmark_companies', project: str = 'demo-benchmark') -> List[Dict[str, Any]]:
+    """Run the selected stages on one CSV and return the stage records"""
+    recorder = StageRecorder()
+
+    with recorder.stage('load', 0) as record:
+        header = pd.read_csv(csv_path, nrows=0).columns
+        name_col = 'name' if 'name' in header else header[0]
+        names = pd.read_csv(csv_path, usecols=[name_col], dtype={name_col: str})[name_col].rename('name')
+        record['rows'] = len(names)
+
+    # Later stages need cleaned names even when 'clean' itself isn't being timed
+    if 'clean' in stages:
+        with recorder.stage('clean', len(names)) as record, ParallelNameCleaner(workers) as cleaner:
+            companies = cleaner.clean(names)
+            record['output_rows'] = len(companies)
+    else:
+        with ParallelNameCleaner(workers) as cleaner:
+            companies = cleaner.clean(names)
+    del names
+
+    if 'normalize' in stages:
+        with recorder.stage('normalize', len(companies)):
+            normalize_company_names(companies['name'])
+
+    if 'alias' in stages:
+        with recorder.stage('alias', len(companies)) as record:
+            aliases = generate_aliases_batch(companies['name'])
+            record['aliases_per_company'] = _round(sum(map(len, aliases)) / max(len(aliases), 1), 2)
+            del aliases
+
+    if 'dedup' in stages:
+        sample = companies['name'] if dedup_rows is None else companies['name'].head(dedup_rows)
+        with recorder.stage('dedup', len(sample)) as record:
+            record['output_rows'] = len(dedupe_company_names(sample, threshold))
+
+    if 'build' in stages:
+        with recorder.stage('build', len(companies)) as record:
+            built = 0
+            for documents in iter_document_batches(companies):
+                built += len(documents)
+            record['rows'] = built
+
+    if 'commit' in stages:
+        to_commit = companies.head(commit_rows)
+        client = _firestore_client(target, project)
+        db = client if client is not None else FakeFirestore(latency=latency)
+        collection_ref = db.collection(collection)
+        with recorder.stage('commit', len(to_commit)) as record:
+            with BatchCommitter(db, max_in_flight=max_in_flight) as committer:
+                for documents in iter_document_batches(to_commit):
+                    for document in documents:
+                        committer.set(collection_ref.document(), document)
+            record.update({
+                'target': target,
+                'latency_seconds': latency if target == 'fake' else None,
+                'max_in_flight': max_in_flight,
+                'documents_written': committer.stats.documents_written,
+                'documents_failed': committer.stats.documents_failed,
+                'retries': committer.stats.retries,
+            })
+
+    return recorder.stages
+
+
+def build_report(stages: List[Dict[str, Any]], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap stage records with the run's parameters and environment"""
+    pipeline_seconds = sum(stage['seconds'] for stage in stages)
+    return {
+        'benchmark': 'company-ingest',
+        'version': REPORT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'params': params,
+        'stages': stages,
+        'total': {
+            'seconds': _round(pipeline_seconds, 4),
+            'peak_rss_mb': _round(max(stage['peak_rss_mb'] for stage in stages), 1),
+        },
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-stage speed and memory ratios of current vs baseline (>1 means faster / more memory)"""
+    baseline_stages = {stage['name']: stage for stage in baseline['stages']}
+    rows = []
+    for stage in current['stages']:
+        before = baseline_stages.get(stage['name'])
+        if before is None:
+            continue
+        rows.append({
+            'name': stage['name'],
+            'speedup': _round(stage['rows_per_second'] / before['rows_per_second'], 3)
+            if stage['rows_per_second'] and before['rows_per_second'] else None,
+            'peak_rss_ratio': _round(stage['peak_rss_mb'] / before['peak_rss_mb'], 3)
+            if before['peak_rss_mb'] else None,
+        })
+    return rows
+
+
+def main():
+    """Generate (or reuse) a synthetic dataset, benchmark the ingest stages and write JSON"""
+    parser = argparse.ArgumentParser(description='Benchmark the company ingest pipeline stage by stage')
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k',
+                       help='Synthetic dataset size (ignored if --rows or --csv is given)')
+    parser.add_argument('--rows', type=int, default=None, help='Exact synthetic row count')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic dataset seed')
+    parser.add_argument('--csv', default=None,
+                       help='Benchmark this CSV instead of a synthetic dataset')
+    parser.add_argument('--data-dir', default='benchmark_data',
+                       help='Where generated datasets are cached between runs')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES,
+                       help='Stages to time (load always runs)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help='Processes for the clean stage')
+    parser.add_argument('--dedup-rows', type=int, default=None,
+                       help='Only fuzzy-dedup the first N cleaned names')
+    parser.add_argument('--commit-rows', type=int, default=DEFAULT_COMMIT_ROWS,
+                       help='Documents written in the commit stage')
+    parser.add_argument('--target', choices=['fake', 'emulator'], default='fake',
+                       help='Commit to the in-process fake or to FIRESTORE_EMULATOR_HOST')
+    parser.add_argument('--latency', type=float, default=0.02,
+                       help='Simulated commit round trip of the fake, in seconds')
+    parser.add_argument('--max-in-flight', type=int, default=8,
+                       help='Maximum number of batches committing at the same time')
+    parser.add_argument('--project', default='demo-benchmark', help='Emulator project ID')
+    parser.add_argument('--output', default='ingest_benchmark.json', help='Where to write the JSON report')
+    parser.add_argument('--compare', default=None, help='Baseline JSON report to compare against')
+
+    args = parser.parse_args()
+
+    if args.csv:
+        csv_path = args.csv
+    else:
+        rows = args.rows or SIZES[args.size]
+        os.makedirs(args.data_dir, exist_ok=True)
+        csv_path = os.path.join(args.data_dir, f"synthetic_companies_{rows}_seed{args.seed}.csv")
+        if not os.path.exists(csv_path):
+            print(f"📝 Generating {rows} synthetic companies: {csv_path}")
+            start = time.perf_counter()
+            generate_synthetic_csv(csv_path, rows, args.seed)
+            print(f"   done in {time.perf_counter() - start:.1f}s")
+
+    print(f"⏱️  Benchmarking {csv_path}")
+    stages = run_benchmark(
+        csv_path, args.stages, workers=args.workers, commit_rows=args.commit_rows,
+        dedup_rows=args.dedup_rows, target=args.target, latency=args.latency,
+        max_in_flight=args.max_in_flight, project=args.project,
+    )
+    params = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    params['csv'] = csv_path
+    report = build_report(stages, params)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['comparison'] = {'baseline': args.compare, 'stages': compare_reports(json.load(f), report)}
+        print("📊 Compared with baseline (speedup > 1 is faster):")
+        for row in report['comparison']['stages']:
+            print(f"  {row['name']:<10} speedup {row['speedup']}  peak RSS x{row['peak_rss_ratio']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
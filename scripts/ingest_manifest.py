@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Local Ingest Manifest
+
+A SQLite file recording what the population scripts last wrote to
+Firestore: one row per document with its deterministic ID, normalized
+name and a hash of the written content. Incremental runs diff the
+incoming dataset against it so only created, changed or removed
+companies cost a write.
+
+Rows are kept per writing script, so scripts sharing one manifest (and
+one collection) never see each other's companies as missing: a script
+only deletes documents that it alone wrote.
+
+Every row also carries the ID of the last run that saw it, so documents
+missing from a full run can be found without holding the dataset in memory.
+The runs table keeps per-run timing and write counts.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+DEFAULT_MANIFEST_PATH = 'ingest_manifest.sqlite'
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+RUN_COLUMNS = {
+    'script': 'TEXT',
+    'collection': 'TEXT',
+    'finished_at': 'TEXT',
+    'duration_seconds': 'REAL',
+    'created': 'INTEGER',
+    'updated': 'INTEGER',
+    'unchanged': 'INTEGER',
+    'deleted': 'INTEGER',
+    'skipped': 'INTEGER',
+    'writes': 'INTEGER',
+    'failed': 'INTEGER',
+}
+
+
+def _canonical(value: Any) -> Any:
+    # Lists of strings (aliases) are sets: their order must not change the hash
+    if isinstance(value, (list, tuple)) and all(isinstance(item, str) for item in value):
+        return sorted(value)
+    return value
+
+
+def content_hash(fields: Dict[str, Any]) -> str:
+    """Stable hash of the document fields an import writes"""
+    canonical = {field: _canonical(value) for field, value in fields.items()}
+    encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class IngestManifest:
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        """Open (or create) the manifest database"""
+        self.path = path
+        # Batch commit callbacks record results from worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                );
+            ''')
+            # Run bookkeeping columns, added to manifests created before they existed
+            existing = {row[1] for row in self._conn.execute('PRAGMA table_info(runs)')}
+            for column, column_type in RUN_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f'ALTER TABLE runs ADD COLUMN {column} {column_type}')
+
+            document_columns = {row[1] for row in self._conn.execute('PRAGMA table_info(documents)')}
+            if document_columns and 'script' not in document_columns:
+                self._migrate_documents()
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    script TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    normalized_name TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    run_id INTEGER NOT NULL,
+                    PRIMARY KEY (collection, script, doc_id)
+                );
+                CREATE INDEX IF NOT EXISTS documents_run ON documents (collection, script, run_id);
+                CREATE INDEX IF NOT EXISTS documents_doc ON documents (collection, doc_id);
+            ''')
+
+    def _migrate_documents(self):
+        # Manifests from before rows were kept per script: each row goes to
+        # the script of the run that last saw it
+        self._conn.executescript('''
+            ALTER TABLE documents RENAME TO documents_unscoped;
+            DROP INDEX IF EXISTS documents_run;
+            CREATE TABLE documents (
+                collection TEXT NOT NULL,
+                script TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                normalized_name TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                run_id INTEGER NOT NULL,
+                PRIMARY KEY (collection, script, doc_id)
+            );
+            INSERT INTO documents (collection, script, doc_id, normalized_name, content_hash, run_id)
+                SELECT d.collection, COALESCE(r.script, ''), d.doc_id, d.normalized_name, d.content_hash, d.run_id
+                FROM documents_unscoped d LEFT JOIN runs r ON r.run_id = d.run_id;
+            DROP TABLE documents_unscoped;
+        ''')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def begin_run(self, script: str = '', collection: str = '') -> int:
+        """Start a new run and return its ID"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'INSERT INTO runs (script, collection) VALUES (?, ?)', (script, collection)
+            ).lastrowid
+
+    def finish_run(self, run_id: int, duration_seconds: float, counts: Dict[str, int]):
+        """Record timing and write counts for a finished run"""
+        columns = [column for column in RUN_COLUMNS if column in counts]
+        assignments = ''.join(f', {column} = ?' for column in columns)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'UPDATE runs SET finished_at = CURRENT_TIMESTAMP, duration_seconds = ?{assignments} '
+                f'WHERE run_id = ?',
+                [duration_seconds, *(counts[column] for column in columns), run_id],
+            )
+
+    def recent_runs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recent runs, newest first"""
+        with self._lock:
+            cursor = self._conn.execute('SELECT * FROM runs ORDER BY run_id DESC LIMIT ?', (limit,))
+            names = [description[0] for description in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def count(self, collection: str, script: str = '') -> int:
+        """Number of documents the given script has written to a collection"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM documents WHERE collection = ? AND script = ?', (collection, script)
+            ).fetchone()[0]
+
+    def lookup(self, collection: str, doc_ids: List[str], script: str = '') -> Dict[str, Tuple[str, int]]:
+        """Return {doc_id: (content_hash, run_id)} for the IDs the script already wrote"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(doc_ids), _LOOKUP_CHUNK):
+                chunk = doc_ids[i:i + _LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT doc_id, content_hash, run_id FROM documents '
+                    f'WHERE collection = ? AND script = ? AND doc_id IN ({placeholders})',
+                    [collection, script, *chunk],
+                )
+                found.update((doc_id, (digest, run_id)) for doc_id, digest, run_id in rows)
+        return found
+
+    def touch(self, collection: str, doc_ids: Iterable[str], run_id: int, script: str = ''):
+        """Mark documents as seen in this run without changing their hash"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'UPDATE documents SET run_id = ? WHERE collection = ? AND script = ? AND doc_id = ?',
+                [(run_id, collection, script, doc_id) for doc_id in doc_ids],
+            )
+
+    def record(self, collection: str, rows: Iterable[Tuple[str, str, str]], run_id: int, script: str = ''):
+        """Record (doc_id, normalized_name, content_hash) rows as written in this run"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO documents (collection, script, doc_id, normalized_name, content_hash, run_id) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (collection, script, doc_id) DO UPDATE SET '
+                'normalized_name = excluded.normalized_name, '
+                'content_hash = excluded.content_hash, run_id = excluded.run_id',
+                [(collection, script, doc_id, name, digest, run_id) for doc_id, name, digest in rows],
+            )
+
+    def remove(self, collection: str, doc_ids: Iterable[str], script: str = ''):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM documents WHERE collection = ? AND script = ? AND doc_id = ?',
+                [(collection, script, doc_id) for doc_id in doc_ids],
+            )
+
+    def clear(self, collection: str) -> int:
+        """Forget every script's documents in a collection, e.g. once it has been purged"""
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM documents WHERE collection = ?', (collection,)).rowcount
+
+    def stale(self, collection: str, run_id: int, script: str = '') -> Iterator[Tuple[str, str]]:
+        """Yield (doc_id, normalized_name) of the script's documents not seen in the given run
+
+        Documents another script also wrote are left out: they are still that
+        script's companies (see release_shared()).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT doc_id, normalized_name FROM documents d '
+                'WHERE collection = ? AND script = ? AND run_id != ? AND NOT EXISTS ('
+                '    SELECT 1 FROM documents other '
+                '    WHERE other.collection = d.collection AND other.doc_id = d.doc_id AND other.script != d.script'
+                ')',
+                (collection, script, run_id),
+            ).fetchall()
+        yield from rows
+
+    def release_shared(self, collection: str, run_id: int, script: str = '') -> int:
+        """Forget the script's documents not seen in the given run that another script also wrote"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                'DELETE FROM documents '
+                'WHERE collection = ? AND script = ? AND run_id != ? AND EXISTS ('
+                '    SELECT 1 FROM documents other '
+                '    WHERE other.collection = documents.collection AND other.doc_id = documents.doc_id '
+                '    AND other.script != documents.script'
+                ')',
+                (collection, script, run_id),
+            ).rowcount
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+JSON Values of Dataset Columns
+
+Parses and writes the JSON values held in dataset columns:
+
+- loads_many() parses a column's JSON texts one text at a time, with
+  orjson when it is installed and the standard json module otherwise.
+  Texts orjson rejects (NaN, integers beyond 64 bits) are parsed again
+  with json
+- dumps() writes compact JSON text (no spaces, non-ASCII kept) with the
+  standard json module only: the text ends up in manifest content hashes,
+  so it must not depend on whether orjson is installed
+
+Usage:
+    values = loads_many(['{"city": "Austin"}', '[1, 2]'])
+"""
+
+import json
+from typing import Any, List, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _loads(text: str) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except ValueError:
+            pass
+    return json.loads(text)
+
+
+def loads_many(texts: Sequence[str]) -> List[Any]:
+    """Parse each JSON text; raises ValueError if one of them is invalid"""
+    return [_loads(text) for text in texts]
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON text of a value"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
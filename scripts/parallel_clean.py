@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Parallel Company Name Cleaning
+
+Runs the company name cleaning of clean_company_data (strip, drop empty
+and 'nan' names, drop duplicates, 2-100 characters, letters/digits/
+spaces/-/./& only) on a process pool:
+
+1. The names are split into contiguous slices. Each worker cleans its
+   slice, computes normalizedName and assigns every name to a partition
+   by a hash of its normalized name
+2. Each partition is deduplicated by a worker of its own, on 64-bit
+   hashes of the names as iter_clean_chunks does across chunks. Identical
+   names have identical normalized names, so every copy of a name lands in
+   the same partition and the local dedup is also the global one
+3. The merge only drops the duplicates: rows never leave input order, so
+   the result matches the single-process cleaning row for row, plus a
+   normalizedName column the document builder reuses
+
+With one worker everything runs in-process and no pool is started.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from company_names import normalize_company_names
+
+logger = logging.getLogger(__name__)
+
+MIN_NAME_LENGTH = 2
+MAX_NAME_LENGTH = 100
+NAME_PATTERN = r'^[a-zA-Z0-9\s\-\.&]+$'
+
+# Below this many names the pool's pickling overhead outweighs the work
+MIN_PARALLEL_ROWS = 50_000
+
+
+def clean_names(names: pd.Series) -> pd.Series:
+    """Single-process cleaning of a name Series, keeping the original index"""
+    names = names.astype(str).str.strip()
+    names = names[(names != '') & (names != 'nan')]
+    names = names.drop_duplicates()
+    lengths = names.str.len()
+    names = names[(lengths >= MIN_NAME_LENGTH) & (lengths <= MAX_NAME_LENGTH)]
+    return names[names.str.match(NAME_PATTERN)]
+
+
+def _clean_slice(names: pd.Series, offset: int, partitions: int) -> Dict[str, np.ndarray]:
+    """Worker: clean one contiguous slice and assign each name a partition"""
+    names = clean_names(names.reset_index(drop=True))
+    normalized = normalize_company_names(names)
+    partition = pd.util.hash_array(normalized.to_numpy(dtype=object), categorize=False) % np.uint64(partitions)
+    return {
+        'position': names.index.to_numpy() + offset,
+        'name': names.to_numpy(dtype=object),
+        'normalizedName': normalized.to_numpy(dtype=object),
+        'name_hash': pd.util.hash_array(names.to_numpy(dtype=object), categorize=False),
+        'partition': partition.astype(np.int64),
+    }
+
+
+def _dedupe_partition(name_hashes: np.ndarray) -> np.ndarray:
+    """Worker: mask keeping the first occurrence of every name in one partition"""
+    return ~pd.Series(name_hashes).duplicated().to_numpy()
+
+
+class ParallelNameCleaner:
+    def __init__(self, workers: Optional[int] = None, partitions: Optional[int] = None):
+        """Clean names on `workers` processes (default: one per CPU), split into `partitions` by hash"""
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.partitions = partitions or self.workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'ParallelNameCleaner':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def clean(self, names: pd.Series) -> pd.DataFrame:
+        """Clean a name Series into a frame with 'name' and 'normalizedName', in input order"""
+        if self.workers == 1 or len(names) < MIN_PARALLEL_ROWS:
+            cleaned = clean_names(names)
+            return pd.DataFrame({'name': cleaned, 'normalizedName': normalize_company_names(cleaned)})
+
+        if self._pool is None:
+            # Kept open across calls so streamed chunks don't pay the start-up again
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        # Stage 1: clean contiguous slices and hash-partition by normalized name
+        bounds = np.linspace(0, len(names), self.workers + 1, dtype=np.int64)
+        futures = [
+            self._pool.submit(_clean_slice, names.iloc[start:end], int(start), self.partitions)
+            for start, end in zip(bounds[:-1], bounds[1:]) if end > start
+        ]
+        parts = [future.result() for future in futures]
+        sliced = {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+
+        # Stage 2: dedup each partition locally. Slices were concatenated in
+        # input order, so each partition's rows are too and the first copy wins
+        order = np.argsort(sliced['partition'], kind='stable')
+        boundaries = np.searchsorted(sliced['partition'][order], np.arange(1, self.partitions))
+        rows_by_partition = [rows for rows in np.split(order, boundaries) if len(rows)]
+        keep = np.zeros(len(order), dtype=bool)
+        masks = self._pool.map(_dedupe_partition, [sliced['name_hash'][rows] for rows in rows_by_partition])
+        for rows, mask in zip(rows_by_partition, masks):
+            keep[rows[mask]] = True
+
+        # Merge: the kept rows are still in input order; dtypes match clean_names
+        index = names.index[sliced['position'][keep]]
+        return pd.DataFrame({
+            'name': pd.Series(sliced['name'][keep], index=index, dtype=object).astype(str),
+            'normalizedName': pd.Series(sliced['normalizedName'][keep], index=index, dtype=object),
+        })
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Resumable Population Checkpoints
+
+Lets a full population run that stopped part-way continue where it left
+off instead of starting over:
+
+- Companies get deterministic IDs derived from normalizedName, so the
+  batches that were in flight when the run stopped are overwritten on
+  resume, never duplicated. Names that normalize the same way share one
+  ID: the first one in input order is written, later ones are skipped
+  (including across a resume), and so are names without a normalized name
+- After every committed batch the checkpoint file records the input
+  offset below which every company has been written, together with a hash
+  of the dataset and the options that decide the order of the input
+- Batches commit out of order, so the offset only advances over the
+  contiguous prefix of committed batches, and stops at a failed one
+- The file is replaced atomically and fsynced, so a crash never leaves a
+  torn or lost checkpoint; it is removed once the run completes
+
+A resumed run reads and cleans the input again but skips the rows below
+the offset, so cleaning must produce the same order for the same input.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from autocomplete_prefixes import AutocompletePrefixes
+from batch_committer import WriteOp
+from company_documents import iter_document_batches
+from company_names import company_doc_id, normalize_company_names
+from seen_names import SeenNames
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = 'populate_checkpoint.json'
+CHECKPOINT_VERSION = 1
+
+_READ_BLOCK = 1024 * 1024
+
+
+class CheckpointMismatch(ValueError):
+    """The checkpoint was written for a different dataset or different options"""
+
+
+def file_hash(path: str) -> str:
+    """SHA-1 of a dataset file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def frame_hash(names: pd.Series) -> str:
+    """SHA-1 over the 64-bit hashes of a name column, for datasets already in memory"""
+    hashes = pd.util.hash_array(names.astype(str).to_numpy(dtype=object), categorize=False)
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def clear_checkpoint(path: str):
+    """Remove a checkpoint so the next run starts from the beginning"""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class PopulateCheckpoint:
+    def __init__(self, path: str, dataset_hash: str, params: Optional[Dict[str, Any]] = None,
+                 resume: bool = False):
+        """Track committed input rows; resume=True continues from the offset saved at `path`
+
+        Raises CheckpointMismatch if the saved checkpoint was written for a
+        different dataset or different params.
+        """
+        self.path = path
+        self.dataset_hash = dataset_hash
+        self.params = params or {}
+        self.offset = 0
+        self.failed = False
+        self._lock = threading.Lock()
+        self._autocomplete: Optional[AutocompletePrefixes] = None
+        self._position = 0
+        self._next = 1
+        self._ends: Dict[int, int] = {}
+        self._done: set = set()
+        # Normalized names already written or skipped by this run
+        self._seen = SeenNames()
+        self.duplicates = 0
+        self.unnamed = 0
+
+        saved = self._load() if resume else None
+        if saved is None:
+            if resume:
+                logger.warning(f"No population checkpoint at {path}, starting from the beginning")
+            # Replace any checkpoint left by an earlier run before anything is written
+            self._save()
+            return
+        if saved.get('dataset_hash') != dataset_hash:
+            raise CheckpointMismatch(f"The dataset changed since checkpoint {path} was written; "
+                                     f"run again without --resume to start over")
+        if saved.get('params') != self.params:
+            raise CheckpointMismatch(f"Checkpoint {path} was written with {saved.get('params')}, "
+                                     f"not {self.params}; use the same options or run without --resume")
+        self.offset = saved['offset']
+        logger.info(f"Resuming population after {self.offset} companies (checkpoint {path})")
+
+    def start(self, companies_df: pd.DataFrame, offset: int = 0,
+              autocomplete: Optional[AutocompletePrefixes] = None) -> pd.DataFrame:
+        """Begin a BatchCommitter over a frame whose first row is input row `offset`
+
+        Returns the rows not yet written. Companies written before the
+        checkpoint are passed to autocomplete so its prefixes still include
+        them.
+        """
+        skip = min(max(self.offset - offset, 0), len(companies_df))
+        if skip:
+            logger.info(f"Skipping {skip} companies written before the checkpoint")
+            written = companies_df.iloc[:skip]
+            if 'normalizedName' in written.columns:
+                normalized = written['normalizedName']
+            else:
+                normalized = normalize_company_names(written['name'])
+            # Later spellings of these companies must not overwrite them
+            written = written[self._seen.first_seen(normalized) & (normalized != '').to_numpy()]
+            if autocomplete is not None:
+                for documents in iter_document_batches(written):
+                    for document in documents:
+                        autocomplete.add(company_doc_id(document['normalizedName']), document)
+
+        # Batch numbers restart with every committer
+        with self._lock:
+            self._autocomplete = autocomplete
+            self._position = offset + skip
+            self._next = 1
+            self._ends = {}
+            self._done = set()
+        return companies_df.iloc[skip:]
+
+    def new_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The documents to write: the first per normalized name, none without one"""
+        named = [document for document in documents if document['normalizedName']]
+        first = self._seen.first_seen([document['normalizedName'] for document in named])
+        self.unnamed += len(documents) - len(named)
+        self.duplicates += len(named) - int(first.sum())
+        return [document for document, keep in zip(named, first) if keep]
+
+    def submitted(self, batch_number: int, rows: int):
+        """Record that the next `rows` input rows are written once batch `batch_number` commits
+
+        Call it after flushing, with the committer's last batch number.
+        """
+        with self._lock:
+            self._position += rows
+            if batch_number >= self._next:
+                # In flight, or committed while an earlier batch still is
+                self._ends[batch_number] = self._position
+            elif not self.failed:
+                # Every batch so far has committed; these rows queued no writes
+                self.offset = self._position
+                self._save()
+            self._advance()
+
+    def on_batch_done(self, batch_number: int, ops: List[WriteOp], succeeded: bool):
+        """BatchCommitter callback: advance the checkpoint over committed batches"""
+        if self._autocomplete is not None:
+            self._autocomplete.on_batch_done(batch_number, ops, succeeded)
+        with self._lock:
+            if not succeeded:
+                self.failed = True
+                return
+            self._done.add(batch_number)
+            self._advance()
+
+    def complete(self) -> bool:
+        """Remove the checkpoint after a run where every batch committed"""
+        if self.failed:
+            logger.error(f"Some batches failed; run again with --resume to continue from "
+                         f"{self.offset} companies (checkpoint {self.path})")
+            return False
+        clear_checkpoint(self.path)
+        return True
+
+    def _advance(self):
+        advanced = False
+        while not self.failed and self._next in self._done and self._next in self._ends:
+            self.offset = self._ends.pop(self._next)
+            self._done.remove(self._next)
+            self._next += 1
+            advanced = True
+        if advanced:
+            self._save()
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save(self):
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'dataset_hash': self.dataset_hash,
+            'params': self.params,
+            'offset': self.offset,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        # Write to a temporary file first so a crash never leaves a torn checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
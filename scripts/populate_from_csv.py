@@ -15,11 +15,23 @@ import json
 import logging
 import pandas as pd
 import argparse
-from datetime import datetime, timezone
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from autocomplete_prefixes import DEFAULT_TOP_K, AutocompletePrefixes
+from batch_committer import BatchCommitter
+from company_csv import find_name_column, read_csv_column, sniff_csv
+from company_dedup import DEFAULT_THRESHOLD, dedupe_company_names
+from company_documents import build_company_documents, iter_document_batches
+from company_names import company_doc_id
+from company_shards import parse_shard, select_shard, shard_path
+from company_upsert import CompanyUpserter
+from ingest_manifest import DEFAULT_MANIFEST_PATH, IngestManifest
+from populate_checkpoint import DEFAULT_CHECKPOINT_PATH, PopulateCheckpoint, file_hash
+from run_metrics import add_metrics_arguments, run_metrics_from_args, stage
+from write_rate import AdaptiveWriteRate, add_write_rate_arguments, write_rate_from_args
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,8 +44,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class CSVFirebasePopulator:
-    def __init__(self, service_account_path: str = None):
-        """Initialize Firebase connection"""
+    def __init__(self, service_account_path: str = None, write_rate: Optional[AdaptiveWriteRate] = None):
+        """Initialize Firebase connection; write_rate paces every company write of the run"""
         try:
             # Try to use environment variables first
             if os.getenv('FIREBASE_SERVICE_ACCOUNT'):
@@ -53,6 +65,7 @@ class CSVFirebasePopulator:
                     firebase_admin.initialize_app()
             
             self.db = firestore.client()
+            self.write_rate = write_rate
             logger.info("Firebase initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Firebase: {e}")
@@ -64,32 +77,17 @@ class CSVFirebasePopulator:
         logger.info(f"Loading CSV from: {csv_path}")
         
         try:
-            # Try different CSV reading approaches
-            try:
-                df = pd.read_csv(csv_path)
-            except:
-                df = pd.read_csv(csv_path, encoding='latin-1')
-            
-            logger.info(f"Loaded CSV with {len(df)} records")
-            logger.info(f"Columns: {list(df.columns)}")
-            
-            # Find the company name column
-            name_columns = ['name', 'company', 'company_name', 'organization', 'org']
-            company_col = None
+            # Sniff encoding, delimiter and header from a sample, then read only the name column
+            csv_format = sniff_csv(csv_path)
+            logger.info(f"Columns: {csv_format.columns} (encoding {csv_format.encoding}, "
+                        f"delimiter {csv_format.delimiter!r})")
             
-            for col in name_columns:
-                if col in df.columns:
-                    company_col = col
-                    break
-            
-            if company_col is None:
-                # Use first column as company name
-                company_col = df.columns[0]
-                logger.warning(f"No standard company name column found, using: {company_col}")
+            company_col = find_name_column(csv_format.columns)
+            names = read_csv_column(csv_path, company_col, csv_format)
+            logger.info(f"Loaded CSV with {len(names)} records")
             
             # Clean the data
-            df_clean = df[[company_col]].copy()
-            df_clean.columns = ['name']
+            df_clean = names.rename('name').to_frame()
             df_clean['name'] = df_clean['name'].astype(str).str.strip()
             
             # Remove duplicates and null values
@@ -111,109 +109,75 @@ class CSVFirebasePopulator:
             logger.error(f"Error loading CSV: {e}")
             raise
 
-    def normalize_company_name(self, name: str) -> str:
-        """Normalize company name for consistent matching"""
-        return (
-            name.lower()
-            .strip()
-            .replace('  ', ' ')
-            .replace('&', 'and')
-            .replace('.', '')
-            .replace(',', '')
-            .replace('(', '')
-            .replace(')', '')
-            .replace('-', ' ')
-            .replace('_', ' ')
-        )
-
-    def generate_aliases(self, name: str) -> List[str]:
-        """Generate common aliases for a company name"""
-        aliases = [name]
-        
-        # Common variations
-        variations = [
-            name.replace(' and ', ' & '),
-            name.replace(' & ', ' and '),
-            name.replace(' Inc', ''),
-            name.replace(' Corp', ''),
-            name.replace(' LLC', ''),
-            name.replace(' Ltd', ''),
-            name.replace(' Company', ''),
-            name.replace(' Co', ''),
-        ]
-        
-        # Add variations that are different from original
-        for variation in variations:
-            if variation.strip() != name and variation.strip():
-                aliases.append(variation.strip())
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_aliases = []
-        for alias in aliases:
-            if alias not in seen:
-                seen.add(alias)
-                unique_aliases.append(alias)
-        
-        return unique_aliases[:10]  # Limit to 10 aliases
-
     def create_company_document(self, name: str) -> Dict[str, Any]:
         """Create a company document with the required schema"""
-        normalized_name = self.normalize_company_name(name)
-        aliases = self.generate_aliases(name)
-        
-        # Initialize with default values
-        now = datetime.now(timezone.utc)
-        
-        return {
-            'aliases': aliases,
-            'averageFlagCount': 0.0,
-            'commonFlags': [],
-            'createdAt': now,
-            'lastSubmission': now,
-            'name': name,
-            'normalizedName': normalized_name,
-            'severityTrends': {
-                'light': 0,
-                'medium': 0
-            },
-            'submissionCount': 0,
-            'updatedAt': now
-        }
+        return build_company_documents([name])[0]
 
-    def populate_companies(self, companies_df: pd.DataFrame, limit: int = 1000):
-        """Populate Firebase with company documents"""
-        logger.info(f"Populating Firebase with {min(limit, len(companies_df))} companies...")
+    def populate_companies(self, companies_df: pd.DataFrame, limit: Optional[int] = None, max_in_flight: int = 8,
+                           autocomplete: Optional[AutocompletePrefixes] = None,
+                           checkpoint: Optional[PopulateCheckpoint] = None, offset: int = 0):
+        """Populate Firebase with company documents
         
+        With a checkpoint, documents get deterministic IDs and rows written
+        before it are skipped; offset is the input position of the first row.
+        """
         # Limit the number of companies to process
-        companies_to_process = companies_df.head(limit)
+        companies_to_process = companies_df if limit is None else companies_df.head(limit)
+        logger.info(f"Populating Firebase with {len(companies_to_process)} companies...")
         
-        batch_size = 500
-        total_added = 0
+        companies_ref = self.db.collection('companies')
         
-        for i in range(0, len(companies_to_process), batch_size):
-            batch = companies_to_process.iloc[i:i + batch_size]
-            
-            # Create batch write
-            batch_write = self.db.batch()
-            
-            for _, row in batch.iterrows():
-                company_name = row['name']
-                company_doc = self.create_company_document(company_name)
-                
-                # Create document reference
-                doc_ref = self.db.collection('companies').document()
-                batch_write.set(doc_ref, company_doc)
-            
-            # Commit batch
-            try:
-                batch_write.commit()
-                total_added += len(batch)
-                logger.info(f"Added batch {i//batch_size + 1}: {len(batch)} companies")
-            except Exception as e:
-                logger.error(f"Error committing batch {i//batch_size + 1}: {e}")
+        # Batches of 500 are committed in parallel, retrying transient failures
+        on_batch_done = autocomplete.on_batch_done if autocomplete is not None else None
+        if checkpoint is not None:
+            companies_to_process = checkpoint.start(companies_to_process, offset, autocomplete)
+            on_batch_done = checkpoint.on_batch_done
+            skipped_before = (checkpoint.duplicates, checkpoint.unnamed)
+        with stage('populate', rows=len(companies_to_process)), \
+                BatchCommitter(self.db, max_in_flight=max_in_flight, on_batch_done=on_batch_done,
+                               write_rate=self.write_rate) as committer:
+            # Documents are built a batch at a time, sharing one timestamp
+            for documents in iter_document_batches(companies_to_process):
+                if checkpoint is None:
+                    for company_doc in documents:
+                        committer.set(companies_ref.document(), company_doc)
+                else:
+                    # Deterministic IDs, so a resumed run overwrites instead of duplicating
+                    for company_doc in checkpoint.new_documents(documents):
+                        committer.set(companies_ref.document(company_doc_id(company_doc['normalizedName'])),
+                                      company_doc)
+                if checkpoint is not None:
+                    # Flushed per document batch, so each batch covers a known range of rows
+                    committer.flush()
+                    checkpoint.submitted(committer.batch_number, len(documents))
         
+        total_added = committer.stats.documents_written
+        if committer.stats.documents_failed:
+            logger.error(f"Failed to add {committer.stats.documents_failed} companies after retries")
+        if checkpoint is not None and (checkpoint.duplicates, checkpoint.unnamed) != skipped_before:
+            logger.info(f"Skipped {checkpoint.duplicates - skipped_before[0]} companies whose normalized name "
+                        f"matches an earlier company and {checkpoint.unnamed - skipped_before[1]} "
+                        f"without a normalized name")
         logger.info(f"Successfully added {total_added} companies to Firebase")
+        return total_added
+
+    def sync_companies(self, companies_df: pd.DataFrame, limit: Optional[int] = None,
+                       manifest_path: str = DEFAULT_MANIFEST_PATH, max_in_flight: int = 8,
+                       autocomplete: Optional[AutocompletePrefixes] = None) -> Dict[str, int]:
+        """Write only companies that are new or changed since the last run"""
+        companies_to_process = companies_df if limit is None else companies_df.head(limit)
+        logger.info(f"Syncing {len(companies_to_process)} companies against manifest {manifest_path}...")
+        
+        manifest = IngestManifest(manifest_path)
+        try:
+            upserter = CompanyUpserter(self.db, manifest, max_in_flight=max_in_flight,
+                                       script='populate_from_csv', autocomplete=autocomplete,
+                                       write_rate=self.write_rate)
+            upserter.upsert(companies_to_process)
+            # A CSV is an additional source, so companies missing from it are kept
+            return upserter.finish(delete_missing=False)
+        finally:
+            manifest.close()
 
     def verify_population(self):
         """Verify that companies were properly added"""
@@ -250,40 +214,102 @@ def main():
     """Main execution function"""
     parser = argparse.ArgumentParser(description='Populate Firebase with companies from CSV')
     parser.add_argument('--csv', required=True, help='Path to CSV file with company names')
-    parser.add_argument('--limit', type=int, default=1000, help='Maximum number of companies to add')
+    parser.add_argument('--limit', type=int, default=None,
+                       help='Maximum number of companies to add (default: the whole CSV)')
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                       help='Add only shard i/N (0 <= i < N) of the companies, partitioned by normalized name')
+    parser.add_argument('--max-in-flight', type=int, default=8,
+                       help='Maximum number of batches committing at the same time')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Skip companies unchanged since the last run (deterministic IDs + local manifest)')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST_PATH,
+                       help='Local manifest of written companies used by --incremental')
+    parser.add_argument('--fuzzy-dedup', action='store_true',
+                       help='Merge near-duplicate company names into one company with merged aliases')
+    parser.add_argument('--similarity', type=float, default=DEFAULT_THRESHOLD,
+                       help='Minimum name similarity (0-1) for --fuzzy-dedup to merge two names')
+    parser.add_argument('--no-autocomplete', action='store_true',
+                       help='Skip updating the autocomplete_prefixes collection')
+    parser.add_argument('--autocomplete-top-k', type=int, default=DEFAULT_TOP_K,
+                       help='Companies kept per autocomplete prefix document')
     parser.add_argument('--service-account', default=None, 
                        help='Path to Firebase service account JSON file (optional, uses environment variable by default)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue an interrupted population of the same CSV from its checkpoint')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                       help='Checkpoint written after every committed batch (not used with --incremental)')
+    add_write_rate_arguments(parser)
+    add_metrics_arguments(parser)
     
     args = parser.parse_args()
     
-    logger.info("Starting Firebase population from CSV")
-    
-    try:
-        # Check if CSV file exists
-        if not os.path.exists(args.csv):
-            logger.error(f"CSV file not found: {args.csv}")
-            sys.exit(1)
-        
-        # Initialize populator
-        populator = CSVFirebasePopulator(args.service_account)
-        
-        # Load and clean CSV data
-        logger.info("Step 1: Loading and cleaning CSV data")
-        df = populator.load_csv(args.csv)
+    with run_metrics_from_args('populate_from_csv', args):
+        logger.info("Starting Firebase population from CSV")
         
-        # Populate Firebase
-        logger.info("Step 2: Populating Firebase")
-        populator.populate_companies(df, limit=args.limit)
-        
-        # Verify population
-        logger.info("Step 3: Verifying population")
-        populator.verify_population()
-        
-        logger.info("Firebase population from CSV completed successfully!")
-        
-    except Exception as e:
-        logger.error(f"Process failed: {e}")
-        sys.exit(1)
+        try:
+            # Check if CSV file exists
+            if not os.path.exists(args.csv):
+                logger.error(f"CSV file not found: {args.csv}")
+                sys.exit(1)
+            
+            # Initialize populator
+            write_rate = write_rate_from_args(args)
+            populator = CSVFirebasePopulator(args.service_account, write_rate=write_rate)
+            autocomplete = None
+            if args.shard and not args.no_autocomplete:
+                # Shards would overwrite each other's prefix documents
+                logger.warning("Shards don't update autocomplete prefixes; run clean_and_populate_firebase.py "
+                               "--rebuild-autocomplete once every shard has finished")
+            elif not args.no_autocomplete:
+                autocomplete = AutocompletePrefixes(populator.db, top_k=args.autocomplete_top_k,
+                                                    max_in_flight=args.max_in_flight, write_rate=write_rate)
+            checkpoint = None
+            if not args.incremental:
+                # Checked before loading, so a mismatch fails fast; offsets count
+                # cleaned companies, whose order depends on the file, dedup and shard
+                checkpoint = PopulateCheckpoint(shard_path(args.checkpoint, args.shard), file_hash(args.csv),
+                                                {'fuzzy_dedup': args.similarity if args.fuzzy_dedup else None,
+                                                 'shard': str(args.shard) if args.shard else None},
+                                                resume=args.resume)
+            
+            # Load and clean CSV data
+            logger.info("Step 1: Loading and cleaning CSV data")
+            with stage('load') as span:
+                df = populator.load_csv(args.csv)
+                span['rows'] = len(df)
+            if args.fuzzy_dedup:
+                with stage('dedup', rows=len(df)):
+                    df = dedupe_company_names(df['name'], threshold=args.similarity)
+            df = select_shard(df, args.shard)
+            
+            # Populate Firebase
+            logger.info("Step 2: Populating Firebase")
+            if args.incremental:
+                with stage('sync', rows=len(df) if args.limit is None else min(args.limit, len(df))):
+                    populator.sync_companies(df, limit=args.limit,
+                                             manifest_path=shard_path(args.manifest, args.shard),
+                                             max_in_flight=args.max_in_flight, autocomplete=autocomplete)
+            else:
+                populator.populate_companies(df, limit=args.limit, max_in_flight=args.max_in_flight,
+                                             autocomplete=autocomplete, checkpoint=checkpoint)
+                checkpoint.complete()
+            
+            if autocomplete is not None:
+                # Companies already in the collection stay, so merge into the stored prefixes
+                logger.info("Updating autocomplete prefix documents")
+                with stage('autocomplete') as span:
+                    span['rows'] = autocomplete.write()['prefixes']
+            
+            # Verify population
+            logger.info("Step 3: Verifying population")
+            with stage('verify'):
+                populator.verify_population()
+            
+            logger.info("Firebase population from CSV completed successfully!")
+            
+        except Exception as e:
+            logger.error(f"Process failed: {e}")
+            sys.exit(1)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
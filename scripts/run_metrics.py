@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Ingest Run Metrics
+
+Lightweight instrumentation for the population, import and export scripts:
+
+- Stage spans: wall time, rows, rows/sec and peak RSS for every stage.
+  Scripts and shared methods call the module-level stage(), which is a
+  no-op unless a RunMetrics is active, so library callers pay nothing
+- Commit metrics: every BatchCommitter that closes while a run is active
+  adds its commit latency histogram, batch counts, documents and retries
+  to the run and to the stages open at the time
+- Optional per-stage profiling with cProfile, or pyinstrument if it is
+  installed; one profile file per top-level stage
+- A report written when the run ends, successful or not: JSON, or a
+  Prometheus textfile (.prom) for node_exporter's textfile collector
+
+On Linux the peak RSS is reset at the start of every top-level stage, so
+it is that stage's own peak; nested stages and other platforms report
+the peak since the enclosing reset.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+
+# Upper bounds in seconds, as Prometheus histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+# Called with each finished stage span
+StageCallback = Callable[[Dict[str, Any]], None]
+
+
+def status_mb(field: str) -> Optional[float]:
+    """A memory field (VmRSS, VmHWM) of /proc/self/status in MB, if available"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def maxrss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    maxrss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the process peak RSS (Linux only); returns whether it worked"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS since the last reset, or of the whole process"""
+    peak = status_mb('VmHWM')
+    return peak if peak is not None else maxrss_mb()
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """Fixed-bucket histogram of durations in seconds"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+
+    def merge(self, other: 'LatencyHistogram'):
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+            self.count += other.count
+            self.sum += other.sum
+            self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, capped at the largest observation"""
+        if not self.count:
+            return None
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return _round(min(bound, self.max), 4)
+        return _round(self.max, 4)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        """Rebuild a histogram from its to_dict() form, e.g. from a saved report"""
+        labels = list(data['buckets'])
+        histogram = cls([float(label) for label in labels[:-1]])
+        cumulative = list(data['buckets'].values())
+        histogram.counts = [count - previous for count, previous in zip(cumulative, [0] + cumulative[:-1])]
+        histogram.count = data['count']
+        histogram.sum = data['sum_seconds']
+        histogram.max = data['max_seconds']
+        return histogram
+
+    def cumulative(self) -> List[int]:
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'sum_seconds': _round(self.sum, 6),
+            'mean_seconds': _round(self.sum / self.count, 4) if self.count else None,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'max_seconds': _round(self.max, 4),
+            'buckets': dict(zip(labels, self.cumulative())),
+        }
+
+
+class CommitTotals:
+    def __init__(self):
+        """Commit counters summed over the committers that closed during a span or run"""
+        self.batches_committed = 0
+        self.batches_failed = 0
+        self.documents_written = 0
+        self.documents_failed = 0
+        self.retries = 0
+        self.throttled = 0
+        self.latency = LatencyHistogram()
+
+    def add(self, stats):
+        """Add a BatchCommitter's CommitStats"""
+        self.batches_committed += stats.batches_committed
+        self.batches_failed += stats.batches_failed
+        self.documents_written += stats.documents_written
+        self.documents_failed += stats.documents_failed
+        self.retries += stats.retries
+        self.throttled += stats.throttled
+        self.latency.merge(stats.commit_latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'batches_committed': self.batches_committed,
+            'batches_failed': self.batches_failed,
+            'documents_written': self.documents_written,
+            'documents_failed': self.documents_failed,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'commit_latency': self.latency.to_dict(),
+        }
+
+
+class _StageProfiler:
+    def __init__(self, kind: str):
+        self.kind = kind
+        if kind == 'pyinstrument':
+            from pyinstrument import Profiler
+            self._profiler = Profiler()
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.kind == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self, path_prefix: str) -> str:
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+            path = f"{path_prefix}.html"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = f"{path_prefix}.prof"
+            self._profiler.dump_stats(path)
+        return path
+
+
+_active: Optional['RunMetrics'] = None
+_active_lock = threading.Lock()
+
+
+class RunMetrics:
+    def __init__(self, script: str, report_path: Optional[str] = None, profiler: Optional[str] = None,
+                 profile_dir: str = 'profiles', on_stage_done: Optional[StageCallback] = None,
+                 labels: Optional[Dict[str, str]] = None):
+        """Collect metrics for one script run; entering it makes it the active run
+
+        report_path ending in .prom writes a Prometheus textfile, anything
+        else JSON. profiler is 'cprofile' or 'pyinstrument'. labels (e.g.
+        the shard) are stored in the report and added to every metric.
+        """
+        self.script = script
+        self.labels = labels or {}
+        self.report_path = report_path
+        self.profile_dir = profile_dir
+        self.on_stage_done = on_stage_done
+        self.spans: List[Dict[str, Any]] = []
+        self.commits = CommitTotals()
+        self.status = 'running'
+
+        self.profiler = profiler
+        if profiler == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                logger.warning("pyinstrument is not installed, profiling with cProfile instead")
+                self.profiler = 'cprofile'
+
+        self._open: List[tuple] = []
+        self._lock = threading.Lock()
+        self._started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+
+    def __enter__(self) -> 'RunMetrics':
+        global _active
+        with _active_lock:
+            if _active is not None:
+                raise RuntimeError(f"A metrics run for {_active.script} is already active")
+            _active = self
+        reset_peak_rss()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        with _active_lock:
+            _active = None
+        if exc_type is None or (exc_type is SystemExit and not exc.code):
+            self.status = 'succeeded'
+        else:
+            self.status = 'failed'
+        if self.report_path:
+            self.write(self.report_path)
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Record a span; set span['rows'] inside the block if the count isn't known up front"""
+        top_level = not self._open
+        span: Dict[str, Any] = {
+            'name': name,
+            'parent': self._open[-1][0]['name'] if self._open else None,
+            'rows': rows,
+            'start_offset_seconds': _round(time.perf_counter() - self._start, 4),
+        }
+        per_stage_peak = reset_peak_rss() if top_level else False
+        profiler = _StageProfiler(self.profiler) if self.profiler and top_level else None
+        commits = CommitTotals()
+        rss_before = status_mb('VmRSS')
+        with self._lock:
+            self._open.append((span, commits))
+
+        start = time.perf_counter()
+        if profiler:
+            profiler.start()
+        try:
+            yield span
+            span['status'] = 'succeeded'
+        except BaseException:
+            span['status'] = 'failed'
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                span['profile'] = profiler.stop(os.path.join(self.profile_dir, f"{self.script}-{name}"))
+            with self._lock:
+                self._open.pop()
+
+            rss_after = status_mb('VmRSS')
+            span.update({
+                'seconds': _round(seconds, 4),
+                'rows_per_second': _round(span['rows'] / seconds, 1) if span['rows'] and seconds else None,
+                'peak_rss_mb': _round(peak_rss_mb(), 1),
+                'peak_rss_scope': 'stage' if per_stage_peak else 'enclosing',
+                'rss_delta_mb': _round(rss_after - rss_before, 1) if rss_before and rss_after else None,
+                'peak_child_rss_mb': _round(maxrss_mb(resource.RUSAGE_CHILDREN), 1),
+            })
+            if commits.batches_committed or commits.batches_failed:
+                span['commits'] = commits.to_dict()
+            self.spans.append(span)
+            logger.info(
+                f"Stage {name}: {span['rows'] if span['rows'] is not None else '-'} rows in {seconds:.2f}s"
+                + (f" ({span['rows_per_second']:.0f} rows/s)" if span['rows_per_second'] else '')
+                + f", peak RSS {span['peak_rss_mb']:.0f} MB"
+            )
+            if self.on_stage_done is not None:
+                self.on_stage_done(span)
+
+    def record_commits(self, stats):
+        """Add a closed BatchCommitter's stats to the run and to every open stage"""
+        with self._lock:
+            self.commits.add(stats)
+            for _, commits in self._open:
+                commits.add(stats)
+
+    def stage_totals(self) -> Dict[str, Dict[str, Any]]:
+        """Spans summed by stage name, for stages that run once per chunk"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            total = totals.setdefault(span['name'], {'spans': 0, 'rows': 0, 'seconds': 0.0, 'peak_rss_mb': 0.0})
+            total['spans'] += 1
+            total['rows'] += span['rows'] or 0
+            total['seconds'] += span['seconds']
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], span['peak_rss_mb'])
+        for total in totals.values():
+            total['seconds'] = _round(total['seconds'], 4)
+            total['rows_per_second'] = _round(total['rows'] / total['seconds'], 1) \
+                if total['rows'] and total['seconds'] else None
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'script': self.script,
+            'version': REPORT_VERSION,
+            'labels': self.labels,
+            'status': self.status,
+            'started_at': self._started_at.isoformat(),
+            'seconds': _round(time.perf_counter() - self._start, 4),
+            'peak_rss_mb': _round(max([maxrss_mb()] + [span['peak_rss_mb'] for span in self.spans]), 1),
+            'peak_child_rss_mb': _round(maxrss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': self.spans,
+            'stage_totals': self.stage_totals(),
+            'commits': self.commits.to_dict(),
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format, for node_exporter's textfile collector"""
+        return prometheus_text(self.to_dict())
+
+    def write(self, path: str):
+        """Write the report as JSON, or as a Prometheus textfile if path ends in .prom"""
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2) + '\n'
+        # Collectors may read the file at any time, so replace it atomically
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        logger.info(f"Run metrics written to {path}")
+
+
+def prometheus_text(report: Dict[str, Any]) -> str:
+    """Render a run report (or a merged shard report) in Prometheus text exposition format"""
+    labels = dict({'script': report['script']}, **report.get('labels', {}))
+    base = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_labels, value in samples:
+            label_text = ','.join([base] + [f'{key}="{val}"' for key, val in sample_labels])
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    totals = report['stage_totals']
+    started_at = datetime.fromisoformat(report['started_at'])
+    metric('ingest_run_success', 'gauge', 'Whether the last run succeeded',
+           [((), int(report['status'] == 'succeeded'))])
+    metric('ingest_run_timestamp_seconds', 'gauge', 'Start time of the last run',
+           [((), int(started_at.timestamp()))])
+    metric('ingest_run_seconds', 'gauge', 'Wall time of the last run', [((), report['seconds'])])
+    metric('ingest_run_peak_rss_bytes', 'gauge', 'Peak resident memory of the last run',
+           [((), int(report['peak_rss_mb'] * 1024 * 1024))])
+    metric('ingest_stage_seconds', 'gauge', 'Wall time per stage, summed over repeats',
+           [((('stage', name),), total['seconds']) for name, total in totals.items()])
+    metric('ingest_stage_rows', 'gauge', 'Rows processed per stage',
+           [((('stage', name),), total['rows']) for name, total in totals.items()])
+    metric('ingest_stage_rows_per_second', 'gauge', 'Stage throughput',
+           [((('stage', name),), total['rows_per_second'] or 0) for name, total in totals.items()])
+    metric('ingest_stage_peak_rss_bytes', 'gauge', 'Peak resident memory per stage',
+           [((('stage', name),), int(total['peak_rss_mb'] * 1024 * 1024)) for name, total in totals.items()])
+
+    commits = report['commits']
+    metric('ingest_commit_batches', 'gauge', 'Write batches by outcome',
+           [((('result', 'committed'),), commits['batches_committed']),
+            ((('result', 'failed'),), commits['batches_failed'])])
+    metric('ingest_commit_documents', 'gauge', 'Documents written by outcome',
+           [((('result', 'written'),), commits['documents_written']),
+            ((('result', 'failed'),), commits['documents_failed'])])
+    metric('ingest_commit_retries', 'gauge', 'Retried batch commits', [((), commits['retries'])])
+    metric('ingest_commit_throttled', 'gauge', 'Commit attempts throttled by Firestore',
+           [((), commits.get('throttled', 0))])
+
+    histogram = commits['commit_latency']
+    name = 'ingest_commit_latency_seconds'
+    lines.append(f"# HELP {name} Batch commit round trip, per attempt")
+    lines.append(f"# TYPE {name} histogram")
+    for bound, count in histogram['buckets'].items():
+        lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+    lines.append(f"{name}_sum{{{base}}} {histogram['sum_seconds']}")
+    lines.append(f"{name}_count{{{base}}} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Record a stage span on the active run, or just run the block if there is none"""
+    run = _active
+    if run is None:
+        yield {'name': name, 'rows': rows}
+        return
+    with run.stage(name, rows) as span:
+        yield span
+
+
+def record_commit_stats(stats):
+    """Called by BatchCommitter.close(); adds its stats to the active run, if any"""
+    run = _active
+    if run is not None:
+        run.record_commits(stats)
+
+
+def add_metrics_arguments(parser):
+    """Add the --metrics / --profile options shared by the ingest scripts"""
+    parser.add_argument('--metrics', default=None,
+                       help='Write run metrics here at the end of the run: JSON, or a Prometheus '
+                            'textfile if the path ends in .prom')
+    parser.add_argument('--profile', choices=PROFILERS, default=None,
+                       help='Profile each top-level stage (pyinstrument must be installed separately)')
+    parser.add_argument('--profile-dir', default='profiles',
+                       help='Directory for per-stage profiles')
+
+
+def run_metrics_from_args(script: str, args) -> RunMetrics:
+    shard = getattr(args, 'shard', None)
+    return RunMetrics(script, report_path=args.metrics, profiler=args.profile, profile_dir=args.profile_dir,
+                      labels={'shard': str(shard)} if shard else None)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Prebuilt Company Search Index
+
+A compact, versioned search index for the company dropdown, written as
+gzip-compressed JSON so search can load one static file instead of reading
+every Firestore company document:
+
+- companies: [doc_id, name, normalizedName] rows, sorted by document ID;
+  postings refer to companies by their position in this list
+- terms: the sorted, distinct normalized names and aliases. Prefix search
+  is a binary search for the first term >= the prefix followed by a scan
+  while terms still start with it
+- trigrams: sorted character trigrams of every term, for fuzzy and
+  substring matching
+- Postings are sorted company positions, delta-encoded
+
+Document IDs are derived from normalizedName the same way the importer
+derives them, so a search hit can be fetched directly.
+
+The index is rebuilt incrementally: each company keeps a hash of what the
+index stores for it (name, normalized name and sorted search terms), and
+only companies where that changed have their postings replaced. Alias
+order never counts as a change, and an unchanged index is not rewritten.
+Imports never delete companies, so a company only leaves the index when
+the export rebuilds it from scratch.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Set
+
+from company_names import company_doc_id, normalize_search_name
+from ingest_manifest import content_hash
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'company-search-index'
+FORMAT_VERSION = 1
+DEFAULT_INDEX_PATH = 'company_search_index.json.gz'
+
+
+def company_terms(company: Dict[str, Any]) -> Set[str]:
+    """Normalized terms a company is found by: its normalized name and aliases"""
+    terms = {company['normalizedName']}
+    terms.update(normalize_search_name(alias) for alias in company.get('aliases') or [])
+    terms.discard('')
+    return terms
+
+
+def trigrams(term: str) -> Set[str]:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _delta_encode(positions: List[int]) -> List[int]:
+    return [position - previous for previous, position in zip([0] + positions, positions)]
+
+
+def _delta_decode(deltas: List[int]) -> List[int]:
+    positions, total = [], 0
+    for delta in deltas:
+        total += delta
+        positions.append(total)
+    return positions
+
+
+class SearchIndex:
+    def __init__(self):
+        """Create an empty index"""
+        # doc_id -> (name, normalizedName, content hash)
+        self.companies: Dict[str, tuple] = {}
+        self.term_postings: Dict[str, Set[str]] = {}
+        self._terms_of: Dict[str, Set[str]] = {}
+        self._seen: Set[str] = set()
+        self.counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH) -> 'SearchIndex':
+        """Load an index file, or start empty if it is missing or an older version"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Rebuilding unreadable search index {path}: {e}")
+            return index
+        if data.get('format') != FORMAT_NAME or data.get('version') != FORMAT_VERSION:
+            logger.warning(f"Rebuilding search index {path}: format version {data.get('version')} "
+                           f"is not {FORMAT_VERSION}")
+            return index
+
+        doc_ids = [row[0] for row in data['companies']]
+        for (doc_id, name, normalized_name), digest in zip(data['companies'], data['hashes']):
+            index.companies[doc_id] = (name, normalized_name, digest)
+            index._terms_of[doc_id] = set()
+        for term, deltas in zip(data['terms'], data['term_postings']):
+            members = {doc_ids[position] for position in _delta_decode(deltas)}
+            index.term_postings[term] = members
+            for doc_id in members:
+                index._terms_of[doc_id].add(term)
+        return index
+
+    def upsert(self, company: Dict[str, Any]) -> bool:
+        """Add or replace one company; returns False if it was unchanged"""
+        if not company['normalizedName']:
+            return False
+        doc_id = company_doc_id(company['normalizedName'])
+        # Names that normalize the same way share one document; first one wins, as on import
+        if doc_id in self._seen:
+            return False
+        self._seen.add(doc_id)
+        # Hash what the index stores, so alias order and spellings with the same terms change nothing
+        terms = company_terms(company)
+        digest = content_hash({'name': company['name'], 'normalizedName': company['normalizedName'],
+                               'terms': sorted(terms)})
+
+        previous = self.companies.get(doc_id)
+        if previous is not None and previous[2] == digest:
+            self.counts['unchanged'] += 1
+            return False
+
+        self._unlink(doc_id)
+        self.companies[doc_id] = (company['name'], company['normalizedName'], digest)
+        self._terms_of[doc_id] = terms
+        for term in terms:
+            self.term_postings.setdefault(term, set()).add(doc_id)
+        self.counts['updated' if previous is not None else 'added'] += 1
+        return True
+
+    def update(self, companies: Iterable[Dict[str, Any]]):
+        for company in companies:
+            self.upsert(company)
+
+    def _unlink(self, doc_id: str):
+        for term in self._terms_of.pop(doc_id, ()):
+            members = self.term_postings[term]
+            members.discard(doc_id)
+            if not members:
+                del self.term_postings[term]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable form with positional, delta-encoded postings"""
+        doc_ids = sorted(self.companies)
+        position_of = {doc_id: position for position, doc_id in enumerate(doc_ids)}
+
+        terms = sorted(self.term_postings)
+        trigram_postings: Dict[str, Set[int]] = {}
+        term_postings = []
+        for term in terms:
+            positions = sorted(position_of[doc_id] for doc_id in self.term_postings[term])
+            term_postings.append(_delta_encode(positions))
+            for trigram in trigrams(term):
+                trigram_postings.setdefault(trigram, set()).update(positions)
+
+        trigram_keys = sorted(trigram_postings)
+        return {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'built_at': datetime.now(timezone.utc).isoformat(),
+            'companies': [[doc_id, *self.companies[doc_id][:2]] for doc_id in doc_ids],
+            'hashes': [self.companies[doc_id][2] for doc_id in doc_ids],
+            'terms': terms,
+            'term_postings': term_postings,
+            'trigrams': trigram_keys,
+            'trigram_postings': [_delta_encode(sorted(trigram_postings[key])) for key in trigram_keys],
+        }
+
+    @property
+    def changed(self) -> bool:
+        """Whether any company was added or updated since loading"""
+        return bool(self.counts['added'] or self.counts['updated'])
+
+    def save(self, path: str = DEFAULT_INDEX_PATH):
+        if not self.changed and os.path.exists(path):
+            logger.info(f"Search index {path} is unchanged ({self.counts['unchanged']} companies), not rewriting it")
+            return
+        # Write to a temporary file first so readers never see a torn index
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        logger.info(
+            f"Search index {path}: {len(self.companies)} companies, {len(self.term_postings)} terms "
+            f"({self.counts['added']} added, {self.counts['updated']} updated, "
+            f"{self.counts['unchanged']} unchanged)"
+        )
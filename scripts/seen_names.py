@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Seen Name Hashes
+
+Remembers which names a streamed run has already handled, so each chunk
+can drop the names an earlier chunk had:
+
+- Names are kept as pandas' fixed-key 64-bit hashes in one sorted array,
+  8 bytes per unique name; memory grows with the number of unique names,
+  not with the chunk size
+- A chunk is looked up with a binary search per name, and its new hashes
+  are inserted in one pass over the array, instead of re-sorting the
+  whole array per chunk as np.union1d does
+
+Usage:
+    seen = SeenNames()
+    chunk = chunk[seen.first_seen(chunk['name'])]
+"""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+class SeenNames:
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def first_seen(self, names: Any) -> np.ndarray:
+        """Mask of the names not seen before (first copy only), which are then remembered"""
+        values = pd.Series(names, dtype=object).fillna('').to_numpy(dtype=object)
+        hashes = pd.util.hash_array(values, categorize=False)
+        unique, first = np.unique(hashes, return_index=True)
+
+        positions = np.searchsorted(self._hashes, unique)
+        known = np.zeros(len(unique), dtype=bool)
+        if len(self._hashes):
+            known = self._hashes[np.minimum(positions, len(self._hashes) - 1)] == unique
+
+        new = ~known
+        self._hashes = np.insert(self._hashes, positions[new], unique[new])
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first[new]] = True
+        return mask
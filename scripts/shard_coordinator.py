@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Sharded Ingest Coordinator
+
+Merges the --metrics reports written by the N shards of one sharded run
+(clean_and_populate_firebase.py or populate_from_csv.py with --shard i/N)
+into a single run report:
+
+- Checks that every shard 0..N-1 reported exactly once and succeeded; the
+  merged run only counts as succeeded if they all did
+- Rows, documents, retries and commit latency histograms are summed over
+  the shards
+- Shards run in parallel, so the run's wall time spans from the first
+  shard's start to the last shard's end, and a stage's throughput is its
+  total rows over its slowest shard's time
+- The merged report is JSON, or a Prometheus textfile for a .prom path,
+  with the same layout as a single run's report
+
+Usage:
+python shard_coordinator.py metrics/shard-*.json --output ingest_run.json
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from run_metrics import REPORT_VERSION, LatencyHistogram, prometheus_text
+
+COMMIT_COUNTERS = ['batches_committed', 'batches_failed', 'documents_written', 'documents_failed', 'retries',
+                   'throttled']
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    report['path'] = path
+    return report
+
+
+def _shard_of(report: Dict[str, Any]):
+    shard = report.get('labels', {}).get('shard')
+    if not shard:
+        raise ValueError(f"{report['path']} is not a shard report (run with --shard i/N)")
+    index, count = (int(part) for part in shard.split('/'))
+    return index, count
+
+
+def merge_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge the reports of one sharded run into a single run report"""
+    scripts = {report['script'] for report in reports}
+    counts = {_shard_of(report)[1] for report in reports}
+    if len(scripts) > 1 or len(counts) > 1:
+        raise ValueError(f"Reports come from different runs: scripts {sorted(scripts)}, shard counts {sorted(counts)}")
+    shard_count = counts.pop()
+
+    by_shard: Dict[int, List[Dict[str, Any]]] = {}
+    for report in reports:
+        by_shard.setdefault(_shard_of(report)[0], []).append(report)
+    missing = [index for index in range(shard_count) if index not in by_shard]
+    duplicated = sorted(index for index, shard_reports in by_shard.items() if len(shard_reports) > 1)
+    failed = sorted(_shard_of(report)[0] for report in reports if report['status'] != 'succeeded')
+
+    starts = [datetime.fromisoformat(report['started_at']) for report in reports]
+    ends = [start + timedelta(seconds=report['seconds']) for start, report in zip(starts, reports)]
+
+    stage_totals: Dict[str, Dict[str, Any]] = {}
+    for report in reports:
+        for name, total in report['stage_totals'].items():
+            merged = stage_totals.setdefault(name, {'spans': 0, 'rows': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                    'peak_rss_mb': 0.0})
+            merged['spans'] += total['spans']
+            merged['rows'] += total['rows']
+            merged['seconds'] += total['seconds']
+            merged['max_seconds'] = max(merged['max_seconds'], total['seconds'])
+            merged['peak_rss_mb'] = max(merged['peak_rss_mb'], total['peak_rss_mb'])
+    for merged in stage_totals.values():
+        merged['seconds'] = round(merged['seconds'], 4)
+        merged['rows_per_second'] = round(merged['rows'] / merged['max_seconds'], 1) \
+            if merged['rows'] and merged['max_seconds'] else None
+
+    commits: Dict[str, Any] = {counter: 0 for counter in COMMIT_COUNTERS}
+    latency = None
+    for report in reports:
+        for counter in COMMIT_COUNTERS:
+            # Reports from before a counter existed count it as 0
+            commits[counter] += report['commits'].get(counter, 0)
+        histogram = LatencyHistogram.from_dict(report['commits']['commit_latency'])
+        if latency is None:
+            latency = histogram
+        else:
+            latency.merge(histogram)
+    commits['commit_latency'] = latency.to_dict()
+
+    return {
+        'script': scripts.pop(),
+        'version': REPORT_VERSION,
+        'labels': {'shards': str(shard_count)},
+        'status': 'succeeded' if not (missing or duplicated or failed) else 'failed',
+        'started_at': min(starts).isoformat(),
+        'seconds': round((max(ends) - min(starts)).total_seconds(), 4),
+        'peak_rss_mb': max(report['peak_rss_mb'] for report in reports),
+        'peak_child_rss_mb': max(report.get('peak_child_rss_mb') or 0 for report in reports),
+        'shards': {
+            'count': shard_count,
+            'missing': missing,
+            'duplicated': duplicated,
+            'failed': failed,
+            'reports': [
+                {
+                    'shard': report['labels']['shard'],
+                    'path': report['path'],
+                    'status': report['status'],
+                    'seconds': report['seconds'],
+                    'peak_rss_mb': report['peak_rss_mb'],
+                    'documents_written': report['commits']['documents_written'],
+                }
+                for report in sorted(reports, key=lambda report: _shard_of(report)[0])
+            ],
+        },
+        'stage_totals': stage_totals,
+        'commits': commits,
+    }
+
+
+def write_report(report: Dict[str, Any], path: str):
+    """Write JSON, or a Prometheus textfile if path ends in .prom"""
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.prom'):
+            f.write(prometheus_text(report))
+        else:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Merge the run reports of a sharded ingest')
+    parser.add_argument('reports', nargs='+', help='--metrics JSON reports written by the shards')
+    parser.add_argument('--output', default=None,
+                       help='Write the merged report here: JSON, or a Prometheus textfile for a .prom path')
+
+    args = parser.parse_args()
+    merged = merge_reports([load_report(path) for path in args.reports])
+    shards = merged['shards']
+
+    print(f"📊 {merged['script']}: {len(shards['reports'])} reports for {shards['count']} shards, "
+          f"{merged['seconds']:.1f}s wall time")
+    print(f"  {'shard':<8} {'status':<10} {'seconds':>10} {'documents':>12} {'peak MB':>9}")
+    for shard in shards['reports']:
+        print(f"  {shard['shard']:<8} {shard['status']:<10} {shard['seconds']:>10.1f} "
+              f"{shard['documents_written']:>12} {shard['peak_rss_mb']:>9.0f}")
+    print(f"  {'stage':<14} {'rows':>12} {'rows/s':>12} {'slowest shard s':>16}")
+    for name, total in merged['stage_totals'].items():
+        print(f"  {name:<14} {total['rows']:>12} {total['rows_per_second'] or 0:>12.0f} "
+              f"{total['max_seconds']:>16.1f}")
+    commits = merged['commits']
+    print(f"  {commits['documents_written']} documents written, {commits['documents_failed']} failed, "
+          f"{commits['retries']} retries, commit p95 {commits['commit_latency']['p95_seconds']}s")
+
+    if args.output:
+        write_report(merged, args.output)
+        print(f"✅ Merged report written to {args.output}")
+
+    if merged['status'] != 'succeeded':
+        for problem in ['missing', 'duplicated', 'failed']:
+            if shards[problem]:
+                print(f"❌ Shards {problem}: {shards[problem]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
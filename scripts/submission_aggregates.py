@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Local Submission Aggregates
+
+A SQLite file holding the running per-company totals of the submissions
+collection, so the aggregate job reads each submission once:
+
+- reduce_submissions() folds one page of submission documents into
+  per-company partial aggregates, keyed by the search-normalized company
+  name (the app's normalizeCompanyName, which is how it looks up the
+  company a submission is for)
+- merge() adds a page's partials to the stored totals and advances the
+  watermark, the (timestamp, document ID) of the last submission read,
+  in the same transaction; an interrupted run resumes after the last
+  merged page without counting any submission twice
+- Merged companies are marked dirty until their aggregates have been
+  written back to Firestore
+
+Memory stays bounded by the page size: the totals live on disk and a
+company's flag counts are a small JSON object of flag ID to count.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from company_names import normalize_search_name
+
+DEFAULT_STATE_PATH = 'submission_aggregates.sqlite'
+
+# Fields read from each submission document
+SUBMISSION_FIELDS = ['companyName', 'markedFlags', 'severityBreakdown', 'timestamp']
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+_AGGREGATE_COLUMNS = ['name', 'submissions', 'flag_total', 'light', 'medium', 'flags', 'last_submission']
+
+Watermark = Tuple[datetime, str]
+
+
+def _count(value: Any) -> int:
+    """A severity count as an int; anything else counts as 0"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return 0
+    return int(value)
+
+
+def empty_aggregate(name: str) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'submissions': 0,
+        'flag_total': 0,
+        'light': 0,
+        'medium': 0,
+        'flags': {},
+        'last_submission': None,
+    }
+
+
+def reduce_submissions(docs: Iterable) -> Dict[str, Dict[str, Any]]:
+    """Per-company partial aggregates of submission snapshots; submissions without a name are skipped"""
+    partials: Dict[str, Dict[str, Any]] = {}
+    for doc in docs:
+        data = doc.to_dict() or {}
+        name = data.get('companyName')
+        key = normalize_search_name(name) if isinstance(name, str) else ""
+        if not key:
+            continue
+
+        partial = partials.get(key)
+        if partial is None:
+            partial = partials[key] = empty_aggregate(name.strip())
+
+        flags = data.get('markedFlags')
+        flags = flags if isinstance(flags, list) else []
+        severity = data.get('severityBreakdown')
+        severity = severity if isinstance(severity, dict) else {}
+
+        partial['submissions'] += 1
+        partial['flag_total'] += len(flags)
+        partial['light'] += _count(severity.get('light'))
+        partial['medium'] += _count(severity.get('medium'))
+        # A flag counts once per submission that marked it
+        for flag in {flag for flag in flags if isinstance(flag, str)}:
+            partial['flags'][flag] = partial['flags'].get(flag, 0) + 1
+
+        # The company's display name is the one its latest submission used
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, datetime) and (partial['last_submission'] is None
+                                                or timestamp >= partial['last_submission']):
+            partial['last_submission'] = timestamp
+            partial['name'] = name.strip()
+    return partials
+
+
+def combine(total: Dict[str, Any], partial: Dict[str, Any]) -> Dict[str, Any]:
+    """The aggregate of two disjoint sets of submissions to the same company"""
+    flags = dict(total['flags'])
+    for flag, count in partial['flags'].items():
+        flags[flag] = flags.get(flag, 0) + count
+
+    latest = partial
+    if partial['last_submission'] is None or (total['last_submission'] is not None
+                                              and total['last_submission'] > partial['last_submission']):
+        latest = total
+    return {
+        'name': latest['name'],
+        'submissions': total['submissions'] + partial['submissions'],
+        'flag_total': total['flag_total'] + partial['flag_total'],
+        'light': total['light'] + partial['light'],
+        'medium': total['medium'] + partial['medium'],
+        'flags': flags,
+        'last_submission': latest['last_submission'],
+    }
+
+
+def company_fields(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    """The aggregate fields of a company document, as the app computes them incrementally"""
+    submissions = aggregate['submissions']
+    return {
+        'submissionCount': submissions,
+        'averageFlagCount': aggregate['flag_total'] / submissions if submissions else 0,
+        # Every flag ever marked, most frequent first
+        'commonFlags': [flag for flag, _ in sorted(aggregate['flags'].items(), key=lambda item: (-item[1], item[0]))],
+        'severityTrends': {
+            'light': aggregate['light'],
+            'medium': aggregate['medium'],
+        },
+        'lastSubmission': aggregate['last_submission'],
+    }
+
+
+def _encode_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _decode_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class SubmissionAggregates:
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        """Open (or create) the aggregate state database"""
+        self.path = path
+        # Batch commit callbacks mark companies written from worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS aggregates (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    submissions INTEGER NOT NULL,
+                    flag_total INTEGER NOT NULL,
+                    light INTEGER NOT NULL,
+                    medium INTEGER NOT NULL,
+                    flags TEXT NOT NULL,
+                    last_submission TEXT,
+                    dirty INTEGER NOT NULL DEFAULT 1
+                );
+                CREATE INDEX IF NOT EXISTS aggregates_dirty ON aggregates (dirty, key);
+                CREATE TABLE IF NOT EXISTS watermark (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    timestamp TEXT NOT NULL,
+                    doc_id TEXT NOT NULL
+                );
+            ''')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def reset(self):
+        """Forget every aggregate and the watermark, for a full recompute"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM aggregates')
+            self._conn.execute('DELETE FROM watermark')
+
+    def watermark(self) -> Optional[Watermark]:
+        """(timestamp, document ID) of the last submission merged, or None before the first run"""
+        with self._lock:
+            row = self._conn.execute('SELECT timestamp, doc_id FROM watermark WHERE id = 1').fetchone()
+        return (_decode_time(row[0]), row[1]) if row else None
+
+    def _row_to_aggregate(self, row: tuple) -> Dict[str, Any]:
+        name, submissions, flag_total, light, medium, flags, last_submission = row
+        return {
+            'name': name,
+            'submissions': submissions,
+            'flag_total': flag_total,
+            'light': light,
+            'medium': medium,
+            'flags': json.loads(flags),
+            'last_submission': _decode_time(last_submission),
+        }
+
+    def _lookup(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        columns = ', '.join(_AGGREGATE_COLUMNS)
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self._conn.execute(
+                f'SELECT key, {columns} FROM aggregates WHERE key IN ({placeholders})', chunk
+            ):
+                found[row[0]] = self._row_to_aggregate(row[1:])
+        return found
+
+    def merge(self, partials: Dict[str, Dict[str, Any]], watermark: Watermark):
+        """Add a page's partial aggregates and advance the watermark, atomically"""
+        with self._lock, self._conn:
+            existing = self._lookup(list(partials))
+            rows = []
+            for key, partial in partials.items():
+                aggregate = combine(existing[key], partial) if key in existing else partial
+                rows.append((
+                    key, aggregate['name'], aggregate['submissions'], aggregate['flag_total'],
+                    aggregate['light'], aggregate['medium'], json.dumps(aggregate['flags'], sort_keys=True),
+                    _encode_time(aggregate['last_submission']),
+                ))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO aggregates '
+                '(key, name, submissions, flag_total, light, medium, flags, last_submission, dirty) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)',
+                rows,
+            )
+            timestamp, doc_id = watermark
+            self._conn.execute('INSERT OR REPLACE INTO watermark (id, timestamp, doc_id) VALUES (1, ?, ?)',
+                               (_encode_time(timestamp), doc_id))
+
+    def dirty(self, limit: int, after: str = "") -> List[Tuple[str, Dict[str, Any]]]:
+        """Up to limit (key, aggregate) pairs not yet written back, in key order after the given key"""
+        columns = ', '.join(_AGGREGATE_COLUMNS)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT key, {columns} FROM aggregates WHERE dirty = 1 AND key > ? ORDER BY key LIMIT ?',
+                (after, limit),
+            ).fetchall()
+        return [(row[0], self._row_to_aggregate(row[1:])) for row in rows]
+
+    def contains(self, keys: List[str]) -> set:
+        """The given keys that have an aggregate"""
+        found = set()
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(row[0] for row in self._conn.execute(
+                    f'SELECT key FROM aggregates WHERE key IN ({placeholders})', chunk
+                ))
+        return found
+
+    def mark_written(self, keys: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE aggregates SET dirty = 0 WHERE key = ?', [(key,) for key in keys])
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            companies, dirty, submissions = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(dirty), 0), COALESCE(SUM(submissions), 0) FROM aggregates'
+            ).fetchone()
+        return {'companies': companies, 'dirty': dirty, 'submissions': submissions}
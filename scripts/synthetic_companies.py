@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Synthetic Company Dataset Generator
+
+Writes a seeded, Kaggle-shaped companies CSV for benchmarking ingest at
+realistic scale (10k, 1M or the full 7M rows):
+
+- Names are built from brandable syllable words, surnames and industry
+  words, so there are millions of distinct base names
+- Rows are drawn from the base names with a skewed distribution, so some
+  companies repeat exactly and others repeat as variants
+- Variants add the noise real data has: legal suffixes (Inc, Inc.,
+  ", LLC", Corp, & Co, ...), case changes, stray punctuation, doubled and
+  surrounding whitespace
+- A small share of rows is junk the cleaner must drop: empty, missing,
+  punctuation-only, overlong and non-ASCII names
+
+The same seed and row count always produce the same file.
+
+Usage:
+python synthetic_companies.py --size 1m --output synthetic_companies_1m.csv
+"""
+
+import argparse
+import os
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+SIZES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '7m': 7_000_000,
+}
+
+# Columns of the Kaggle 7M company dataset
+COLUMNS = [
+    'name', 'domain', 'year founded', 'industry', 'size range', 'locality',
+    'country', 'linkedin url', 'current employee estimate', 'total employee estimate',
+]
+
+WRITE_CHUNK = 500_000
+
+_SYLLABLES = [
+    'ac', 'al', 'an', 'ar', 'ax', 'be', 'bi', 'bo', 'ca', 'co', 'cy', 'da', 'de', 'di',
+    'el', 'en', 'ex', 'fa', 'fi', 'ga', 'ge', 'in', 'io', 'ka', 'ki', 'la', 'le', 'li',
+    'lo', 'lu', 'ma', 'me', 'mi', 'mo', 'na', 'ne', 'no', 'nu', 'on', 'or', 'pa', 'pi',
+    'quo', 'ra', 're', 'ri', 'ro', 'sa', 'se', 'si', 'so', 'ta', 'te', 'ti', 'to', 'tra',
+    'tri', 'va', 've', 'vi', 'vo', 'xa', 'xi', 'ya', 'za', 'ze', 'zo', 'lux', 'nex', 'zen',
+]
+
+_SURNAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Wilson', 'Anderson',
+    'Taylor', 'Thomas', 'Moore', 'Martin', 'Jackson', 'Thompson', 'White', 'Harris', 'Clark',
+    'Lewis', 'Walker', 'Hall', 'Allen', 'Young', 'King', 'Wright', 'Scott', 'Green', 'Baker',
+    'Adams', 'Nelson', 'Carter', 'Mitchell', 'Roberts', 'Turner', 'Phillips', 'Campbell',
+    'Parker', 'Evans', 'Edwards', 'Collins', 'Stewart', 'Morris', 'Murphy', 'Cook', 'Rogers',
+    'Morgan', 'Cooper', 'Peterson', 'Reed', 'Bailey', 'Bell', 'Kelly', 'Howard', 'Ward',
+]
+
+_INDUSTRY_WORDS = [
+    'Technologies', 'Systems', 'Solutions', 'Software', 'Analytics', 'Data', 'Labs', 'Digital',
+    'Networks', 'Consulting', 'Capital', 'Financial', 'Partners', 'Health', 'Medical', 'Bio',
+    'Pharma', 'Energy', 'Solar', 'Logistics', 'Freight', 'Foods', 'Brands', 'Retail', 'Media',
+    'Studios', 'Marketing', 'Design', 'Engineering', 'Construction', 'Builders', 'Realty',
+    'Properties', 'Insurance', 'Legal', 'Dental', 'Motors', 'Aerospace', 'Robotics', 'Security',
+    'Education', 'Learning', 'Travel', 'Hospitality', 'Services', 'Supply', 'Manufacturing',
+]
+
+_SUFFIXES = [
+    ' Inc', ' Inc.', ', Inc.', ' LLC', ', LLC', ' L.L.C.', ' Corp', ' Corp.', ' Corporation',
+    ' Ltd', ' Ltd.', ' Limited', ' Co', ' Co.', ' & Co', ' Company', ' Group', ' Holdings',
+]
+
+_JUNK = ['', ' ', '---', '!!!', '???', '&', '.', 'N/A', 'Café Zürich GmbH', 'Société Générale',
+         'Ünïcode Labs', 'x' * 120, 'A']
+
+_INDUSTRIES = ['information technology and services', 'computer software', 'hospital & health care',
+               'financial services', 'construction', 'marketing and advertising', 'retail',
+               'real estate', 'education management', 'logistics and supply chain']
+_SIZE_RANGES = ['1 - 10', '11 - 50', '51 - 200', '201 - 500', '501 - 1000', '1001 - 5000', '10001+']
+_LOCALITIES = ['new york, new york, united states', 'san francisco, california, united states',
+               'austin, texas, united states', 'chicago, illinois, united states',
+               'seattle, washington, united states', 'boston, massachusetts, united states']
+
+
+def _brand_words(rng: np.random.Generator, count: int) -> List[str]:
+    """Distinct capitalized words of 2-3 syllables"""
+    syllables = np.array(_SYLLABLES, dtype=object)
+    words = syllables[rng.integers(0, len(syllables), size=(count * 2, 3))]
+    lengths = rng.integers(2, 4, size=count * 2)
+    made = (''.join(parts[:length]).capitalize() for parts, length in zip(words, lengths))
+    return list(dict.fromkeys(made))[:count]
+
+
+def base_names(rng: np.random.Generator, count: int) -> List[str]:
+    """`count` base company names (not necessarily distinct) from several patterns"""
+    brands = np.array(_brand_words(rng, 20_000), dtype=object)
+    surnames = np.array(_SURNAMES, dtype=object)
+    industries = np.array(_INDUSTRY_WORDS, dtype=object)
+
+    brand = brands[rng.integers(0, len(brands), count)]
+    other = brands[rng.integers(0, len(brands), count)]
+    surname = surnames[rng.integers(0, len(surnames), count)]
+    surname2 = surnames[rng.integers(0, len(surnames), count)]
+    industry = industries[rng.integers(0, len(industries), count)]
+    number = rng.integers(1, 1000, count)
+    pattern = rng.choice(7, size=count, p=[0.25, 0.25, 0.15, 0.1, 0.1, 0.1, 0.05])
+
+    names = []
+    for p, b, o, s, s2, i, n in zip(pattern.tolist(), brand, other, surname, surname2, industry, number.tolist()):
+        if p == 0:
+            names.append(f"{b} {i}")
+        elif p == 1:
+            names.append(f"{b}{o.lower()}")
+        elif p == 2:
+            names.append(f"{s} {i}")
+        elif p == 3:
+            names.append(f"{s} & {s2}")
+        elif p == 4:
+            names.append(f"{b} {o} {i}")
+        elif p == 5:
+            names.append(b)
+        else:
+            names.append(f"{b} {n}")
+    return names
+
+
+def _add_noise(rng: np.random.Generator, names: List[str]) -> List[str]:
+    """Suffix, case, punctuation and whitespace noise on a share of the names"""
+    count = len(names)
+    suffixes = np.array(_SUFFIXES, dtype=object)
+    suffix = np.where(rng.random(count) < 0.35, suffixes[rng.integers(0, len(suffixes), count)], '')
+    noise = rng.choice(6, size=count, p=[0.8, 0.05, 0.04, 0.04, 0.04, 0.03])
+
+    noisy = []
+    for name, extra, kind in zip(names, suffix, noise.tolist()):
+        name = name + extra
+        if kind == 1:
+            name = name.upper()
+        elif kind == 2:
+            name = name.lower()
+        elif kind == 3:
+            name = f"  {name} "
+        elif kind == 4:
+            name = name.replace(' ', '  ', 1)
+        elif kind == 5:
+            name = name + '.'
+        noisy.append(name)
+    return noisy
+
+
+def iter_synthetic_chunks(rows: int, seed: int = 42, chunk_size: int = WRITE_CHUNK) -> Iterator[pd.DataFrame]:
+    """Yield the synthetic dataset in Kaggle-shaped chunks"""
+    rng = np.random.default_rng(seed)
+    # Roughly one base name per 1.4 rows; a Zipf-like draw makes some very common
+    distinct = max(1, int(rows / 1.4))
+    base = np.array(base_names(rng, distinct), dtype=object)
+
+    for start in range(0, rows, chunk_size):
+        count = min(chunk_size, rows - start)
+        ranks = np.minimum(rng.zipf(1.3, count) - 1, distinct - 1)
+        # Mostly uniform, with a Zipf-distributed head of repeated companies
+        picks = np.where(rng.random(count) < 0.8, rng.integers(0, distinct, count), ranks)
+        names = _add_noise(rng, base[picks].tolist())
+
+        junk = rng.random(count) < 0.02
+        junk_values = rng.integers(0, len(_JUNK) + 1, count)
+        names = [
+            (_JUNK[value] if value < len(_JUNK) else None) if is_junk else name
+            for name, is_junk, value in zip(names, junk.tolist(), junk_values.tolist())
+        ]
+
+        years = rng.integers(1900, 2024, count).astype(float)
+        years[rng.random(count) < 0.4] = np.nan
+        employees = rng.integers(1, 50_000, count)
+        yield pd.DataFrame({
+            'name': names,
+            'domain': [f"{str(name).lower().replace(' ', '')[:30]}.com" if name else None for name in names],
+            'year founded': years,
+            'industry': np.array(_INDUSTRIES, dtype=object)[rng.integers(0, len(_INDUSTRIES), count)],
+            'size range': np.array(_SIZE_RANGES, dtype=object)[rng.integers(0, len(_SIZE_RANGES), count)],
+            'locality': np.array(_LOCALITIES, dtype=object)[rng.integers(0, len(_LOCALITIES), count)],
+            'country': 'united states',
+            'linkedin url': [f"linkedin.com/company/{start + i}" for i in range(count)],
+            'current employee estimate': employees,
+            'total employee estimate': employees + rng.integers(0, 1000, count),
+        }, columns=COLUMNS)
+
+
+def generate_synthetic_csv(output_path: str, rows: int, seed: int = 42) -> str:
+    """Write the synthetic dataset to a CSV file, one chunk at a time"""
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    for i, chunk in enumerate(iter_synthetic_chunks(rows, seed)):
+        chunk.to_csv(output_path, mode='a', header=(i == 0), index=False)
+    return output_path
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Generate a synthetic Kaggle-shaped companies CSV')
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k',
+                       help='Preset row count (ignored if --rows is given)')
+    parser.add_argument('--rows', type=int, default=None, help='Exact number of rows to generate')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', default=None,
+                       help='Output CSV path (default: synthetic_companies_<size>.csv)')
+
+    args = parser.parse_args()
+    rows = args.rows or SIZES[args.size]
+    output = args.output or f"synthetic_companies_{args.rows or args.size}.csv"
+
+    print(f"📝 Generating {rows} synthetic companies (seed {args.seed}): {output}")
+    generate_synthetic_csv(output, rows, args.seed)
+    print(f"✅ Wrote {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
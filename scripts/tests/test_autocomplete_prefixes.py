@@ -0,0 +1,46 @@
+import pandas as pd
+
+from autocomplete_prefixes import AutocompletePrefixes, prefix_doc_id
+from company_documents import build_company_documents
+from company_names import company_doc_id
+from company_upsert import CompanyUpserter
+from fake_firestore import FakeFirestore
+from ingest_manifest import IngestManifest
+
+
+def prefix_counts(db, prefix):
+    data = db.collection('autocomplete_prefixes').document(prefix_doc_id(prefix)).get().to_dict()
+    return {entry['name']: entry['submissionCount'] for entry in data['companies']}
+
+
+def test_updated_company_keeps_its_stored_submission_count(tmp_path):
+    db = FakeFirestore()
+    # Written by an earlier full run, with submissions since
+    for document in build_company_documents(['Google', 'Stripe']):
+        db.collection('companies').document(company_doc_id(document['normalizedName'])).set(
+            dict(document, submissionCount=5))
+
+    autocomplete = AutocompletePrefixes(db)
+    upserter = CompanyUpserter(db, IngestManifest(str(tmp_path / 'manifest.sqlite')), script='test',
+                               autocomplete=autocomplete)
+    upserter.upsert(pd.DataFrame({'name': ['Google', 'Gusto']}))
+    upserter.finish(delete_missing=False)
+    autocomplete.write()
+
+    assert prefix_counts(db, 'g') == {'Google': 5, 'Gusto': 0}
+    assert prefix_counts(db, 'go') == {'Google': 5}
+
+
+def test_updated_company_missing_from_a_full_list_is_left_out(tmp_path):
+    db = FakeFirestore()
+    names = [f'Acme {i}' for i in range(3)]
+    for document in build_company_documents(names):
+        db.collection('companies').document(company_doc_id(document['normalizedName'])).set(
+            dict(document, submissionCount=9))
+    AutocompletePrefixes(db, top_k=3).rebuild()
+
+    # A company that didn't make the list is updated without its count
+    autocomplete = AutocompletePrefixes(db, top_k=3)
+    autocomplete.add('late', {'name': 'Acme Late', 'normalizedName': 'acme late'})
+    autocomplete.write()
+    assert prefix_counts(db, 'a') == {name: 9 for name in names}
@@ -0,0 +1,65 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+import clean_and_populate_firebase
+from clean_and_populate_firebase import FirebaseCleaner
+from company_upsert import CompanyUpserter
+from fake_firestore import FakeFirestore
+from ingest_manifest import IngestManifest
+from populate_checkpoint import PopulateCheckpoint
+
+
+@pytest.fixture
+def cleaner(monkeypatch):
+    db = FakeFirestore()
+    monkeypatch.setenv('FIREBASE_SERVICE_ACCOUNT', '{}')
+    with mock.patch.object(clean_and_populate_firebase.credentials, 'Certificate'), \
+         mock.patch.object(clean_and_populate_firebase.firebase_admin, 'initialize_app'), \
+         mock.patch.object(clean_and_populate_firebase.firestore, 'client', return_value=db):
+        yield FirebaseCleaner()
+
+
+def upsert(db, manifest_path, names):
+    manifest = IngestManifest(manifest_path)
+    try:
+        upserter = CompanyUpserter(db, manifest, script='clean_and_populate_firebase')
+        upserter.upsert(pd.DataFrame({'name': names}))
+        return upserter.finish()
+    finally:
+        manifest.close()
+
+
+def test_purged_companies_are_written_again_by_the_next_incremental_run(cleaner, tmp_path):
+    manifest_path = str(tmp_path / 'ingest_manifest.sqlite')
+    names = ['Google', 'Stripe', 'Figma']
+    upsert(cleaner.db, manifest_path, names)
+
+    cleaner.clean_collections(['companies'], manifest_paths=[manifest_path])
+    counts = upsert(cleaner.db, manifest_path, names)
+
+    assert (counts['created'], counts['unchanged']) == (3, 0)
+    assert len(list(cleaner.db._scan('companies'))) == 3
+
+
+def test_checkpointed_population_writes_the_first_spelling_of_each_company(cleaner, tmp_path):
+    checkpoint = PopulateCheckpoint(str(tmp_path / 'populate_checkpoint.json'), 'dataset')
+    names = ['Google', 'Acme-Labs', '..', 'GOOGLE', 'Acme Labs', 'Stripe']
+
+    added = cleaner.populate_companies(pd.DataFrame({'name': names}), checkpoint=checkpoint)
+
+    assert added == 3
+    assert sorted(data['name'] for _, data in cleaner.db._scan('companies')) == ['Acme-Labs', 'Google', 'Stripe']
+    assert (checkpoint.duplicates, checkpoint.unnamed) == (2, 1)
+
+
+def test_resumed_population_keeps_companies_written_before_the_checkpoint(cleaner, tmp_path):
+    path = str(tmp_path / 'populate_checkpoint.json')
+    companies = pd.DataFrame({'name': ['Google', 'Stripe', 'GOOGLE']})
+    cleaner.populate_companies(companies.head(1), checkpoint=PopulateCheckpoint(path, 'dataset'))
+
+    checkpoint = PopulateCheckpoint(path, 'dataset', resume=True)
+    cleaner.populate_companies(companies, checkpoint=checkpoint)
+
+    assert sorted(data['name'] for _, data in cleaner.db._scan('companies')) == ['Google', 'Stripe']
@@ -0,0 +1,20 @@
+import json
+
+from collection_purge import CollectionPurger
+from fake_firestore import FakeFirestore
+
+
+def test_purge_resumed_from_an_old_checkpoint_deletes_every_document(tmp_path):
+    db = FakeFirestore()
+    companies = db.collection('companies')
+    for i in range(25):
+        companies.document(f'doc-{i:02d}').set({'name': f'Company {i}'})
+    # Left behind by a purge that stopped, before the collection was populated again
+    checkpoint_path = tmp_path / 'purge_checkpoint.json'
+    checkpoint_path.write_text(json.dumps({'companies': 'doc-12'}))
+
+    deleted = CollectionPurger(db, page_size=5, checkpoint_path=str(checkpoint_path)).purge('companies')
+
+    assert deleted == 25
+    assert list(db._scan('companies')) == []
+    assert not checkpoint_path.exists()
@@ -0,0 +1,24 @@
+from company_dedup import dedupe_company_names
+
+
+def clusters(names):
+    companies = dedupe_company_names(names)
+    return {row.name: sorted(row.variants) for row in companies.itertuples()}
+
+
+def test_suffix_spellings_merge_into_one_company():
+    assert clusters(['Google', 'Google Inc', 'Google, LLC', 'Stripe']) == {
+        'Google': ['Google Inc', 'Google, LLC'],
+        'Stripe': [],
+    }
+
+
+def test_short_typo_is_not_the_canonical_name():
+    result = clusters(['Gogle', 'Google', 'Google Inc', 'Google, LLC'])
+    assert list(result) == ['Google']
+    assert result['Google'] == ['Gogle', 'Google Inc', 'Google, LLC']
+
+
+def test_most_frequent_spelling_wins_over_the_shortest():
+    result = clusters(['Microsoft Corp', 'Microsoft Corp', 'Microsoft'])
+    assert list(result) == ['Microsoft Corp']
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from dataset_profile import DatasetProfiler
+
+
+@pytest.fixture
+def companies_csv(tmp_path):
+    path = tmp_path / 'companies.csv'
+    pd.DataFrame({
+        'name': [f'Company {i}' for i in range(10)],
+        'year founded': [1999, 2004, None, 2010, 1987, None, 2001, 2015, 1995, 2020],
+        'size': ['1-10', '11-50', '1-10', '51-200', '11-50', '1-10', '1-10', '11-50', '1-10', '51-200'],
+        'employees': [5, 20, 3, 100, 40, 8, 2, 30, 6, 150],
+        # Numbers at first, text later, and nothing at all in some chunks
+        'ticker': [None, None, None, None, 1, 2, 'ACME', None, None, None],
+    }).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize('sample_size', [None, 4])
+def test_csv_chunks_give_the_dtypes_of_a_full_load(companies_csv, sample_size):
+    profiler = DatasetProfiler(sample_size=sample_size, seed=1)
+    with pd.read_csv(companies_csv, chunksize=3) as reader:
+        for chunk in reader:
+            profiler.update(chunk)
+    schema = profiler.schema()
+
+    expected = {col: str(dtype) for col, dtype in pd.read_csv(companies_csv).dtypes.items()}
+    assert schema['dtypes'] == expected
+    assert schema['dtypes']['year founded'] == 'float64'
+    if sample_size is None:
+        columns = schema['profile']['columns']
+        assert columns['employees']['inferred_type'] == 'int'
+        assert columns['year founded']['inferred_type'] == 'float'
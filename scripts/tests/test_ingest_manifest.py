@@ -0,0 +1,97 @@
+import sqlite3
+
+import pandas as pd
+
+from company_names import company_doc_id, generate_search_aliases, normalize_company_name
+from company_upsert import CompanyUpserter
+from fake_firestore import FakeFirestore
+from import_to_firebase import IMPORT_FIELDS, build_firebase_company
+from ingest_manifest import IngestManifest, content_hash
+
+
+def company_names(db):
+    return sorted(data['name'] for _, data in db._scan('companies'))
+
+
+def import_company(name):
+    return build_firebase_company({
+        'name': name, 'normalizedName': normalize_company_name(name), 'aliases': generate_search_aliases(name),
+        'website': '', 'location': '', 'industry': '', 'company_size': '', 'company_type': '',
+        'founded_year': None, 'specialities': '', 'locations': '',
+    })
+
+
+def test_scripts_sharing_a_manifest_keep_each_others_companies(tmp_path):
+    db = FakeFirestore()
+    manifest = IngestManifest(str(tmp_path / 'ingest_manifest.sqlite'))
+
+    importer = CompanyUpserter(db, manifest, static_fields=IMPORT_FIELDS, script='import_to_firebase')
+    importer.upsert_documents([import_company('Figma')])
+    importer.finish(delete_missing=False)
+
+    populator = CompanyUpserter(db, manifest, script='clean_and_populate_firebase')
+    populator.upsert(pd.DataFrame({'name': ['Google']}))
+    populator.finish()
+    assert company_names(db) == ['Figma', 'Google']
+
+    # A full run without Google deletes only what that script wrote
+    populator = CompanyUpserter(db, manifest, script='clean_and_populate_firebase')
+    populator.upsert(pd.DataFrame({'name': ['Stripe']}))
+    counts = populator.finish()
+    assert counts['deleted'] == 1
+    assert company_names(db) == ['Figma', 'Stripe']
+
+
+def test_company_written_by_two_scripts_survives_until_both_drop_it(tmp_path):
+    db = FakeFirestore()
+    manifest = IngestManifest(str(tmp_path / 'ingest_manifest.sqlite'))
+    for script in ['populate_from_csv', 'clean_and_populate_firebase']:
+        upserter = CompanyUpserter(db, manifest, script=script)
+        upserter.upsert(pd.DataFrame({'name': ['Google']}))
+        upserter.finish()
+
+    upserter = CompanyUpserter(db, manifest, script='clean_and_populate_firebase')
+    upserter.upsert(pd.DataFrame({'name': ['Stripe']}))
+    assert upserter.finish()['deleted'] == 0
+    assert company_names(db) == ['Google', 'Stripe']
+    assert manifest.count('companies', 'clean_and_populate_firebase') == 1
+
+
+def test_content_hash_ignores_alias_order():
+    fields = {'name': 'Google Inc', 'aliases': ['Google Inc', 'google inc', 'google']}
+    shuffled = dict(fields, aliases=['google', 'Google Inc', 'google inc'])
+    assert content_hash(fields) == content_hash(shuffled)
+    assert content_hash(fields) != content_hash(dict(fields, aliases=['google']))
+
+
+def test_reimporting_unchanged_companies_writes_nothing(tmp_path):
+    db = FakeFirestore()
+    manifest = IngestManifest(str(tmp_path / 'ingest_manifest.sqlite'))
+    names = ['Google Inc', 'Stripe, LLC', 'The Walt Disney Company']
+    for _ in range(2):
+        upserter = CompanyUpserter(db, manifest, static_fields=IMPORT_FIELDS, script='import_to_firebase')
+        upserter.upsert_documents([import_company(name) for name in names])
+        counts = upserter.finish(delete_missing=False)
+    assert counts['unchanged'] == len(names)
+    assert counts['writes'] == 0
+
+
+def test_unscoped_manifest_rows_move_to_the_script_of_their_run(tmp_path):
+    path = str(tmp_path / 'ingest_manifest.sqlite')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE documents (
+            collection TEXT NOT NULL, doc_id TEXT NOT NULL, normalized_name TEXT NOT NULL,
+            content_hash TEXT NOT NULL, run_id INTEGER NOT NULL, PRIMARY KEY (collection, doc_id)
+        );
+        CREATE INDEX documents_run ON documents (collection, run_id);
+        CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT, script TEXT);
+        INSERT INTO runs (run_id, script) VALUES (1, 'import_to_firebase');
+    ''')
+    conn.execute('INSERT INTO documents VALUES (?, ?, ?, ?, ?)', ('companies', company_doc_id('figma'), 'figma', 'x', 1))
+    conn.commit()
+    conn.close()
+
+    manifest = IngestManifest(path)
+    assert manifest.count('companies', 'import_to_firebase') == 1
+    assert manifest.count('companies', 'clean_and_populate_firebase') == 0
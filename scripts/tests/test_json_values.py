@@ -0,0 +1,21 @@
+import pytest
+
+import json_values
+from json_values import dumps, loads_many
+
+
+def test_parses_each_text():
+    assert loads_many(['{"city": "Austin"}', '[1, 2]', str(2 ** 70)]) == [{'city': 'Austin'}, [1, 2], 2 ** 70]
+
+
+def test_rejects_an_invalid_text_that_keeps_the_element_count():
+    # Joined into one array these make three elements: [1, 2, [3, 4]]
+    with pytest.raises(ValueError):
+        loads_many(['1,2', '[3', '4]'])
+
+
+def test_dumps_does_not_depend_on_orjson(monkeypatch):
+    value = {1: [float('nan'), 0.1, 'Zürich']}
+    text = dumps(value)
+    monkeypatch.setattr(json_values, 'orjson', None)
+    assert dumps(value) == text == '{"1":[NaN,0.1,"Zürich"]}'
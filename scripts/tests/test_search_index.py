@@ -0,0 +1,38 @@
+import os
+
+from company_names import generate_search_aliases, normalize_search_name
+from search_index import SearchIndex
+
+
+def company(name, aliases=None):
+    return {'name': name, 'normalizedName': normalize_search_name(name),
+            'aliases': generate_search_aliases(name) if aliases is None else aliases}
+
+
+def test_alias_order_does_not_change_an_entry(tmp_path):
+    path = str(tmp_path / 'index.json.gz')
+    index = SearchIndex()
+    index.update([company('Google Inc', ['Google Inc', 'google inc', 'google'])])
+    index.save(path)
+
+    index = SearchIndex.load(path)
+    index.update([company('Google Inc', ['google', 'Google Inc', 'google inc'])])
+    assert index.counts == {'added': 0, 'updated': 0, 'unchanged': 1}
+
+
+def test_unchanged_index_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'index.json.gz')
+    companies = [company(name) for name in ['Google Inc', 'Stripe, LLC', 'The Walt Disney Company']]
+    index = SearchIndex()
+    index.update(companies)
+    index.save(path)
+    written_at = os.stat(path).st_mtime_ns
+
+    index = SearchIndex.load(path)
+    index.update(companies)
+    index.save(path)
+    assert os.stat(path).st_mtime_ns == written_at
+
+    index.update([company('Figma')])
+    index.save(path)
+    assert len(SearchIndex.load(path).companies) == 4
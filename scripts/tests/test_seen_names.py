@@ -0,0 +1,19 @@
+import numpy as np
+
+from seen_names import SeenNames
+
+
+def test_keeps_the_first_copy_of_each_name_across_chunks():
+    seen = SeenNames()
+    assert seen.first_seen(['Google', 'Stripe', 'Google']).tolist() == [True, True, False]
+    assert seen.first_seen(['Figma', 'Stripe', 'Acme']).tolist() == [True, False, True]
+    assert seen.first_seen([]).tolist() == []
+    assert len(seen) == 4
+
+
+def test_hashes_stay_sorted():
+    seen = SeenNames()
+    for start in range(0, 5000, 1000):
+        seen.first_seen([f'company {i}' for i in range(start, start + 1500)])
+    assert len(seen) == 5500
+    assert np.all(np.diff(seen._hashes.astype(np.float64)) >= 0)
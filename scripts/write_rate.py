@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Adaptive Firestore Write Rate
+
+Paces document writes with a token bucket whose rate adapts to how
+Firestore responds, so long ingests settle near the highest rate the
+database accepts instead of pushing until commits fail:
+
+- Every commit attempt first takes one token per document; the bucket
+  refills at the target rate and holds at most one second of writes
+- While commits succeed and writes are waiting on the bucket, the target
+  rises once per `interval`: by a factor of `ramp` until the first
+  throttling error (slow start), then by `step` docs/s (additive increase)
+- A throttling error (RESOURCE_EXHAUSTED, DEADLINE_EXCEEDED, ABORTED)
+  multiplies the target by `backoff` (multiplicative decrease), at most
+  once per `cooldown`, since every batch sent at the old rate fails alike
+- The target stays between min_rate and max_rate; drops are logged as
+  they happen and the current target every `log_interval` seconds
+
+Share one instance between all the committers of a run so they split a
+single budget.
+
+Usage:
+    write_rate = AdaptiveWriteRate(initial_rate=500)
+    with BatchCommitter(db, write_rate=write_rate) as committer:
+        ...
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Optional
+
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+# Firestore's guidance for a new write load: start at 500 writes per second
+DEFAULT_INITIAL_RATE = 500.0
+
+THROTTLING_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    TimeoutError,
+)
+
+
+class AdaptiveWriteRate:
+    def __init__(self, initial_rate: float = DEFAULT_INITIAL_RATE, min_rate: float = 50.0,
+                 max_rate: Optional[float] = None, ramp: float = 1.5, step: float = 100.0,
+                 backoff: float = 0.7, interval: float = 1.0, cooldown: float = 2.0,
+                 log_interval: float = 30.0):
+        """Pace writes starting at initial_rate documents per second"""
+        if min_rate <= 0 or initial_rate <= 0:
+            raise ValueError("write rates must be positive")
+        if max_rate is not None and max_rate < min_rate:
+            raise ValueError("max_rate must be at least min_rate")
+        if not 0 < backoff < 1 or ramp < 1:
+            raise ValueError("backoff must be between 0 and 1 and ramp at least 1")
+
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else math.inf
+        self.ramp = ramp
+        self.step = step
+        self.backoff = backoff
+        self.interval = interval
+        self.cooldown = cooldown
+        self.log_interval = log_interval
+        self.rate = min(max(initial_rate, min_rate), self.max_rate)
+
+        self._lock = threading.Lock()
+        self._tokens = self.rate
+        now = time.monotonic()
+        self._refilled_at = now
+        self._increased_at = now
+        self._decreased_at = -math.inf
+        self._logged_at = now
+        self._slow_start = True
+        # Only raise the rate when it is what holds the writes back
+        self._saturated = False
+
+    def acquire(self, documents: int):
+        """Block until `documents` more writes fit under the target rate"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= documents
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait:
+                self._saturated = True
+        if wait:
+            time.sleep(wait)
+
+    def on_success(self):
+        """A commit went through: raise the target if writes are waiting on it"""
+        with self._lock:
+            now = time.monotonic()
+            if (not self._saturated or now - self._increased_at < self.interval
+                    or now - self._decreased_at < self.cooldown):
+                return
+            self._refill(now)
+            self._saturated = False
+            self._increased_at = now
+            self._set_rate(self.rate * self.ramp if self._slow_start else self.rate + self.step)
+            if now - self._logged_at >= self.log_interval:
+                self._logged_at = now
+                logger.info(f"Write rate target: {self.rate:.0f} docs/s")
+
+    def on_throttle(self, error: Exception):
+        """A commit was throttled: cut the target, once per cooldown"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased_at < self.cooldown:
+                return
+            self._refill(now)
+            self._decreased_at = now
+            self._slow_start = False
+            previous = self.rate
+            self._set_rate(self.rate * self.backoff)
+            # Don't let saved-up tokens burst straight back to the old rate
+            self._tokens = min(self._tokens, 0.0)
+            self._logged_at = now
+            logger.warning(f"Firestore throttled writes ({type(error).__name__}); "
+                           f"write rate target {previous:.0f} -> {self.rate:.0f} docs/s")
+
+    def _refill(self, now: float):
+        self._tokens = min(self.rate, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _set_rate(self, rate: float):
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+
+def add_write_rate_arguments(parser):
+    """Add --write-rate / --max-write-rate to a script's argument parser"""
+    parser.add_argument('--write-rate', type=float, default=DEFAULT_INITIAL_RATE,
+                       help='Starting target of document writes per second; it ramps up and backs off '
+                            'on throttling (0 disables pacing)')
+    parser.add_argument('--max-write-rate', type=float, default=None,
+                       help='Never raise the write rate target above this many documents per second')
+
+
+def write_rate_from_args(args) -> Optional[AdaptiveWriteRate]:
+    """The run's shared write rate, or None if pacing is disabled"""
+    if args.write_rate <= 0:
+        return None
+    return AdaptiveWriteRate(initial_rate=args.write_rate, max_rate=args.max_write_rate)